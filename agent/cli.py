@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Single entry point for registering databases and running the agent.
+
+    python -m agent register [DB_KEY=URL ...]    # same options as utils.register_db
+    python -m agent ask "@chinook top 5 artists"  # answer one question and exit
+    python -m agent chat                         # interactive session
+    python -m agent serve --port 8000            # HTTP server
+
+Only the standard library is imported up front. Each command imports what it
+needs when it runs, so `register` never loads google-adk and `--help`
+returns immediately.
+"""
+import argparse
+import sys
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+
+def _register(args, extra: list[str]) -> int:
+    from utils.register_db import main as register_main
+    return register_main(extra, prog="python -m agent register", log_level=args.log_level)
+
+def _ask(args, extra: list[str]) -> int:
+    import asyncio
+    from agent import mcp_toolbox_agent
+    session_id = args.session_id or mcp_toolbox_agent.SESSION_ID
+    return asyncio.run(mcp_toolbox_agent.main(" ".join(args.question), session_id=session_id, log_level=args.log_level))
+
+def _chat(args, extra: list[str]) -> int:
+    import asyncio
+    from agent import mcp_toolbox_agent
+    return asyncio.run(mcp_toolbox_agent.main(log_level=args.log_level))
+
+def _serve(args, extra: list[str]) -> int:
+    from agent import server
+    server.main(
+        host=args.host or server.SERVER_HOST,
+        port=args.port or server.SERVER_PORT,
+        log_level=args.log_level,
+    )
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m agent", description="Multi-database text-to-SQL agent.")
+    parser.add_argument("--log-level", default="INFO", type=str.upper, choices=LOG_LEVELS)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    # Options are passed through to utils.register_db, including --help
+    register = commands.add_parser("register", add_help=False, help="Register databases into tools.yaml.")
+    register.set_defaults(run=_register, passthrough=True)
+
+    ask = commands.add_parser("ask", help="Answer one question, print the answer and exit.")
+    ask.add_argument("question", nargs="+", help="The question, with @db_key mentions.")
+    ask.add_argument("--session-id", help="Session to ask in, so follow-up questions can share history.")
+    ask.set_defaults(run=_ask)
+
+    chat = commands.add_parser("chat", help="Start an interactive session.")
+    chat.set_defaults(run=_chat)
+
+    serve = commands.add_parser("serve", help="Serve questions over HTTP.")
+    serve.add_argument("--host", help="Defaults to SERVER_HOST or 127.0.0.1.")
+    serve.add_argument("--port", type=int, help="Defaults to SERVER_PORT or 8000.")
+    serve.set_defaults(run=_serve)
+    return parser
+
+def main(argv: list[str] = None) -> int:
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if extra and not getattr(args, "passthrough", False):
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    return args.run(args, extra)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,125 +1,279 @@
 #!/usr/bin/env python3
-import json
 import logging
 import os
-import sys
 import asyncio
-from aiohttp.client_exceptions import ServerDisconnectedError
+from typing import Optional
+
 from dotenv import load_dotenv
-from sqlalchemy import JSON
 from toolbox_core import ToolboxClient
 from google.genai.types import Content, Part
 from google.adk.agents import Agent
-from google.adk.sessions import InMemorySessionService
 from google.adk.runners import Runner
-from rich.console import Console
-from rich.progress import track
-
-console = Console()
 
-# Add the parent directory to Python path to import utils and tools
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.logger import logger
+from utils.logger import LogPayload, flush_logging, setup_logging
 from tools.query_refiner import query_refiner
+from tools.result_cache import ResultCache
+from tools.cost_guard import CostGuard, load_cost_thresholds
+from tools.db_toolset import DatabaseToolset
+from tools.federation import Federation
+from tools.model_router import ModelRouter, ToolErrorPlugin, load_routing_policies
+from tools.native_tools import NativeToolbox
+from tools.pagination import QueryPager
+from tools.sql_validator import SqlValidator
+from tools.toolbox_connection import CircuitBreaker, ToolboxConnection
+from utils.metrics import MetricsRecorder
+from utils.schema_catalog import SchemaCatalogStore, get_catalog_dir
+from utils.session_store import BoundedSessionService
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
 MCP_URL = os.getenv("MCP_TOOLBOX_URL", "http://127.0.0.1:5000")
 APP_NAME = USER_ID = SESSION_ID = "dynamic_text2sql_agent"
+TOOLS_YAML_PATH = os.getenv("TOOLS_YAML_PATH", "tools.yaml")
+SCHEMA_CATALOG_DIR = os.getenv("SCHEMA_CATALOG_DIR") or str(get_catalog_dir(TOOLS_YAML_PATH))
+# "toolbox" goes through the MCP Toolbox server; "native" runs the same tools in-process with SQLAlchemy
+TOOL_BACKEND = os.getenv("TOOL_BACKEND", "toolbox").lower()
+NATIVE_POOL_SIZE = int(os.getenv("NATIVE_POOL_SIZE", "5"))
+NATIVE_MAX_OVERFLOW = int(os.getenv("NATIVE_MAX_OVERFLOW", "10"))
+NATIVE_READ_ONLY = os.getenv("NATIVE_READ_ONLY", "true").lower() in ("1", "true", "yes")
+STATEMENT_TIMEOUT_SECONDS = float(os.getenv("STATEMENT_TIMEOUT_SECONDS", "30"))
+TOOLBOX_POOL_SIZE = int(os.getenv("TOOLBOX_POOL_SIZE", "32"))
+TOOLBOX_TIMEOUT_SECONDS = float(os.getenv("TOOLBOX_TIMEOUT_SECONDS", "60"))
+TOOLBOX_MAX_ATTEMPTS = int(os.getenv("TOOLBOX_MAX_ATTEMPTS", "3"))
+TOOLBOX_BREAKER_THRESHOLD = int(os.getenv("TOOLBOX_BREAKER_THRESHOLD", "5"))
+TOOLBOX_BREAKER_RESET_SECONDS = float(os.getenv("TOOLBOX_BREAKER_RESET_SECONDS", "30"))
+PAGE_MAX_ROWS = int(os.getenv("PAGE_MAX_ROWS", "200"))
+PAGE_MAX_BYTES = int(os.getenv("PAGE_MAX_BYTES", str(32 * 1024)))
+# EXPLAIN generated queries first; per-db_key thresholds come from the optional COST_GUARD_CONFIG YAML
+COST_GUARD_ENABLED = os.getenv("COST_GUARD_ENABLED", "true").lower() in ("1", "true", "yes")
+COST_GUARD_CONFIG = os.getenv("COST_GUARD_CONFIG")
+# Check table and column names against the schema catalog before a query is sent
+SQL_VALIDATION_ENABLED = os.getenv("SQL_VALIDATION_ENABLED", "true").lower() in ("1", "true", "yes")
+# Questions spanning several @db_keys can join per-database sub-queries locally in SQLite
+FEDERATION_ENABLED = os.getenv("FEDERATION_ENABLED", "true").lower() in ("1", "true", "yes")
+FEDERATION_MAX_ROWS_PER_SOURCE = int(os.getenv("FEDERATION_MAX_ROWS_PER_SOURCE", "10000"))
+# Logged tool payloads are sampled to this many characters and list/dict items, off the event loop
+LOG_RESPONSE_CHARS = int(os.getenv("LOG_RESPONSE_CHARS", "2000"))
+LOG_RESPONSE_ITEMS = int(os.getenv("LOG_RESPONSE_ITEMS", "20"))
+# Optional structured copy of the log, one JSON object per line
+LOG_JSONL_PATH = os.getenv("LOG_JSONL_PATH")
+# Session history budget: older tool outputs are cut, then old turns are summarized; the last turns stay verbatim
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024)))
+SESSION_MAX_TOKENS = int(os.getenv("SESSION_MAX_TOKENS", "32000"))
+SESSION_KEEP_TURNS = int(os.getenv("SESSION_KEEP_TURNS", "4"))
+SESSION_TOOL_OUTPUT_CHARS = int(os.getenv("SESSION_TOOL_OUTPUT_CHARS", "500"))
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "0")) or None
+# Optional SQLite file that keeps sessions across restarts
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH")
+# Questions go to MODEL_FAST first and escalate to MODEL_STRONG when a tool call fails or loops;
+# per-db_key policies come from the optional MODEL_ROUTING_CONFIG YAML
+MODEL_FAST = os.getenv("MODEL_FAST", "gemini-2.5-flash")
+MODEL_STRONG = os.getenv("MODEL_STRONG", "gemini-2.5-pro")
+MODEL_ROUTING_ENABLED = os.getenv("MODEL_ROUTING_ENABLED", "true").lower() in ("1", "true", "yes")
+MODEL_ROUTING_CONFIG = os.getenv("MODEL_ROUTING_CONFIG")
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "300"))
+
+# Shared by every runner in the process; writes through execute_query invalidate the tables they touch.
+# Call result_cache.invalidate(db_key, table) after writes made outside the agent
+result_cache = ResultCache(max_bytes=RESULT_CACHE_MAX_BYTES, ttl_seconds=RESULT_CACHE_TTL_SECONDS)
+
+# Timing spans for questions, LLM turns and tool calls; exported on exit if METRICS_JSONL_PATH is set
+METRICS_JSONL_PATH = os.getenv("METRICS_JSONL_PATH")
+metrics = MetricsRecorder()
+
+model_router = ModelRouter(MODEL_FAST, MODEL_STRONG, load_routing_policies(MODEL_ROUTING_CONFIG)) if MODEL_ROUTING_ENABLED else None
 
 def get_llm():
     api_key = os.getenv("GOOGLE_API_KEY")
     if api_key:
         from google.adk.models import Gemini
-        return Gemini(model_name="gemini-2.5-pro", api_key=api_key)
+        return Gemini(model_name=MODEL_STRONG, api_key=api_key)
     logger.info("GOOGLE_API_KEY not set — using fallback model string.")
-    return "gemini-2.5-flash"
+    return MODEL_FAST
 
-async def interaction_loop(runner: Runner):
-    logger.info("\nAgent ready. Type your question or 'exit' to quit.")
-    while True:
-        question = await asyncio.to_thread(input, "You> ")
-        if question.strip().lower() == "exit":
-            logger.info("Goodbye!")
-            break
+def agent_callbacks() -> dict:
+    """Metrics callbacks, preceded by the router's so LLM spans are named after the model actually used."""
+    callbacks = metrics.adk_callbacks()
+    if model_router is not None:
+        for name, callback in model_router.adk_callbacks().items():
+            callbacks[name] = [callback, callbacks[name]]
+    return callbacks
+
+def _prompt() -> str:
+    # Let queued log lines reach the console before the prompt is printed
+    flush_logging()
+    return input("You> ")
 
-        msg = Content(role="user", parts=[Part(text=question)])
-        final_text = None
+async def ensure_session(session_service, user_id: str, session_id: str) -> None:
+    """Creates the session unless it exists; a persisted session is resumed rather than replaced."""
+    if await session_service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id) is None:
+        await session_service.create_session(app_name=APP_NAME, user_id=user_id, session_id=session_id, state={})
 
-        async for ev in runner.run_async(new_message=msg, user_id=USER_ID, session_id=SESSION_ID):
+async def answer_question(runner: Runner, question: str, user_id: str = USER_ID, session_id: str = SESSION_ID) -> Optional[str]:
+    """Runs one question, logging its tool calls, and returns the final answer text."""
+    # Idle sessions are evicted (and lost without SESSION_DB_PATH); the user then starts a fresh one
+    await ensure_session(runner.session_service, user_id, session_id)
+    msg = Content(role="user", parts=[Part(text=question)])
+    final_text = None
+    with metrics.span("question", "question") as span:
+        span["tool_calls"] = 0
+        async for ev in runner.run_async(new_message=msg, user_id=user_id, session_id=session_id):
+            span["invocation_id"] = ev.invocation_id
             for fc in ev.get_function_calls():
-                logger.info(f"Tool call: {fc.name} args={fc.args}")
+                span["tool_calls"] += 1
+                args = LogPayload(fc.args, LOG_RESPONSE_CHARS, LOG_RESPONSE_ITEMS)
+                logger.info("Tool call: %s args=%s", fc.name, args, extra={"tool": fc.name, "tool_args": args})
 
             for fr in ev.get_function_responses():
-                logger.info(f"Response from {fr.name}:\n {fr.response}")
-                
+                payload = LogPayload(fr.response, LOG_RESPONSE_CHARS, LOG_RESPONSE_ITEMS)
+                logger.info("Response from %s:\n %s", fr.name, payload, extra={"tool": fr.name, "response": payload})
+
             if ev.content and ev.is_final_response():
                 final_text = ev.content.parts[0].text
+    return final_text
+
+async def interaction_loop(runner: Runner):
+    logger.info("\nAgent ready. Type your question or 'exit' to quit.")
+    while True:
+        question = await asyncio.to_thread(_prompt)
+        if question.strip().lower() == "exit":
+            logger.info("Goodbye!")
+            break
+
+        try:
+            final_text = await answer_question(runner, question)
+        except Exception as e:
+            # The session survives a failed turn, so the user can simply ask again
+            logger.error(f"Question failed: {e}")
+            continue
 
         logger.info(f"Assistant: {final_text or '(no final text)'}")
 
-async def build_runner_and_client():
-    client = ToolboxClient(MCP_URL)
+def create_tool_client():
+    if TOOL_BACKEND == "native":
+        return NativeToolbox(
+            TOOLS_YAML_PATH,
+            pool_size=NATIVE_POOL_SIZE,
+            max_overflow=NATIVE_MAX_OVERFLOW,
+            statement_timeout=STATEMENT_TIMEOUT_SECONDS,
+            read_only=NATIVE_READ_ONLY,
+        )
+    # One pooled, self-reconnecting toolbox connection for the lifetime of the runner
+    return ToolboxConnection(
+        MCP_URL,
+        client_factory=ToolboxClient,
+        pool_size=TOOLBOX_POOL_SIZE,
+        request_timeout=TOOLBOX_TIMEOUT_SECONDS,
+        max_attempts=TOOLBOX_MAX_ATTEMPTS,
+        breaker=CircuitBreaker(TOOLBOX_BREAKER_THRESHOLD, TOOLBOX_BREAKER_RESET_SECONDS),
+    )
+
+async def build_runner_and_client(session_id: str = SESSION_ID):
+    client = create_tool_client()
     await client.__aenter__()
-    toolbox_tools = await client.load_toolset()
-
-    session = InMemorySessionService()
-    await session.create_session(app_name=APP_NAME, user_id=USER_ID, session_id=SESSION_ID, state={})
-    
-    # Combine custom tools with toolbox tools
-    all_tools = [query_refiner]
-    if isinstance(toolbox_tools, list):
-        all_tools.extend(toolbox_tools)
-    else:
-        all_tools.append(toolbox_tools)
-    
+
+    session = BoundedSessionService(
+        max_bytes=SESSION_MAX_BYTES,
+        max_tokens=SESSION_MAX_TOKENS,
+        keep_turns=SESSION_KEEP_TURNS,
+        tool_output_chars=SESSION_TOOL_OUTPUT_CHARS,
+        idle_seconds=SESSION_IDLE_SECONDS,
+        db_path=SESSION_DB_PATH,
+    )
+    await ensure_session(session, USER_ID, session_id)
+
+    # Per-database tools are loaded from <db_key>_toolset on the first @db_key
+    # mention and each turn only sees the tools of the databases it is about
+    catalog_store = SchemaCatalogStore(SCHEMA_CATALOG_DIR)
+    db_toolset = DatabaseToolset(
+        client,
+        catalog_store,
+        result_cache,
+        pager=QueryPager(max_rows=PAGE_MAX_ROWS, max_bytes=PAGE_MAX_BYTES),
+        cost_guard=CostGuard(load_cost_thresholds(COST_GUARD_CONFIG)) if COST_GUARD_ENABLED else None,
+        sql_validator=SqlValidator(catalog_store) if SQL_VALIDATION_ENABLED else None,
+        federation=Federation(
+            max_rows_per_source=FEDERATION_MAX_ROWS_PER_SOURCE,
+            max_result_rows=PAGE_MAX_ROWS,
+            timeout=STATEMENT_TIMEOUT_SECONDS,
+        ) if FEDERATION_ENABLED else None,
+    )
+    all_tools = [query_refiner, db_toolset]
+
     agent = Agent(
         name=APP_NAME,
         model=get_llm(),
         tools=all_tools,
+        before_agent_callback=db_toolset.remember_db_keys,
+        **agent_callbacks(),
         instruction=(
             """
             # Introduction
             You are a multi-DB text-to-SQL agent. Use only these tools:
-            <db_key>_list_tables, <db_key>_describe_table, <db_key>_execute_query, query_refiner
+            <db_key>_list_tables, <db_key>_describe_table, <db_key>_describe_tables, <db_key>_search_schema, <db_key>_execute_query, <db_key>_fetch_page, query_refiner, list_databases, federated_query
 
             # Steps
             1. If you can't figure out which DB the question is about, ask the user to clarify. 
             2. Identify the database type from the or context.
-            3. Always inspect schema before executing querying.
+            3. Always inspect schema before executing querying. Prefer <db_key>_search_schema with the question to find
+               the relevant tables instead of listing every table.
             4. First get all correct table names and column names as per the schema, then use those to construct your SQL queries. 
+               Describe all the tables a query needs with one <db_key>_describe_tables call rather than one
+               <db_key>_describe_table call per table. Independent tool calls can be made together in one turn; they run concurrently.
             5. Use the `query_refiner` tool to wrap table and column names with appropriate delimiters based on the database type.
             6. The text with '@' is the target database key, e.g., '@superheroes', '@employee'. Use it to determine the database.
+               The <db_key>_ tools of a database are only available once it has been mentioned this way; use list_databases
+               to suggest valid keys.
+            7. When a question spans several databases, use federated_query: one narrow SELECT per database, each
+               in that database's dialect, joined or aggregated by a final SQLite query over the local tables.
             """
         )
     )
     runner = Runner(app_name=APP_NAME, agent=agent, session_service=session)
+    if model_router is not None:
+        # A tool that raises escalates the question instead of ending it
+        runner.plugin_manager.register_plugin(ToolErrorPlugin())
     return runner, client
 
-async def main():
-    retry = 0
+async def main(question: Optional[str] = None, session_id: str = SESSION_ID, log_level: str = "INFO") -> int:
+    """
+    The interactive loop, or with `question` a one-shot run that prints the
+    answer to stdout; logs go to stderr. Returns the process exit code,
+    non-zero if the question failed or got no final answer.
+    """
+    setup_logging(log_level, jsonl_path=LOG_JSONL_PATH)
     client = None
+    status = 0
     try:
-        while True:
-            try:
-                runner, client = await build_runner_and_client()
-                logger.info("Agent initialized and connected to MCP Toolbox.")
-                await interaction_loop(runner)
-                break
-            except ServerDisconnectedError:
-                retry += 1
-                logger.error(f"Disconnected—retry #{retry} in 1s...")
-                await asyncio.sleep(1)
-            except Exception as e:
-                logger.error(f"Unexpected error: {e}")
-                break
+        runner, client = await build_runner_and_client(session_id)
+        logger.info("Agent initialized and connected to MCP Toolbox.")
+        if question is None:
+            await interaction_loop(runner)
+        else:
+            final_text = await answer_question(runner, question, session_id=session_id)
+            flush_logging()
+            if final_text:
+                print(final_text)
+            else:
+                logger.error("The agent gave no final answer")
+                status = 1
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}")
+        status = 1
     finally:
         if client:
             try:
                 await client.close()
             except Exception as close_error:
                 logger.warning(f"Warning: Error closing client: {close_error}")
+        metrics.log_summary()
+        if model_router is not None:
+            logger.info(f"Model routing: {model_router.summary()}")
+        if METRICS_JSONL_PATH:
+            metrics.export_jsonl(METRICS_JSONL_PATH)
+    return status
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    raise SystemExit(asyncio.run(main()))
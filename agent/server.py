@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+import asyncio
+import json
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from google.genai.types import Content, Part
+from pydantic import BaseModel
+
+from agent.mcp_toolbox_agent import APP_NAME, LOG_JSONL_PATH, build_runner_and_client, metrics
+from utils.logger import setup_logging
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_LLM_CALLS = int(os.getenv("MAX_CONCURRENT_LLM_CALLS", "8"))
+MAX_PENDING_REQUESTS = int(os.getenv("MAX_PENDING_REQUESTS", "64"))
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+
+class AskRequest(BaseModel):
+    user_id: str
+    question: str
+    session_id: Optional[str] = None
+
+class ConcurrencyLimiter:
+    """Caps concurrent agent runs and rejects new work once too many requests are queued."""
+
+    def __init__(self, max_running: int, max_pending: int):
+        self._semaphore = asyncio.Semaphore(max_running)
+        self._max_pending = max_pending
+        self.pending = 0
+
+    def reserve(self) -> Callable[[], None]:
+        """
+        Claims a queue slot up front so overload is reported before the stream
+        starts. Returns the function that gives it back; calling it again is a no-op.
+        """
+        if self.pending >= self._max_pending:
+            raise HTTPException(status_code=429, detail="Too many pending requests, retry later")
+        self.pending += 1
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self.pending -= 1
+        return release
+
+    @asynccontextmanager
+    async def slot(self, release: Callable[[], None]):
+        """Waits for a run slot, then gives back the reservation `release` belongs to."""
+        await self._semaphore.acquire()
+        release()
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+class SessionRegistry:
+    """Creates one ADK session per user/session pair and serializes turns within it."""
+
+    def __init__(self, session_service):
+        self._session_service = session_service
+        # (lock, holders plus waiters); entries go away when the count drops to zero
+        self._locks: dict[tuple[str, str], list] = {}
+
+    async def ensure(self, user_id: str, session_id: str) -> None:
+        session = await self._session_service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+        if session is None:
+            await self._session_service.create_session(app_name=APP_NAME, user_id=user_id, session_id=session_id, state={})
+
+    @asynccontextmanager
+    async def lock(self, user_id: str, session_id: str):
+        """Holds the session's lock; it is dropped once nobody holds or waits for it."""
+        key = (user_id, session_id)
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+def serialize_event(ev) -> list[dict]:
+    """Converts an ADK event into the JSON payloads streamed to clients."""
+    payloads = []
+    for fc in ev.get_function_calls():
+        payloads.append({"type": "tool_call", "name": fc.name, "args": fc.args})
+    for fr in ev.get_function_responses():
+        payloads.append({"type": "tool_response", "name": fr.name, "response": fr.response})
+    if ev.content and ev.is_final_response():
+        payloads.append({"type": "final", "text": ev.content.parts[0].text})
+    return payloads
+
+def _sse(payload: dict) -> str:
+    return f"data: {json.dumps(payload, default=str)}\n\n"
+
+def create_app(runner_factory=build_runner_and_client) -> FastAPI:
+    """
+    Builds the HTTP app. One ToolboxClient, Agent and Runner are shared by all
+    requests; each user gets their own ADK session.
+    """
+    state = {}
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        runner, client = await runner_factory()
+        state["runner"] = runner
+        state["sessions"] = SessionRegistry(runner.session_service)
+        state["limiter"] = ConcurrencyLimiter(MAX_CONCURRENT_LLM_CALLS, MAX_PENDING_REQUESTS)
+        logger.info("Agent server ready.")
+        try:
+            yield
+        finally:
+            if client:
+                try:
+                    await client.close()
+                except Exception as close_error:
+                    logger.warning(f"Warning: Error closing client: {close_error}")
+
+    app = FastAPI(title=APP_NAME, lifespan=lifespan)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", "pending": state["limiter"].pending}
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def prometheus_metrics():
+        return metrics.to_prometheus()
+
+    @app.post("/ask")
+    async def ask(request: AskRequest):
+        runner, sessions, limiter = state["runner"], state["sessions"], state["limiter"]
+        session_id = request.session_id or request.user_id
+        release = limiter.reserve()
+
+        async def stream() -> AsyncIterator[str]:
+            msg = Content(role="user", parts=[Part(text=request.question)])
+            try:
+                # Queue on the session first, so turns waiting for their session don't hold run slots
+                async with sessions.lock(request.user_id, session_id), limiter.slot(release):
+                    await sessions.ensure(request.user_id, session_id)
+                    try:
+                        with metrics.span("question", "question", user_id=request.user_id) as span:
+                            span["tool_calls"] = 0
+                            async for ev in runner.run_async(new_message=msg, user_id=request.user_id, session_id=session_id):
+                                span["invocation_id"] = ev.invocation_id
+                                span["tool_calls"] += len(ev.get_function_calls())
+                                for payload in serialize_event(ev):
+                                    yield _sse(payload)
+                    except Exception as e:
+                        logger.error(f"Run failed for user '{request.user_id}': {e}")
+                        yield _sse({"type": "error", "message": str(e)})
+                yield _sse({"type": "done"})
+            finally:
+                # A client that disconnects while queued must not keep its reservation
+                release()
+
+        # The background task covers clients that leave before the stream starts
+        return StreamingResponse(stream(), media_type="text/event-stream", background=BackgroundTask(release))
+
+    return app
+
+def main(host: str = SERVER_HOST, port: int = SERVER_PORT, log_level: str = "INFO"):
+    import uvicorn
+    setup_logging(log_level, jsonl_path=LOG_JSONL_PATH)
+    uvicorn.run(create_app(), host=host, port=port)
+
+if __name__ == "__main__":
+    main()
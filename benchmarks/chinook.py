@@ -0,0 +1,65 @@
+# chinook.py
+
+import re
+import sqlite3
+from pathlib import Path
+
+_CREATE_RE = re.compile(r'CREATE TABLE public\.("\w+") \((.*?)\n\);', re.DOTALL)
+_CONSTRAINT_RE = re.compile(
+    r'ALTER TABLE ONLY public\.("\w+")\s+ADD CONSTRAINT "\w+" '
+    r'(PRIMARY KEY \([^)]*\)|FOREIGN KEY \([^)]*\) REFERENCES public\.("\w+"\([^)]*\)))'
+)
+_COPY_RE = re.compile(r'^COPY public\.("\w+") \(([^)]*)\) FROM stdin;$')
+_COPY_ESCAPES = {"\\": "\\", "t": "\t", "n": "\n", "r": "\r"}
+_ESCAPE_RE = re.compile(r"\\(.)")
+
+def _unescape(value: str):
+    """Decodes one field of pg_dump COPY text format."""
+    if value == "\\N":
+        return None
+    return _ESCAPE_RE.sub(lambda m: _COPY_ESCAPES.get(m.group(1), m.group(1)), value)
+
+def load_chinook_sqlite(sql_path: str, db_path: str) -> list[str]:
+    """
+    Loads the bundled Postgres dump of Chinook into a SQLite file.
+
+    Table definitions are kept as written (SQLite accepts the Postgres type
+    names), primary and foreign keys from the trailing ALTER TABLE statements
+    are folded into CREATE TABLE, and COPY blocks become bulk inserts.
+    Returns the created table names.
+    """
+    dump = Path(sql_path).read_text(encoding="utf-8", errors="replace")
+
+    constraints: dict[str, list[str]] = {}
+    for m in _CONSTRAINT_RE.finditer(dump):
+        constraint = m.group(2).replace("public.", "")
+        constraints.setdefault(m.group(1), []).append(constraint)
+
+    db_file = Path(db_path)
+    if db_file.exists():
+        db_file.unlink()
+    conn = sqlite3.connect(db_file)
+    try:
+        tables = []
+        for m in _CREATE_RE.finditer(dump):
+            table, body = m.group(1), m.group(2).strip("\n")
+            columns = [body] + [f"    {c}" for c in constraints.get(table, [])]
+            conn.execute(f"CREATE TABLE {table} (\n" + ",\n".join(columns) + "\n)")
+            tables.append(table.strip('"'))
+
+        lines = iter(dump.splitlines())
+        for line in lines:
+            m = _COPY_RE.match(line)
+            if not m:
+                continue
+            rows = []
+            for row in lines:
+                if row == "\\.":
+                    break
+                rows.append([_unescape(v) for v in row.split("\t")])
+            placeholders = ", ".join("?" for _ in m.group(2).split(","))
+            conn.executemany(f"INSERT INTO {m.group(1)} ({m.group(2)}) VALUES ({placeholders})", rows)
+        conn.commit()
+    finally:
+        conn.close()
+    return tables
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for the CLI entry points.
+
+Imports each module in a fresh interpreter with `-X importtime`, several
+times, and reports the median import time, the median process wall time
+and the slowest top-level dependencies. A module that exceeds its budget
+makes the run fail, so startup regressions show up in CI:
+
+    python -m benchmarks.import_time --output import_times.json --max-ms agent.cli=50
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# What each CLI command has to import before it can do any work
+DEFAULT_MODULES = ("agent.cli", "utils.register_db", "agent.mcp_toolbox_agent", "agent.server")
+
+# Heavy packages that `agent.cli` itself must never import
+HEAVY_PACKAGES = ("google.adk", "google.genai", "rich", "sqlalchemy", "toolbox_core", "aiohttp", "fastapi", "uvicorn")
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """(module, nesting depth, cumulative microseconds) for each line of `-X importtime` output, in output order."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if cumulative.strip().isdigit():
+            entries.append((name.strip(), (len(name) - len(name.lstrip()) - 1) // 2, int(cumulative)))
+    return entries
+
+def direct_imports(entries: list[tuple[str, int, int]], module: str) -> list[tuple[str, int]]:
+    """The modules `module` imported itself; -X importtime prints them just before it, one level deeper."""
+    children = []
+    for name, depth, us in entries:
+        if depth == 0:
+            if name == module:
+                return children
+            children = []
+        elif depth == 1:
+            children.append((name, us))
+    return []
+
+def measure(module: str, repeat: int = 5, top: int = 10) -> dict:
+    import_us, wall_ms = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=REPO_ROOT, capture_output=True, text=True,
+        )
+        wall_ms.append((time.perf_counter() - start) * 1000)
+        if proc.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+        entries = parse_importtime(proc.stderr)
+        import_us.append(next((us for name, depth, us in entries if name == module and depth == 0), 0))
+
+    imported = {name for name, _, _ in entries}
+    slowest = sorted(direct_imports(entries, module), key=lambda dep: -dep[1])
+    return {
+        "import_ms": statistics.median(import_us) / 1000,
+        "wall_ms": statistics.median(wall_ms),
+        "slowest": [{"module": name, "ms": us / 1000} for name, us in slowest[:top]],
+        "heavy_packages": sorted(p for p in HEAVY_PACKAGES if p in imported),
+    }
+
+def _parse_budget(value: str) -> tuple[str, float]:
+    module, _, ms = value.partition("=")
+    try:
+        return module, float(ms)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected <module>=<ms>, got '{value}'")
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure how long the CLI entry points take to import.")
+    parser.add_argument("modules", nargs="*", default=list(DEFAULT_MODULES))
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module; the median is reported.")
+    parser.add_argument("--output", help="Where to write the JSON results.")
+    parser.add_argument("--max-ms", type=_parse_budget, action="append", default=[], metavar="MODULE=MS",
+                        help="Fail if MODULE takes longer than MS to import. Can be repeated.")
+    args = parser.parse_args(argv)
+
+    results = {module: measure(module, args.repeat) for module in args.modules}
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+
+    failed = []
+    for module, result in results.items():
+        print(f"{module}: import {result['import_ms']:.1f}ms, process {result['wall_ms']:.1f}ms")
+        for dep in result["slowest"][:3]:
+            print(f"    {dep['module']}: {dep['ms']:.1f}ms")
+    if results.get("agent.cli", {}).get("heavy_packages"):
+        failed.append(f"agent.cli imports {results['agent.cli']['heavy_packages']}")
+    for module, budget in args.max_ms:
+        if module in results and results[module]["import_ms"] > budget:
+            failed.append(f"{module} took {results[module]['import_ms']:.1f}ms to import, over its {budget:g}ms budget")
+    for message in failed:
+        print(message, file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmark for the text-to-SQL agent.
+
+Loads the bundled chinook.sql into SQLite, registers it with
+register_database, and replays a fixed question corpus through
+build_runner_and_client and interaction_loop using a scripted LLM and an
+in-process toolbox stand-in. No network access is needed.
+
+    python -m benchmarks.run_benchmark --output bench_results.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import agent.mcp_toolbox_agent as agent_module
+from benchmarks.chinook import load_chinook_sqlite
+from benchmarks.stubs import ScriptedLlm, StubToolboxClient
+from tools.query_refiner import _refine, query_refiner
+from utils.logger import setup_logging
+from utils.metrics import MetricsRecorder, percentile
+from utils.register_db import register_database
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_CORPUS = Path(__file__).resolve().parent / "corpus.json"
+DEFAULT_DUMP = REPO_ROOT / "chinook.sql"
+DB_KEY = "chinook"
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def _latency_stats(values: list[float]) -> dict:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "mean_ms": (sum(values) / len(values) * 1000) if values else 0.0,
+        **{f"p{int(q * 100)}_ms": percentile(values, q) * 1000 for q in (0.5, 0.95, 0.99)},
+    }
+
+def _time_refiner(corpus: list[dict], rounds: int = 200) -> dict:
+    """Measures query_refiner cost per call, both cold (cache cleared) and warm."""
+    queries = [
+        (step["args"]["query"], step["args"]["db_type"])
+        for item in corpus for step in item["steps"] if step.get("tool") == "query_refiner"
+    ]
+    if not queries:
+        return {}
+
+    _refine.cache_clear()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        _refine.cache_clear()
+        for query, db_type in queries:
+            query_refiner(query, db_type)
+    cold = (time.perf_counter() - start) / (rounds * len(queries))
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query, db_type in queries:
+            query_refiner(query, db_type)
+    warm = (time.perf_counter() - start) / (rounds * len(queries))
+    return {"cold_us_per_call": cold * 1e6, "warm_us_per_call": warm * 1e6}
+
+async def _replay(questions: list[str], scripts: dict, workdir: Path, tools_yaml: Path, latency_s: float, backend: str):
+    recorder = MetricsRecorder()
+    agent_module.result_cache.invalidate()
+    inputs = iter([*questions, "exit"])
+
+    with patch.object(agent_module, "ToolboxClient", lambda url, session=None: StubToolboxClient(str(tools_yaml), latency_s)), \
+            patch.object(agent_module, "TOOL_BACKEND", backend), \
+            patch.object(agent_module, "TOOLS_YAML_PATH", str(tools_yaml)), \
+            patch.object(agent_module, "get_llm", lambda: ScriptedLlm(model="scripted", scripts=scripts)), \
+            patch.object(agent_module, "SCHEMA_CATALOG_DIR", str(workdir / "schema_catalog")), \
+            patch.object(agent_module, "metrics", recorder), \
+            patch("builtins.input", lambda prompt="": next(inputs)):
+        runner, client = await agent_module.build_runner_and_client()
+        try:
+            start = time.perf_counter()
+            await agent_module.interaction_loop(runner)
+            elapsed = time.perf_counter() - start
+        finally:
+            await client.close()
+    return recorder, elapsed
+
+def run_benchmark(
+    corpus_path: str = DEFAULT_CORPUS,
+    dump_path: str = DEFAULT_DUMP,
+    repeat: int = 1,
+    toolbox_latency_ms: float = 0.0,
+    workdir: str = None,
+    backend: str = "toolbox",
+) -> dict:
+    """
+    Runs the benchmark and returns the results dict. The "toolbox" backend
+    goes through the stub toolbox; "native" uses the in-process SQLAlchemy tools.
+    """
+    corpus = json.loads(Path(corpus_path).read_text())
+    scripts = {item["question"]: item["steps"] for item in corpus}
+    questions = [item["question"] for item in corpus] * repeat
+
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        tmp_path = Path(tmp)
+        db_path = tmp_path / "chinook.db"
+        tools_yaml = tmp_path / "tools.yaml"
+
+        start = time.perf_counter()
+        load_chinook_sqlite(dump_path, db_path)
+        load_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        register_database(str(tools_yaml), DB_KEY, f"sqlite:///{db_path}")
+        register_s = time.perf_counter() - start
+
+        recorder, elapsed = asyncio.run(
+            _replay(questions, scripts, tmp_path, tools_yaml, toolbox_latency_ms / 1000, backend)
+        )
+
+    question_spans = [s for s in recorder.spans if s["kind"] == "question"]
+    tool_calls = [s.get("tool_calls", 0) for s in question_spans]
+    failed = [s for s in question_spans if s.get("error")]
+    # The stub toolbox returns a JSON row list on success, so a missing row count means the query failed
+    execute_errors = [s for s in recorder.spans if s["name"].endswith("_execute_query") and s.get("rows") is None]
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "questions": len(questions),
+            "repeat": repeat,
+            "backend": backend,
+            "toolbox_latency_ms": toolbox_latency_ms,
+        },
+        "setup": {"load_chinook_s": load_s, "register_database_s": register_s},
+        "throughput_qps": len(question_spans) / elapsed if elapsed else 0.0,
+        "wall_time_s": elapsed,
+        "failed_questions": len(failed),
+        "failed_queries": len(execute_errors),
+        "question_latency": _latency_stats([s["duration_s"] for s in question_spans]),
+        "llm_turn_latency": _latency_stats([s["duration_s"] for s in recorder.spans if s["kind"] == "llm"]),
+        "tool_calls_per_question": (sum(tool_calls) / len(tool_calls)) if tool_calls else 0.0,
+        "tools": recorder.summary("tool"),
+        "refiner": _time_refiner(corpus),
+    }
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark on the bundled Chinook dataset.")
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS))
+    parser.add_argument("--dump", default=str(DEFAULT_DUMP), help="Path to chinook.sql.")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON results.")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the corpus this many times.")
+    parser.add_argument("--toolbox-latency-ms", type=float, default=0.0, help="Simulated MCP round-trip latency.")
+    parser.add_argument("--backend", choices=("toolbox", "native"), default="toolbox")
+    parser.add_argument("--verbose", action="store_true", help="Keep the agent's INFO logging.")
+    args = parser.parse_args(argv)
+    setup_logging("INFO" if args.verbose else "WARNING")
+
+    results = run_benchmark(args.corpus, args.dump, args.repeat, args.toolbox_latency_ms, backend=args.backend)
+    Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+
+    latency = results["question_latency"]
+    print(
+        f"{results['meta']['questions']} questions in {results['wall_time_s']:.2f}s "
+        f"({results['throughput_qps']:.1f} q/s); p50={latency['p50_ms']:.1f}ms p95={latency['p95_ms']:.1f}ms; "
+        f"{results['tool_calls_per_question']:.1f} tool calls/question; results in {args.output}"
+    )
+    return 1 if results["failed_questions"] or results["failed_queries"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
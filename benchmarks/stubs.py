@@ -0,0 +1,126 @@
+# stubs.py
+
+import asyncio
+import inspect
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, AsyncGenerator, Optional
+
+import yaml
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai.types import Content, FunctionCall, Part
+
+REFINED_QUERY_PLACEHOLDER = "$refined_query"
+
+class ScriptedLlm(BaseLlm):
+    """
+    A fake LLM that replays a fixed tool-call script per question.
+
+    The step to emit is the number of tool-response turns seen since the
+    user's question, so the script advances exactly like a real tool-calling
+    turn.
+    An argument equal to "$refined_query" is replaced by the last
+    query_refiner result.
+    """
+
+    scripts: dict[str, list[dict]]
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        question, turns = _current_turn(llm_request.contents)
+        steps = self.scripts.get(question, [{"final": "I don't know how to answer that."}])
+        step = steps[min(len(turns), len(steps) - 1)]
+
+        if "final" in step:
+            yield LlmResponse(content=Content(role="model", parts=[Part(text=step["final"])]))
+            return
+
+        # A step with "calls" issues several tool calls in one turn, which ADK runs concurrently
+        responses = [response for turn in turns for response in turn]
+        parts = [
+            Part(function_call=FunctionCall(name=call["tool"], args={
+                key: _last_refined_query(responses) if value == REFINED_QUERY_PLACEHOLDER else value
+                for key, value in call.get("args", {}).items()
+            }))
+            for call in step.get("calls", [step])
+        ]
+        yield LlmResponse(content=Content(role="model", parts=parts))
+
+def _current_turn(contents: list[Content]) -> tuple[Optional[str], list]:
+    """Returns the latest user question and the tool responses that followed it, grouped per model turn."""
+    turns = []
+    for content in reversed(contents):
+        responses = [part.function_response for part in content.parts or [] if part.function_response is not None]
+        if responses:
+            turns.append(responses)
+        elif content.role == "user" and any(part.text for part in content.parts or []):
+            return next(part.text for part in content.parts if part.text), list(reversed(turns))
+    return None, list(reversed(turns))
+
+def _last_refined_query(responses: list) -> Optional[str]:
+    for response in reversed(responses):
+        if response.name == "query_refiner":
+            return (response.response or {}).get("refined_query")
+    return None
+
+class StubToolboxClient:
+    """
+    In-process stand-in for the MCP Toolbox that serves the sqlite-sql tools
+    of a tools.yaml directly with sqlite3, optionally adding fake network latency.
+    """
+
+    def __init__(self, tools_yaml_path: str, latency_s: float = 0.0):
+        self.config = yaml.safe_load(Path(tools_yaml_path).read_text())
+        self.latency_s = latency_s
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        pass
+
+    async def load_toolset(self, name: Optional[str] = None) -> list:
+        tool_names = self.config["toolsets"][name] if name else list(self.config["tools"])
+        return [self._make_tool(tool_name) for tool_name in tool_names]
+
+    async def load_tool(self, name: str):
+        return self._make_tool(name)
+
+    def _make_tool(self, tool_name: str):
+        spec = self.config["tools"][tool_name]
+        source = self.config["sources"][spec["source"]]
+        if source["kind"] != "sqlite":
+            raise ValueError(f"StubToolboxClient only serves sqlite sources, not '{source['kind']}'")
+        template_params = spec.get("templateParameters", [])
+        bound_params = spec.get("parameters", [])
+        params = template_params + bound_params
+        statement = spec["statement"]
+
+        def execute(**kwargs) -> str:
+            sql = statement
+            for param in template_params:
+                sql = sql.replace(f"{{{{.{param['name']}}}}}", str(kwargs[param["name"]]))
+            conn = sqlite3.connect(source["database"])
+            conn.row_factory = sqlite3.Row
+            try:
+                rows = [dict(row) for row in conn.execute(sql.rstrip().rstrip(";"), [kwargs[p["name"]] for p in bound_params])]
+            finally:
+                conn.close()
+            return json.dumps(rows, default=str)
+
+        async def tool(**kwargs: Any) -> str:
+            if self.latency_s:
+                await asyncio.sleep(self.latency_s)
+            return await asyncio.to_thread(execute, **kwargs)
+
+        tool.__name__ = tool_name
+        tool.__doc__ = spec["description"]
+        tool.__signature__ = inspect.Signature(
+            [inspect.Parameter(p["name"], inspect.Parameter.KEYWORD_ONLY, annotation=str) for p in params],
+            return_annotation=str,
+        )
+        tool.__annotations__ = {p["name"]: str for p in params}
+        return tool
@@ -0,0 +1,43 @@
+import json
+import os
+import tempfile
+import unittest
+
+from benchmarks.chinook import load_chinook_sqlite
+from benchmarks.run_benchmark import DEFAULT_CORPUS, DEFAULT_DUMP, run_benchmark
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_load_chinook_sqlite(self):
+        import sqlite3
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "chinook.db")
+            tables = load_chinook_sqlite(DEFAULT_DUMP, db_path)
+            self.assertIn("Artist", tables)
+            conn = sqlite3.connect(db_path)
+            try:
+                self.assertGreater(conn.execute("SELECT COUNT(*) FROM track").fetchone()[0], 0)
+                fks = conn.execute("PRAGMA foreign_key_list(album)").fetchall()
+                self.assertTrue(any(fk[2] == "Artist" for fk in fks))
+            finally:
+                conn.close()
+
+    def test_run_benchmark_replays_corpus_offline(self):
+        with open(DEFAULT_CORPUS) as f:
+            corpus = json.load(f)
+        with tempfile.TemporaryDirectory() as tmp:
+            corpus_path = os.path.join(tmp, "corpus.json")
+            with open(corpus_path, "w") as f:
+                json.dump(corpus[:3], f)
+            results = run_benchmark(corpus_path)
+
+        self.assertEqual(results["meta"]["questions"], 3)
+        self.assertEqual(results["failed_questions"], 0)
+        self.assertEqual(results["failed_queries"], 0)
+        self.assertEqual(results["question_latency"]["count"], 3)
+        self.assertEqual(results["tool_calls_per_question"], 4)
+        self.assertEqual(results["tools"]["chinook_execute_query"]["count"], 3)
+        self.assertIn("warm_us_per_call", results["refiner"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+from agent import cli
+from benchmarks.import_time import HEAVY_PACKAGES, direct_imports, parse_importtime
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+class TestCli(unittest.TestCase):
+
+    def test_importing_the_cli_and_logger_stays_light(self):
+        code = (
+            "import logging, sys, agent.cli, utils.logger; "
+            f"print([p for p in {HEAVY_PACKAGES!r} if p in sys.modules], len(logging.getLogger().handlers))"
+        )
+        out = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout
+        self.assertEqual(out.strip(), "[] 0")
+
+    def test_register_passes_its_options_through(self):
+        with patch("utils.register_db.main", return_value=1) as register:
+            status = cli.main(["--log-level", "warning", "register", "chinook=sqlite:///c.db", "--workers", "4"])
+        self.assertEqual(status, 1)
+        register.assert_called_once_with(
+            ["chinook=sqlite:///c.db", "--workers", "4"], prog="python -m agent register", log_level="WARNING"
+        )
+
+    def test_ask_runs_one_question(self):
+        with patch("agent.mcp_toolbox_agent.main", new=AsyncMock(return_value=0)) as agent_main:
+            self.assertEqual(cli.main(["ask", "top", "artists", "@chinook", "--session-id", "nightly"]), 0)
+        agent_main.assert_awaited_once_with("top artists @chinook", session_id="nightly", log_level="INFO")
+
+        with self.assertRaises(SystemExit):
+            cli.main(["ask", "question", "--workers", "4"])
+
+    def test_import_time_parsing(self):
+        stderr = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:       100 |        100 | site",
+            "import time:        50 |         50 |   sqlalchemy.engine",
+            "import time:        20 |        170 | sqlalchemy",
+            "import time:        30 |         30 |   yaml",
+            "import time:        10 |         10 |     yaml.reader",
+            "import time:         5 |         45 | utils.register_db",
+        ])
+        entries = parse_importtime(stderr)
+        self.assertEqual(entries[1], ("sqlalchemy.engine", 1, 50))
+        self.assertEqual(direct_imports(entries, "utils.register_db"), [("yaml", 30)])
+
+if __name__ == "__main__":
+    unittest.main()
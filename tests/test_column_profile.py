@@ -0,0 +1,69 @@
+import random
+import unittest
+from collections import Counter
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, text
+
+from utils import column_profile
+from utils.column_profile import estimate_distinct, profile_column, profile_database, profile_table
+
+class TestColumnProfile(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        countries = ["USA", "Canada", "Brazil", "France"]
+        with self.engine.begin() as connection:
+            connection.execute(text("CREATE TABLE customer (id INTEGER PRIMARY KEY, country VARCHAR, fax VARCHAR)"))
+            connection.execute(
+                text("INSERT INTO customer (id, country, fax) VALUES (:id, :country, :fax)"),
+                [{"id": i, "country": countries[i % 4], "fax": None if i % 2 else f"+1 {i}"} for i in range(1, 1001)],
+            )
+
+    def test_small_table_is_profiled_exactly(self):
+        profiles = profile_database(self.engine, "sqlite", ["customer", "missing"], sample_rows=5000)
+        self.assertNotIn("missing", profiles)
+
+        profile = profiles["customer"]
+        self.assertEqual((profile["sampled_rows"], profile["estimated_rows"], profile["exact"]), (1000, 1000, True))
+        country = profile["columns"]["country"]
+        self.assertEqual((country["distinct"], country["min"], country["max"]), (4, "Brazil", "USA"))
+        self.assertEqual({v["value"] for v in country["top_values"]}, {"USA", "Canada", "Brazil", "France"})
+        self.assertEqual(profile["columns"]["fax"]["null_fraction"], 0.5)
+        # Unique values are never "common"
+        self.assertNotIn("top_values", profile["columns"]["id"])
+
+    def test_large_table_is_sampled(self):
+        with self.engine.connect() as connection:
+            profile = profile_table(connection, "sqlite", "customer", sample_rows=200, rng=random.Random(0))
+        self.assertEqual((profile["sampled_rows"], profile["estimated_rows"], profile["exact"]), (200, 1000, False))
+        self.assertEqual(profile["columns"]["country"]["distinct"], 4)
+        # All-unique samples scale up to the table size
+        self.assertEqual(profile["columns"]["id"]["distinct"], 1000)
+
+    def test_json_and_array_values_are_counted_by_their_json_text(self):
+        # What Postgres drivers return for jsonb and ARRAY columns
+        values = [{"b": 1, "a": [2]}, {"a": [2], "b": 1}, ["x"], None]
+        profile = profile_column(values, 4, True)
+        self.assertEqual(profile["distinct"], 2)
+        self.assertEqual(profile["top_values"], [{"value": '{"a": [2], "b": 1}', "fraction": 0.5}])
+        self.assertNotIn("min", profile)
+
+    def test_a_failing_column_keeps_the_rest_of_the_table(self):
+        original = column_profile.profile_column
+
+        def profile_or_fail(values, *args):
+            if "+1 2" in values:
+                raise TypeError("unhashable type")
+            return original(values, *args)
+
+        with patch("utils.column_profile.profile_column", side_effect=profile_or_fail):
+            profiles = profile_database(self.engine, "sqlite", ["customer"])
+        self.assertEqual(set(profiles["customer"]["columns"]), {"id", "country"})
+
+    def test_estimate_distinct(self):
+        self.assertEqual(estimate_distinct(Counter({"a": 50, "b": 50}), 100, 10_000), 2)
+        self.assertEqual(estimate_distinct(Counter(range(100)), 100, 10_000), 10_000)
+        self.assertEqual(estimate_distinct(Counter(range(100)), 100, None), 100)
+
+if __name__ == '__main__':
+    unittest.main()
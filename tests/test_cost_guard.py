@@ -0,0 +1,112 @@
+import json
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from tools.cost_guard import CostGuard, CostThresholds, has_top_level_limit, load_cost_thresholds, parse_explain
+
+class TestPlanParsing(unittest.TestCase):
+
+    def test_postgres_plan(self):
+        plan = [{"Plan": {"Node Type": "Nested Loop", "Total Cost": 5e9, "Plan Rows": 1e10, "Plans": [
+            {"Node Type": "Seq Scan", "Relation Name": "orders"},
+            {"Node Type": "Index Scan", "Relation Name": "customers"},
+        ]}}]
+        estimate = parse_explain("postgres", json.dumps([{"QUERY PLAN": plan}]))
+        self.assertEqual((estimate.cost, estimate.rows, estimate.full_scans), (5e9, 1e10, ["orders"]))
+
+    def test_mysql_plan(self):
+        plan = {"query_block": {"cost_info": {"query_cost": "1204.50"}, "nested_loop": [
+            {"table": {"table_name": "a", "access_type": "ALL", "rows_produced_per_join": 100}},
+            {"table": {"table_name": "b", "access_type": "ALL", "rows_produced_per_join": 10000}},
+        ]}}
+        estimate = parse_explain("mysql", [{"EXPLAIN": json.dumps(plan)}])
+        self.assertEqual((estimate.cost, estimate.rows, estimate.full_scans), (1204.5, 10000.0, ["a", "b"]))
+
+    def test_top_level_limit_detection(self):
+        self.assertTrue(has_top_level_limit("SELECT * FROM t ORDER BY id LIMIT 5"))
+        self.assertFalse(has_top_level_limit("SELECT * FROM (SELECT * FROM t LIMIT 5) s"))
+
+    def test_load_thresholds(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "cost_guard.yaml"
+            path.write_text("default: {limit_rows: 500}\ndatabases:\n  prod: {max_cost: 1000}\n")
+            thresholds = load_cost_thresholds(str(path))
+        self.assertEqual(thresholds["*"].limit_rows, 500)
+        self.assertEqual((thresholds["prod"].max_cost, thresholds["prod"].limit_rows), (1000, 500))
+
+class TestCostGuard(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self.tmp.name) / "big.db")
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(
+            "CREATE TABLE a (id INTEGER PRIMARY KEY, v TEXT);"
+            "CREATE TABLE b (id INTEGER PRIMARY KEY, v TEXT);"
+            # Large rowids make the tables look big without filling them
+            "INSERT INTO a (id, v) VALUES (1, 'x'), (200000, 'y');"
+            "INSERT INTO b (id, v) VALUES (1, 'x'), (200000, 'y');"
+        )
+        conn.close()
+        self.executed = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def big_execute_query(self, sql: str) -> str:
+        """Execute SQL on big."""
+        self.executed.append(sql)
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            return json.dumps([dict(row) for row in conn.execute(sql)])
+        finally:
+            conn.close()
+
+    async def test_cross_join_is_rejected(self):
+        guard = CostGuard({"*": CostThresholds(max_cost=1e9, max_rows=1e9)})
+        execute = guard.wrap_execute_tool(self.big_execute_query, "big", "sqlite")
+        result = await execute(sql="SELECT * FROM a, b")
+        self.assertIn("error", result)
+        self.assertEqual(result["full_table_scans"], ["a", "b"])
+        self.assertFalse(any(sql.startswith("SELECT * FROM a, b") for sql in self.executed))
+
+    async def test_large_scan_gets_a_limit(self):
+        guard = CostGuard({"big": CostThresholds(limit_rows=100)})
+        execute = guard.wrap_execute_tool(self.big_execute_query, "big", "sqlite")
+        rows = json.loads(await execute(sql="SELECT v FROM a ORDER BY id -- all of them"))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(self.executed[-1], "SELECT v FROM a ORDER BY id LIMIT 100")
+        self.assertEqual(guard.limited, 1)
+
+    async def test_queries_with_a_limit_pass_through(self):
+        guard = CostGuard({"*": CostThresholds(limit_rows=100)})
+        execute = guard.wrap_execute_tool(self.big_execute_query, "big", "sqlite")
+        await execute(sql="SELECT v FROM a LIMIT 1")
+        self.assertEqual(self.executed[-1], "SELECT v FROM a LIMIT 1")
+
+    async def test_table_sizes_are_cached_or_taken_from_the_catalog(self):
+        now = [0.0]
+        guard = CostGuard({"*": CostThresholds(limit_rows=100)}, table_size_ttl=60, clock=lambda: now[0])
+        execute = guard.wrap_execute_tool(self.big_execute_query, "big", "sqlite", table_rows={"B": 5})
+
+        def lookups():
+            return [sql for sql in self.executed if "MAX(rowid)" in sql]
+
+        await execute(sql="SELECT v FROM a")
+        await execute(sql="SELECT a.v FROM a, b")
+        self.assertEqual(lookups(), ['SELECT MAX(rowid) AS n FROM "a"'])
+        self.assertEqual(self.executed[-1], "SELECT a.v FROM a, b LIMIT 100")
+
+        # Small per the catalog, so no LIMIT and no lookup
+        await execute(sql="SELECT v FROM b")
+        self.assertEqual(self.executed[-1], "SELECT v FROM b")
+
+        now[0] = 61
+        await execute(sql="SELECT v FROM a")
+        self.assertEqual(len(lookups()), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import asyncio
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from google.adk.agents import Agent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai.types import Content, Part
+
+from benchmarks.stubs import ScriptedLlm
+from tools.db_toolset import ACTIVE_DB_KEYS_STATE, DatabaseToolset, extract_db_keys
+from utils.schema_catalog import SchemaCatalogStore
+
+def make_tool(name):
+    async def tool(sql: str) -> str:
+        return "[]"
+    tool.__name__ = name
+    tool.__doc__ = f"{name} tool"
+    return tool
+
+def context(question, state=None):
+    return SimpleNamespace(user_content=Content(role="user", parts=[Part(text=question)]), state={} if state is None else state)
+
+class TestDatabaseToolset(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.client = SimpleNamespace(load_toolset=AsyncMock(side_effect=self.load_toolset))
+        self.now = 0.0
+        self.toolset = DatabaseToolset(self.client, SchemaCatalogStore(self.tmp.name), clock=lambda: self.now)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def load_toolset(self, name):
+        if name == "missing_toolset":
+            raise ValueError("toolset not found")
+        db_key = name[: -len("_toolset")]
+        return [make_tool(f"{db_key}_list_tables"), make_tool(f"{db_key}_execute_query")]
+
+    def test_extract_db_keys(self):
+        self.assertEqual(extract_db_keys("join @sales and @hr, then @sales again"), ["sales", "hr"])
+        self.assertEqual(extract_db_keys("mail me@example.com"), [])
+
+    async def test_tools_are_loaded_lazily_and_scoped_per_turn(self):
+        tools = await self.toolset.get_tools(context("top artists in @chinook"))
+        self.assertEqual([t.name for t in tools], ["list_databases", "chinook_list_tables", "chinook_execute_query"])
+
+        tools = await self.toolset.get_tools(context("headcount in @hr"))
+        self.assertEqual([t.name for t in tools], ["list_databases", "hr_list_tables", "hr_execute_query"])
+
+        await self.toolset.get_tools(context("and again @chinook"))
+        self.assertEqual(self.client.load_toolset.await_count, 2)
+
+    async def test_follow_up_uses_remembered_db_keys(self):
+        state = {}
+        callback_context = context("top artists in @chinook", state)
+        self.toolset.remember_db_keys(callback_context)
+        self.assertEqual(state[ACTIVE_DB_KEYS_STATE], ["chinook"])
+
+        tools = await self.toolset.get_tools(context("only the first five", state))
+        self.assertIn("chinook_execute_query", [t.name for t in tools])
+
+    async def test_failed_toolset_is_retried_after_backoff(self):
+        tools = await self.toolset.get_tools(context("@missing"))
+        self.assertEqual([t.name for t in tools], ["list_databases"])
+        await self.toolset.get_tools(context("@missing"))
+        self.assertEqual(self.client.load_toolset.await_count, 1)
+
+        self.now += 60
+        await self.toolset.get_tools(context("@missing"))
+        self.assertEqual(self.client.load_toolset.await_count, 2)
+
+    async def test_tool_calls_of_one_turn_run_concurrently(self):
+        async def slow_query(sql: str) -> str:
+            await asyncio.sleep(0.2)
+            return "[]"
+        slow_query.__name__ = "chinook_execute_query"
+        self.client.load_toolset = AsyncMock(return_value=[slow_query])
+
+        question = "@chinook compare two years"
+        llm = ScriptedLlm(model="scripted", scripts={question: [
+            {"calls": [{"tool": "chinook_execute_query", "args": {"sql": f"SELECT {year}"}} for year in (2020, 2021, 2022)]},
+            {"final": "done"},
+        ]})
+        agent = Agent(name="agent", model=llm, tools=[self.toolset], before_agent_callback=self.toolset.remember_db_keys)
+        runner = Runner(app_name="app", agent=agent, session_service=InMemorySessionService())
+        await runner.session_service.create_session(app_name="app", user_id="u", session_id="s")
+
+        start = time.perf_counter()
+        events = [ev async for ev in runner.run_async(
+            user_id="u", session_id="s", new_message=Content(role="user", parts=[Part(text=question)])
+        )]
+        self.assertEqual(sum(len(ev.get_function_responses()) for ev in events), 3)
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+if __name__ == "__main__":
+    unittest.main()
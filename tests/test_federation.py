@@ -0,0 +1,147 @@
+import json
+import sqlite3
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from google.genai.types import Content, Part
+
+from tools.db_toolset import DatabaseToolset
+from tools.federation import FederatedSource, Federation
+from utils.schema_catalog import SchemaCatalogStore
+
+def sqlite_tool(script: str):
+    """An execute tool over an in-memory SQLite database, returning JSON rows like the toolbox does."""
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.executescript(script)
+    calls = []
+
+    async def execute_query(sql: str):
+        calls.append(sql)
+        try:
+            return json.dumps([dict(row) for row in conn.execute(sql)])
+        except sqlite3.Error as e:
+            return {"error": str(e)}
+    execute_query.calls = calls
+    return execute_query
+
+SALES = """
+CREATE TABLE orders (customer_id INTEGER, total REAL);
+INSERT INTO orders VALUES (1, 10.0), (1, 5.0), (2, 7.5), (3, 1.0);
+"""
+CRM = """
+CREATE TABLE customers (id INTEGER, name TEXT);
+INSERT INTO customers VALUES (1, 'Ada'), (2, 'Grace');
+"""
+
+class TestFederation(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tools = {"sales": sqlite_tool(SALES), "crm": sqlite_tool(CRM)}
+        self.federation = Federation(max_rows_per_source=3, max_result_rows=10)
+        self.federated_query = self.federation.build_tool(self.get_query_tool)
+
+    async def get_query_tool(self, db_key):
+        return self.tools.get(db_key)
+
+    async def test_joins_sources_from_different_databases(self):
+        result = await self.federated_query(
+            [
+                {"table": "spend", "db_key": "sales", "sql": "SELECT customer_id, SUM(total) AS total FROM orders GROUP BY customer_id;"},
+                FederatedSource(table="customers", db_key="crm", sql="SELECT id, name FROM customers"),
+            ],
+            "SELECT c.name, s.total FROM customers c JOIN spend s ON s.customer_id = c.id ORDER BY c.name",
+        )
+        self.assertEqual(result["columns"], ["name", "total"])
+        self.assertEqual(result["rows"], [["Ada", 15.0], ["Grace", 7.5]])
+        self.assertFalse(result["truncated"])
+        self.assertEqual(result["sources"]["spend"], {"db_key": "sales", "rows": 3, "truncated": False})
+
+    async def test_sources_are_capped(self):
+        result = await self.federated_query(
+            [FederatedSource(table="orders", db_key="sales", sql="SELECT * FROM orders")],
+            "SELECT COUNT(*) AS n FROM orders",
+        )
+        self.assertEqual(result["rows"], [[3]])
+        self.assertEqual(result["sources"]["orders"], {"db_key": "sales", "rows": 3, "truncated": True})
+        self.assertIn("LIMIT 4", self.tools["sales"].calls[0])
+
+    async def test_empty_sources_join_as_empty_tables(self):
+        sources = [
+            FederatedSource(table="customers", db_key="crm", sql="SELECT id, name FROM customers"),
+            FederatedSource(table="refunds", db_key="sales", sql="SELECT customer_id, total FROM orders WHERE total < 0"),
+        ]
+        result = await self.federated_query(
+            sources,
+            "SELECT c.name, r.total FROM customers AS c LEFT JOIN refunds r ON r.customer_id = c.id "
+            "WHERE r.customer_id IS NULL ORDER BY name",
+        )
+        self.assertNotIn("error", result)
+        self.assertEqual(result["rows"], [["Ada", None], ["Grace", None]])
+        self.assertEqual(result["empty_sources"], ["refunds"])
+        self.assertEqual(result["sources"]["refunds"]["rows"], 0)
+
+        result = await self.federated_query(sources, "SELECT COUNT(*) AS n FROM refunds WHERE total > 0")
+        self.assertEqual(result["rows"], [[0]])
+
+    async def test_failed_sub_queries_are_reported(self):
+        result = await self.federated_query(
+            [
+                FederatedSource(table="orders", db_key="sales", sql="SELECT missing FROM orders"),
+                FederatedSource(table="people", db_key="hr", sql="SELECT * FROM people"),
+                FederatedSource(table="customers", db_key="crm", sql="SELECT * FROM customers"),
+            ],
+            "SELECT 1",
+        )
+        self.assertEqual(set(result["sources"]), {"orders", "people"})
+        self.assertIn("no such column", result["sources"]["orders"]["error"])
+        self.assertIn("list_databases", result["sources"]["people"]["error"])
+
+    async def test_sources_must_be_reads_with_distinct_table_names(self):
+        cases = [
+            ([FederatedSource(table="orders", db_key="sales", sql="DELETE FROM orders")], "must be a SELECT"),
+            ([FederatedSource(table="o; DROP", db_key="sales", sql="SELECT 1")], "Invalid table name"),
+            ([FederatedSource(table="t", db_key="sales", sql="SELECT 1"), FederatedSource(table="T", db_key="crm", sql="SELECT 1")], "own table name"),
+        ]
+        for sources, message in cases:
+            result = await self.federated_query(sources, "SELECT 1")
+            self.assertIn(message, result["error"])
+        self.assertEqual(self.tools["sales"].calls, [])
+
+    async def test_final_query_cannot_write_or_attach(self):
+        sources = [FederatedSource(table="customers", db_key="crm", sql="SELECT * FROM customers")]
+        for sql in ("DELETE FROM customers", "ATTACH DATABASE 'other.db' AS other"):
+            result = await self.federated_query(sources, sql)
+            self.assertIn("Federated query failed", result["error"])
+
+class TestFederatedQueryTool(unittest.IsolatedAsyncioTestCase):
+
+    async def test_offered_only_for_questions_about_several_databases(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            async def load_toolset(name):
+                db_key = name[: -len("_toolset")]
+                if db_key not in ("sales", "crm"):
+                    raise ValueError("toolset not found")
+                execute = sqlite_tool(SALES if db_key == "sales" else CRM)
+                execute.__name__ = f"{db_key}_execute_query"
+                return [execute]
+
+            client = SimpleNamespace(load_toolset=AsyncMock(side_effect=load_toolset))
+            toolset = DatabaseToolset(client, SchemaCatalogStore(tmp), federation=Federation())
+
+            def context(question):
+                return SimpleNamespace(user_content=Content(role="user", parts=[Part(text=question)]), state={})
+
+            tools = await toolset.get_tools(context("orders in @sales"))
+            self.assertNotIn("federated_query", [t.name for t in tools])
+            tools = await toolset.get_tools(context("spend per customer name, @sales and @crm"))
+            self.assertEqual(tools[-1].name, "federated_query")
+
+            query = await toolset.query_tool("crm")
+            self.assertEqual(json.loads(await query(sql="SELECT name FROM customers WHERE id = 2")), [{"name": "Grace"}])
+            self.assertIsNone(await toolset.query_tool("missing"))
+
+if __name__ == "__main__":
+    unittest.main()
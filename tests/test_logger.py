@@ -0,0 +1,47 @@
+import json
+import logging
+import queue
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils.logger import DroppingQueueHandler, LogPayload, flush_logging, sample_payload, setup_logging, stop_logging
+
+class ExplodingPayload:
+    def __str__(self):
+        raise AssertionError("payload rendered on the caller's thread")
+
+class TestLogger(unittest.TestCase):
+
+    def tearDown(self):
+        setup_logging()
+
+    def test_sample_payload(self):
+        sampled = sample_payload({"rows": [[i, "x" * 50] for i in range(100)]}, max_chars=10, max_items=2)
+        self.assertEqual(sampled, {"rows": [[0, "x" * 10 + "... (40 more chars)"], [1, "x" * 10 + "... (40 more chars)"], "... 98 more items"]})
+        self.assertLessEqual(len(str(LogPayload("y" * 10_000, max_chars=100))), 130)
+
+    def test_queue_handler_defers_formatting_and_drops_when_full(self):
+        handler = DroppingQueueHandler(queue.Queue(1))
+        for _ in range(3):
+            handler.handle(logging.makeLogRecord({"msg": "%s", "args": (ExplodingPayload(),)}))
+        self.assertEqual((handler.queue.qsize(), handler.dropped), (1, 2))
+
+    def test_jsonl_sink(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "log.jsonl"
+            setup_logging(jsonl_path=str(path))
+            payload = LogPayload({"rows": list(range(1000))}, max_chars=50, max_items=3)
+            logging.getLogger("tests.logger").info(
+                "Response from %s:\n %s", "db_execute_query", payload, extra={"tool": "db_execute_query", "response": payload}
+            )
+            flush_logging()
+            stop_logging()
+            entry = json.loads(path.read_text().splitlines()[-1])
+
+        self.assertEqual(entry["tool"], "db_execute_query")
+        self.assertEqual(entry["response"], {"rows": [0, 1, 2, "... 997 more items"]})
+        self.assertIn("997 more items", entry["message"])
+
+if __name__ == "__main__":
+    unittest.main()
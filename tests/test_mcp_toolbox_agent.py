@@ -1,9 +1,16 @@
 import unittest
+import io
 import os
-from unittest.mock import patch, MagicMock, AsyncMock
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock, AsyncMock, ANY
 import asyncio
 
-from agent.mcp_toolbox_agent import get_llm, build_runner_and_client
+from google.adk.sessions import InMemorySessionService
+
+from agent.mcp_toolbox_agent import APP_NAME, USER_ID, answer_question, get_llm, build_runner_and_client, main
+from utils.logger import stop_logging
+from utils.session_store import BoundedSessionService
 
 class TestMcpToolboxAgent(unittest.IsolatedAsyncioTestCase):
 
@@ -26,7 +33,7 @@ class TestMcpToolboxAgent(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(llm, "gemini-2.5-flash")
 
     @patch('agent.mcp_toolbox_agent.ToolboxClient')
-    @patch('agent.mcp_toolbox_agent.InMemorySessionService')
+    @patch('agent.mcp_toolbox_agent.BoundedSessionService')
     @patch('agent.mcp_toolbox_agent.Agent')
     @patch('agent.mcp_toolbox_agent.Runner')
     @patch('agent.mcp_toolbox_agent.query_refiner')
@@ -37,13 +44,15 @@ class TestMcpToolboxAgent(unittest.IsolatedAsyncioTestCase):
         # Mock the async methods and properties
         mock_toolbox_client.return_value.__aenter__ = AsyncMock()
         mock_toolbox_client.return_value.load_toolset = AsyncMock(return_value=[])
+        mock_toolbox_client.return_value.close = AsyncMock()
+        mock_session_service.return_value.get_session = AsyncMock(return_value=None)
         mock_session_service.return_value.create_session = AsyncMock()
 
         # Run the function
         runner, client = await build_runner_and_client()
 
         # Assertions
-        mock_toolbox_client.assert_called_once_with("http://127.0.0.1:5000")
+        mock_toolbox_client.assert_called_once_with("http://127.0.0.1:5000", session=ANY)
         mock_session_service.assert_called_once()
         mock_agent.assert_called_once()
         mock_runner.assert_called_once()
@@ -52,9 +61,10 @@ class TestMcpToolboxAgent(unittest.IsolatedAsyncioTestCase):
         agent_args, agent_kwargs = mock_agent.call_args
         self.assertIn('tools', agent_kwargs)
         self.assertIn(mock_query_refiner, agent_kwargs['tools'])
+        await client.close()
 
     @patch('agent.mcp_toolbox_agent.ToolboxClient')
-    @patch('agent.mcp_toolbox_agent.InMemorySessionService')
+    @patch('agent.mcp_toolbox_agent.BoundedSessionService')
     @patch('agent.mcp_toolbox_agent.Agent')
     @patch('agent.mcp_toolbox_agent.Runner')
     async def test_agent_instruction(self, mock_runner, mock_agent, mock_session_service, mock_toolbox_client):
@@ -63,14 +73,61 @@ class TestMcpToolboxAgent(unittest.IsolatedAsyncioTestCase):
         """
         mock_toolbox_client.return_value.__aenter__ = AsyncMock()
         mock_toolbox_client.return_value.load_toolset = AsyncMock(return_value=[])
+        mock_toolbox_client.return_value.close = AsyncMock()
+        mock_session_service.return_value.get_session = AsyncMock(return_value=None)
         mock_session_service.return_value.create_session = AsyncMock()
 
-        await build_runner_and_client()
+        runner, client = await build_runner_and_client()
+        await client.close()
 
         agent_args, agent_kwargs = mock_agent.call_args
         self.assertIn('instruction', agent_kwargs)
         self.assertIn("You are a multi-DB text-to-SQL agent.", agent_kwargs['instruction'])
 
+    async def test_ask_prints_only_the_answer(self):
+        """
+        Tests that a one-shot question prints just its answer on stdout and fails without one.
+        """
+        for answer, status in (("42 artists", 0), (None, 1)):
+            class FakeRunner:
+                session_service = InMemorySessionService()
+
+                async def run_async(self, new_message, user_id, session_id):
+                    content = MagicMock(parts=[MagicMock(text=answer)])
+                    yield SimpleNamespace(
+                        invocation_id="inv", content=content, is_final_response=lambda: True,
+                        get_function_calls=lambda: [], get_function_responses=lambda: [],
+                    )
+
+            client = MagicMock(close=AsyncMock())
+            stdout = io.StringIO()
+            with patch('agent.mcp_toolbox_agent.build_runner_and_client', AsyncMock(return_value=(FakeRunner(), client))), \
+                    redirect_stdout(stdout):
+                self.assertEqual(await main("how many artists in @chinook?"), status)
+                stop_logging()
+            self.assertEqual(stdout.getvalue(), f"{answer}\n" if answer else "")
+
+    async def test_evicted_cli_sessions_are_recreated(self):
+        """
+        Tests that a question after a long pause starts a new session instead of failing.
+        """
+        service = BoundedSessionService(idle_seconds=60)
+
+        class FakeRunner:
+            session_service = service
+
+            async def run_async(self, new_message, user_id, session_id):
+                if await service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id) is None:
+                    raise ValueError("Session not found")
+                yield SimpleNamespace(
+                    invocation_id="inv", content=MagicMock(parts=[MagicMock(text="ok")]), is_final_response=lambda: True,
+                    get_function_calls=lambda: [], get_function_responses=lambda: [],
+                )
+
+        self.assertEqual(await answer_question(FakeRunner(), "q1", session_id="s"), "ok")
+        session = service.sessions[APP_NAME][USER_ID]["s"]
+        session.last_update_time -= 120
+        self.assertEqual(await answer_question(FakeRunner(), "q2", session_id="s"), "ok")
 
 if __name__ == '__main__':
     unittest.main()
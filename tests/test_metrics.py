@@ -0,0 +1,78 @@
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from utils.metrics import MetricsRecorder, percentile
+
+class TestMetricsRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = MetricsRecorder()
+        self.callbacks = self.metrics.adk_callbacks()
+
+    def call_tool(self, call_id, name, response):
+        tool = SimpleNamespace(name=name)
+        ctx = SimpleNamespace(function_call_id=call_id, invocation_id="inv-1")
+        self.callbacks["before_tool_callback"](tool, {"sql": "SELECT 1"}, ctx)
+        self.callbacks["after_tool_callback"](tool, {"sql": "SELECT 1"}, ctx, response)
+
+    def test_tool_spans_capture_db_key_bytes_and_rows(self):
+        self.call_tool("c1", "chinook_execute_query", {"result": json.dumps([{"a": 1}, {"a": 2}])})
+        span = self.metrics.spans[0]
+        self.assertEqual(span["kind"], "tool")
+        self.assertEqual(span["db_key"], "chinook")
+        self.assertEqual(span["rows"], 2)
+        self.assertGreater(span["response_bytes"], 0)
+
+    def test_llm_spans_and_failed_invocations(self):
+        ctx = SimpleNamespace(invocation_id="inv-2")
+        self.callbacks["before_model_callback"](ctx, SimpleNamespace(model="gemini-2.5-flash"))
+        self.callbacks["after_model_callback"](ctx, SimpleNamespace(usage_metadata=None))
+        self.assertEqual(self.metrics.spans[0]["name"], "gemini-2.5-flash")
+
+        with self.assertRaises(RuntimeError):
+            with self.metrics.span("question", "question") as span:
+                span["invocation_id"] = "inv-3"
+                self.metrics.start("dangling", "tool", "x", invocation_id="inv-3")
+                raise RuntimeError("boom")
+        self.assertEqual(self.metrics.spans[-1]["error"], "RuntimeError")
+        self.assertEqual(self.metrics._open, {})
+
+    def test_summary_and_exports(self):
+        for i in range(10):
+            self.call_tool(f"c{i}", "chinook_list_tables", {"result": "[]"})
+        summary = self.metrics.summary("tool")["chinook_list_tables"]
+        self.assertEqual(summary["count"], 10)
+        self.assertLessEqual(summary["p50"], summary["p99"])
+
+        text = self.metrics.to_prometheus()
+        self.assertIn('text2sql_span_duration_seconds{kind="tool",name="chinook_list_tables",quantile="0.95"}', text)
+        self.assertIn('text2sql_span_duration_seconds_count{kind="tool",name="chinook_list_tables"} 10', text)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "spans.jsonl")
+            self.assertEqual(self.metrics.export_jsonl(path), 10)
+            with open(path) as f:
+                self.assertEqual(json.loads(f.readline())["name"], "chinook_list_tables")
+
+    def test_prometheus_counters_survive_span_eviction(self):
+        self.metrics = MetricsRecorder(max_spans=3)
+        self.callbacks = self.metrics.adk_callbacks()
+        for i in range(5):
+            self.call_tool(f"c{i}", "chinook_execute_query", [{"a": 1}, {"a": 2}])
+        self.assertEqual(len(self.metrics.spans), 3)
+
+        text = self.metrics.to_prometheus()
+        self.assertIn('text2sql_span_duration_seconds_count{kind="tool",name="chinook_execute_query"} 5', text)
+        self.assertIn('text2sql_tool_rows_total{name="chinook_execute_query"} 10', text)
+
+    def test_percentile_nearest_rank(self):
+        values = [float(v) for v in range(1, 101)]
+        self.assertEqual(percentile(values, 0.5), 50.0)
+        self.assertEqual(percentile(values, 0.99), 99.0)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai.types import Content, FunctionCall, Part
+
+from tools.model_router import ANSWERED_BY_STATE, STRONG, ModelRouter, ToolErrorPlugin, load_routing_policies
+
+def context(invocation_id: str = "inv", **state):
+    return SimpleNamespace(invocation_id=invocation_id, state={"active_db_keys": ["chinook"], **state})
+
+def text_response(text: str) -> LlmResponse:
+    return LlmResponse(content=Content(role="model", parts=[Part(text=text)]))
+
+class TestModelRouter(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.router = ModelRouter("flash", "pro")
+        callbacks = self.router.adk_callbacks()
+        self.before_model = callbacks["before_model_callback"]
+        self.after_model = callbacks["after_model_callback"]
+        self.before_tool = callbacks["before_tool_callback"]
+        self.after_tool = callbacks["after_tool_callback"]
+        self.tool = SimpleNamespace(name="chinook_execute_query")
+
+    def model_for(self, ctx) -> str:
+        request = LlmRequest(model="pro")
+        self.before_model(ctx, request)
+        return request.model
+
+    def test_load_routing_policies(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "routing.yaml"
+            path.write_text("default:\n  max_failures: 2\ndatabases:\n  warehouse:\n    start_tier: strong\n")
+            policies = load_routing_policies(str(path))
+            path.write_text("default:\n  start_tier: medium\n")
+            with self.assertRaises(ValueError):
+                load_routing_policies(str(path))
+
+        self.assertEqual((policies["*"].start_tier, policies["*"].max_failures), ("fast", 2))
+        self.assertEqual((policies["warehouse"].start_tier, policies["warehouse"].max_failures), ("strong", 2))
+        router = ModelRouter("flash", "pro", policies)
+        self.assertEqual(router.policy(["chinook", "warehouse"]).start_tier, STRONG)
+
+    def test_fast_tier_answers_simple_questions(self):
+        ctx = context()
+        self.assertEqual(self.model_for(ctx), "flash")
+        self.after_tool(self.tool, {"sql": "SELECT 1"}, ctx, "[]")
+        self.assertEqual(self.model_for(ctx), "flash")
+        self.after_model(ctx, text_response("One row."))
+        self.assertEqual(ctx.state[ANSWERED_BY_STATE], "fast")
+        self.assertEqual(self.router.summary(), {"answered": {"fast": 1}, "escalations": {}})
+
+    def test_escalates_on_validation_failure_and_loops(self):
+        ctx = context()
+        self.model_for(ctx)
+        self.after_model(ctx, LlmResponse(content=Content(role="model", parts=[Part(function_call=FunctionCall(name="x"))])))
+        self.after_tool(self.tool, {"sql": "SELECT Titel FROM Album"}, ctx, {"error": "unknown column", "problems": []})
+        self.assertEqual(self.model_for(ctx), "pro")
+        self.after_model(ctx, text_response("Done."))
+        self.assertEqual(ctx.state[ANSWERED_BY_STATE], "strong")
+
+        looping = context("loop")
+        for _ in range(3):
+            self.assertEqual(self.model_for(looping), "flash")
+            self.before_tool(self.tool, {"sql": "SELECT 1"}, looping)
+        self.assertEqual(self.model_for(looping), "pro")
+        self.assertEqual(self.router.escalations, {"validation_error": 1, "tool_loop": 1})
+
+    async def test_raised_tool_errors_escalate_within_the_question(self):
+        ctx = context()
+        self.model_for(ctx)
+        response = await ToolErrorPlugin().on_tool_error_callback(
+            tool=self.tool, tool_args={"sql": "SELECT Titel FROM Album"}, tool_context=ctx,
+            error=RuntimeError("no such column: Titel"),
+        )
+        self.assertEqual(response, {"error": "RuntimeError: no such column: Titel"})
+        self.after_tool(self.tool, {"sql": "SELECT Titel FROM Album"}, ctx, response)
+        self.assertEqual(self.model_for(ctx), "pro")
+        self.assertEqual(self.router.escalations, {"tool_error": 1})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+
+from tools.native_tools import NativeToolbox
+from utils.helpers import get_source_url, get_transaction_guard_statements
+from utils.register_db import register_database
+
+class TestNativeToolbox(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        db_path = Path(self.tmp.name) / "shop.db"
+        engine = create_engine(f"sqlite:///{db_path}")
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE item (id INTEGER PRIMARY KEY, name VARCHAR)"))
+            connection.execute(text("INSERT INTO item (name) VALUES ('pen'), ('ink')"))
+        engine.dispose()
+        self.tools_yaml = str(Path(self.tmp.name) / "tools.yaml")
+        register_database(self.tools_yaml, "shop", f"sqlite:///{db_path}")
+        self.toolbox = NativeToolbox(self.tools_yaml, statement_timeout=5)
+        self.tools = {tool.__name__: tool for tool in await self.toolbox.load_toolset("shop_toolset")}
+
+    async def asyncTearDown(self):
+        await self.toolbox.close()
+        self.tmp.cleanup()
+
+    async def test_tools_mirror_the_toolset(self):
+        self.assertEqual(set(self.tools), {"shop_list_tables", "shop_describe_table", "shop_describe_tables", "shop_execute_query"})
+        self.assertEqual(json.loads(await self.tools["shop_list_tables"]()), [{"table_name": "item"}])
+        columns = json.loads(await self.tools["shop_describe_table"](table="item"))
+        self.assertEqual([c["column_name"] for c in columns], ["id", "name"])
+        columns = json.loads(await self.tools["shop_describe_tables"](tables="item"))
+        self.assertEqual([(c["column_name"], c["primary_key"]) for c in columns], [("id", True), ("name", False)])
+
+    async def test_execute_query_returns_json_rows_and_is_read_only(self):
+        rows = json.loads(await self.tools["shop_execute_query"](sql="SELECT name FROM item ORDER BY id;"))
+        self.assertEqual(rows, [{"name": "pen"}, {"name": "ink"}])
+        with self.assertRaises(RuntimeError):
+            await self.tools["shop_execute_query"](sql="DELETE FROM item")
+        rows = json.loads(await self.tools["shop_execute_query"](sql="SELECT COUNT(*) AS n FROM item"))
+        self.assertEqual(rows, [{"n": 2}])
+
+    async def test_fetch_page_streams_a_bounded_page(self):
+        page = await self.toolbox.fetch_page("shop_execute_query", "SELECT name FROM item ORDER BY id", 1, 10, 1024)
+        self.assertEqual(page.columns, ["name"])
+        self.assertEqual(page.rows, [["ink"]])
+        self.assertEqual(page.total_rows, 2)
+
+    async def test_statement_timeout_interrupts_sqlite(self):
+        toolbox = NativeToolbox(self.tools_yaml, statement_timeout=0.05)
+        [execute] = [t for t in await toolbox.load_toolset("shop_toolset") if t.__name__ == "shop_execute_query"]
+        endless = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n"
+        try:
+            with self.assertRaises(RuntimeError):
+                await execute(sql=endless)
+        finally:
+            await toolbox.close()
+
+    def test_helpers(self):
+        url = get_source_url({"kind": "postgres", "host": "db", "port": 5432, "user": "u", "password": "pw", "database": "d"})
+        self.assertEqual(url.render_as_string(hide_password=False), "postgresql://u:pw@db:5432/d")
+        self.assertEqual(
+            get_transaction_guard_statements("postgres", 1500, read_only=True),
+            ["SET TRANSACTION READ ONLY", "SET LOCAL statement_timeout = 1500"],
+        )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import json
+import unittest
+
+from tools.pagination import PageTokenStore, QueryPager, collect_page
+
+class TestCollectPage(unittest.TestCase):
+
+    def test_row_cap_and_bounded_count(self):
+        page = collect_page(["n"], ((i,) for i in range(100)), max_rows=10, count_scan_limit=20)
+        self.assertEqual(page.rows, [[i] for i in range(10)])
+        self.assertTrue(page.has_more)
+        self.assertEqual(page.total_rows, 30)
+        self.assertFalse(page.total_is_exact)
+
+    def test_byte_cap_keeps_at_least_one_row(self):
+        page = collect_page(["s"], [("x" * 100,), ("y" * 100,)], max_bytes=10)
+        self.assertEqual(len(page.rows), 1)
+        self.assertTrue(page.has_more)
+        self.assertEqual(page.total_rows, 2)
+        self.assertTrue(page.total_is_exact)
+
+    def test_offset_and_non_json_values(self):
+        from decimal import Decimal
+        page = collect_page(["v"], [(Decimal("1.5"),), (Decimal("2.5"),)], offset=1)
+        self.assertEqual(page.rows, [["2.5"]])
+        self.assertFalse(page.has_more)
+
+class TestQueryPager(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.calls = 0
+
+        async def shop_execute_query(sql: str) -> str:
+            """Execute arbitrary SQL on shop."""
+            self.calls += 1
+            if sql.startswith("UPDATE"):
+                return json.dumps({"rows_affected": 3})
+            return json.dumps([{"id": i, "name": f"item{i}"} for i in range(5)])
+
+        self.now = 0.0
+        self.pager = QueryPager(max_rows=2, tokens=PageTokenStore(ttl_seconds=60, clock=lambda: self.now))
+        self.execute, self.fetch_page = self.pager.build_tools("shop", shop_execute_query)
+
+    async def test_pages_are_columnar_with_continuation_tokens(self):
+        self.assertEqual(self.execute.__name__, "shop_execute_query")
+        self.assertEqual(self.fetch_page.__name__, "shop_fetch_page")
+
+        first = await self.execute(sql="SELECT * FROM item ORDER BY id")
+        self.assertEqual(first["columns"], ["id", "name"])
+        self.assertEqual(first["rows"], [[0, "item0"], [1, "item1"]])
+        self.assertEqual(first["total_rows"], 5)
+
+        second = await self.fetch_page(token=first["next_token"])
+        self.assertEqual(second["offset"], 2)
+        last = await self.fetch_page(token=second["next_token"])
+        self.assertEqual(last["rows"], [[4, "item4"]])
+        self.assertIsNone(last["next_token"])
+
+    async def test_expired_tokens_and_non_result_responses(self):
+        first = await self.execute(sql="SELECT * FROM item")
+        self.now += 61
+        self.assertIn("error", await self.fetch_page(token=first["next_token"]))
+        self.assertEqual(await self.execute(sql="UPDATE item SET name = 'x'"), json.dumps({"rows_affected": 3}))
+
+if __name__ == "__main__":
+    unittest.main()
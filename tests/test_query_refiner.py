@@ -0,0 +1,54 @@
+import unittest
+
+from tools.query_refiner import _refine, query_refiner, tokenize
+
+class TestQueryRefiner(unittest.TestCase):
+
+    def refine(self, query, db_type):
+        return query_refiner(query, db_type)["refined_query"]
+
+    def test_quotes_identifiers_per_dialect(self):
+        self.assertEqual(self.refine("SELECT Title FROM Album", "postgres"), 'SELECT "Title" FROM "Album"')
+        self.assertEqual(self.refine("SELECT Title FROM Album", "mysql"), "SELECT `Title` FROM `Album`")
+        self.assertEqual(self.refine("SELECT Title FROM Album", "sqlite"), "SELECT `Title` FROM `Album`")
+
+    def test_literals_and_comments_are_untouched(self):
+        query = "SELECT name FROM t WHERE name = 'O''Brien' -- note here\n/* block */"
+        self.assertEqual(
+            self.refine(query, "postgres"),
+            "SELECT \"name\" FROM \"t\" WHERE \"name\" = 'O''Brien' -- note here\n/* block */",
+        )
+        self.assertEqual(
+            self.refine("SELECT a FROM t WHERE b = $x$ it's $x$ AND c = $$raw$$", "postgres"),
+            "SELECT \"a\" FROM \"t\" WHERE \"b\" = $x$ it's $x$ AND \"c\" = $$raw$$",
+        )
+        self.assertEqual(self.refine("SELECT a FROM t WHERE b = 'it\\'s' # c", "mysql"), "SELECT `a` FROM `t` WHERE `b` = 'it\\'s' # c")
+
+    def test_functions_and_qualified_names(self):
+        self.assertEqual(
+            self.refine("SELECT lower(a.name), count(*) FROM public.artist a", "postgres"),
+            'SELECT lower("a"."name"), count(*) FROM "public"."artist" "a"',
+        )
+        self.assertEqual(
+            self.refine("SELECT strftime('%Y', InvoiceDate) FROM Invoice", "sqlite"),
+            "SELECT strftime('%Y', `InvoiceDate`) FROM `Invoice`",
+        )
+
+    def test_type_names_in_casts(self):
+        self.assertEqual(
+            self.refine("SELECT CAST(Total AS DECIMAL(10,2)), d::timestamp with time zone FROM Invoice", "postgres"),
+            'SELECT CAST("Total" AS DECIMAL(10,2)), "d"::timestamp with time zone FROM "Invoice"',
+        )
+
+    def test_tokens_round_trip(self):
+        query = "SELECT \"x\", y FROM t WHERE z = ? -- done"
+        self.assertEqual("".join(text for _, text in tokenize(query, "sqlite")), query)
+
+    def test_repeated_queries_hit_the_cache(self):
+        _refine.cache_clear()
+        self.refine("SELECT a FROM b", "postgresql")
+        self.refine("SELECT a FROM b", "postgres")
+        self.assertEqual(_refine.cache_info().hits, 1)
+
+if __name__ == '__main__':
+    unittest.main()
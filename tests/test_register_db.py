@@ -3,9 +3,13 @@ import unittest
 import yaml
 import os
 import shutil
+import subprocess
+import sys
+import time
 from pathlib import Path
 from sqlalchemy import create_engine, text
-from utils.register_db import register_database
+from utils.register_db import introspect_database, register_database, register_databases, watch_databases
+from utils.schema_catalog import get_catalog_path, read_schema_catalog
 
 class TestRegisterDB(unittest.TestCase):
     def setUp(self):
@@ -36,11 +40,126 @@ class TestRegisterDB(unittest.TestCase):
         self.assertIn("tools", config)
         self.assertIn(f"{self.db_key}_list_tables", config["tools"])
         self.assertIn(f"{self.db_key}_describe_table", config["tools"])
+        self.assertIn(f"{self.db_key}_describe_tables", config["tools"])
         self.assertIn(f"{self.db_key}_execute_query", config["tools"])
 
         self.assertIn("toolsets", config)
         self.assertIn(f"{self.db_key}_toolset", config["toolsets"])
-        self.assertEqual(len(config["toolsets"][f"{self.db_key}_toolset"]), 3)
+        self.assertEqual(len(config["toolsets"][f"{self.db_key}_toolset"]), 4)
+
+    def test_describe_tables_statement_runs_on_sqlite(self):
+        with self.engine.begin() as connection:
+            connection.execute(text("CREATE TABLE orders (id INTEGER PRIMARY KEY, test_id INTEGER REFERENCES test_table(id))"))
+        register_database(str(self.tools_yaml_path), self.db_key, self.db_url)
+        tool = yaml.safe_load(self.tools_yaml_path.read_text())["tools"][f"{self.db_key}_describe_tables"]
+
+        with self.engine.connect() as connection:
+            rows = connection.exec_driver_sql(tool["statement"].rstrip(";"), ("Orders, test_table",)).fetchall()
+        self.assertEqual(
+            [tuple(row) for row in rows],
+            [("orders", "id", "INTEGER", 1, None), ("orders", "test_id", "INTEGER", 0, "test_table.id"),
+             ("test_table", "id", "INTEGER", 0, None), ("test_table", "name", "VARCHAR", 0, None)],
+        )
+
+    def test_register_writes_schema_catalog(self):
+        register_database(str(self.tools_yaml_path), self.db_key, self.db_url)
+        catalog_path = get_catalog_path(str(self.tools_yaml_path), self.db_key)
+        catalog = read_schema_catalog(catalog_path)
+
+        self.assertEqual(catalog["db_key"], self.db_key)
+        self.assertEqual(catalog["kind"], "sqlite")
+        columns = [c["name"] for c in catalog["tables"]["test_table"]["columns"]]
+        self.assertEqual(columns, ["id", "name"])
+
+        # Re-registering an unchanged schema keeps the same fingerprint and file
+        mtime = catalog_path.stat().st_mtime_ns
+        register_database(str(self.tools_yaml_path), self.db_key, self.db_url)
+        self.assertEqual(read_schema_catalog(catalog_path)["fingerprint"], catalog["fingerprint"])
+        self.assertEqual(catalog_path.stat().st_mtime_ns, mtime)
+
+    def test_reregistration_only_reflects_changed_tables(self):
+        register_database(str(self.tools_yaml_path), self.db_key, self.db_url)
+        catalog_path = get_catalog_path(str(self.tools_yaml_path), self.db_key)
+        previous = read_schema_catalog(catalog_path)
+
+        unchanged = introspect_database(self.db_key, self.db_url, previous_catalog=previous)
+        self.assertFalse(unchanged["diff"])
+        self.assertIs(unchanged["catalog"], previous)
+
+        with self.engine.begin() as connection:
+            connection.execute(text("ALTER TABLE test_table ADD COLUMN email VARCHAR"))
+            connection.execute(text("CREATE TABLE orders (id INTEGER PRIMARY KEY)"))
+        yaml_mtime = self.tools_yaml_path.stat().st_mtime_ns
+        registration = introspect_database(self.db_key, self.db_url, previous_catalog=previous)
+        self.assertEqual(
+            (registration["diff"].added, registration["diff"].changed, registration["diff"].removed),
+            (["orders"], ["test_table"], []),
+        )
+        columns = [c["name"] for c in registration["catalog"]["tables"]["test_table"]["columns"]]
+        self.assertEqual(columns, ["id", "name", "email"])
+
+        # Schema changes don't change the generated tools, so tools.yaml isn't rewritten
+        register_database(str(self.tools_yaml_path), self.db_key, self.db_url)
+        self.assertEqual(self.tools_yaml_path.stat().st_mtime_ns, yaml_mtime)
+        self.assertIn("orders", read_schema_catalog(catalog_path)["tables"])
+
+    def test_watch_picks_up_schema_changes(self):
+        register_database(str(self.tools_yaml_path), self.db_key, self.db_url)
+
+        def create_table(_interval):
+            with self.engine.begin() as connection:
+                connection.execute(text("CREATE TABLE audit (id INTEGER)"))
+
+        watch_databases(str(self.tools_yaml_path), interval=0, iterations=2, sleep=create_table)
+        catalog = read_schema_catalog(get_catalog_path(str(self.tools_yaml_path), self.db_key))
+        self.assertEqual(list(catalog["tables"]), ["audit", "test_table"])
+
+    def test_register_with_profile_stores_column_profiles(self):
+        with self.engine.begin() as connection:
+            connection.execute(text("INSERT INTO test_table (id, name) VALUES (1, 'a'), (2, 'a'), (3, NULL)"))
+        register_database(str(self.tools_yaml_path), self.db_key, self.db_url, profile=True)
+        catalog = read_schema_catalog(get_catalog_path(str(self.tools_yaml_path), self.db_key))
+
+        name = catalog["profiles"]["test_table"]["columns"]["name"]
+        self.assertEqual(name["distinct"], 1)
+        self.assertEqual(name["top_values"], [{"value": "a", "fraction": 0.6667}])
+
+    def test_register_databases_merges_in_one_write(self):
+        register_database(str(self.tools_yaml_path), self.db_key, self.db_url)
+
+        other_url = f"sqlite:///{self.test_dir / 'other.db'}"
+        with create_engine(other_url).begin() as connection:
+            connection.execute(text("CREATE TABLE other_table (id INTEGER)"))
+
+        registered, errors = register_databases(
+            str(self.tools_yaml_path),
+            [("other", other_url), ("broken", "oracle://nowhere/db")],
+            max_workers=2,
+            timeout=5,
+        )
+        self.assertEqual(registered, {"other": ["other_table"]})
+        self.assertIn("broken", errors)
+
+        with open(self.tools_yaml_path, 'r') as f:
+            config = yaml.safe_load(f)
+
+        # Previously registered sources survive the merge
+        self.assertEqual(set(config["sources"]), {self.db_key, "other"})
+        self.assertIn("other_toolset", config["toolsets"])
+        self.assertEqual(list(self.test_dir.glob(".*.tmp")), [])
+
+    def test_hung_introspection_does_not_block_exit(self):
+        # A database that never answers: the call returns at the timeout and the process exits right after
+        code = (
+            "import time\n"
+            "import utils.register_db as r\n"
+            "r.introspect_database = lambda *args, **kwargs: time.sleep(30)\n"
+            f"print(r.register_databases({str(self.tools_yaml_path)!r}, [('hung', 'sqlite:///hung.db')], timeout=0.3)[1])\n"
+        )
+        start = time.monotonic()
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=20).stdout
+        self.assertIn("timed out", out)
+        self.assertLess(time.monotonic() - start, 15)
 
 if __name__ == '__main__':
     unittest.main()
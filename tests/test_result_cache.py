@@ -0,0 +1,135 @@
+import asyncio
+import unittest
+
+from tools.result_cache import ResultCache, analyze_sql
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestAnalyzeSql(unittest.TestCase):
+
+    def test_normalizes_whitespace_comments_and_keywords(self):
+        a = analyze_sql("select  Name\n from Artist -- top\n;")
+        b = analyze_sql("SELECT Name FROM Artist")
+        self.assertEqual(a[0], b[0])
+        self.assertEqual(a[1], frozenset({"name", "artist"}))
+        self.assertTrue(a[2])
+
+    def test_literals_keep_their_case(self):
+        self.assertNotEqual(analyze_sql("SELECT 1 FROM t WHERE c = 'A'")[0], analyze_sql("SELECT 1 FROM t WHERE c = 'a'")[0])
+
+    def test_writes_are_not_read_only(self):
+        self.assertFalse(analyze_sql("DELETE FROM t")[2])
+        self.assertFalse(analyze_sql("WITH x AS (DELETE FROM t RETURNING *) SELECT * FROM x")[2])
+        self.assertFalse(analyze_sql("SELECT * INTO t2 FROM t")[2])
+
+class TestResultCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ResultCache(max_bytes=100, ttl_seconds=10, clock=self.clock)
+        self.calls = []
+
+        async def chinook_execute_query(sql: str) -> str:
+            """Execute arbitrary SQL on chinook"""
+            self.calls.append(sql)
+            await asyncio.sleep(0)
+            return f"rows for {sql}"
+
+        self.tool = self.cache.wrap_execute_tool(chinook_execute_query, "chinook")
+
+    async def test_wrapper_keeps_tool_identity(self):
+        self.assertEqual(self.tool.__name__, "chinook_execute_query")
+        self.assertEqual(self.tool.__doc__, "Execute arbitrary SQL on chinook")
+
+    async def test_repeat_queries_are_served_from_cache(self):
+        await self.tool(sql="SELECT * FROM Artist")
+        await self.tool(sql="select *  from Artist;")
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.cache.hits, 1)
+
+    async def test_concurrent_identical_queries_run_once(self):
+        results = await asyncio.gather(*(self.tool(sql="SELECT 1 FROM t") for _ in range(3)))
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(len(self.calls), 1)
+
+    async def test_ttl_expiry_and_writes_bypass_cache(self):
+        await self.tool(sql="SELECT * FROM Artist")
+        self.clock.now = 11
+        await self.tool(sql="SELECT * FROM Artist")
+        await self.tool(sql="DELETE FROM Artist")
+        await self.tool(sql="DELETE FROM Artist")
+        self.assertEqual(len(self.calls), 4)
+
+    async def test_writes_invalidate_the_tables_they_touch(self):
+        await self.tool(sql="SELECT * FROM Artist")
+        await self.tool(sql="SELECT * FROM Album")
+        await self.tool(sql="UPDATE Artist SET Name = 'x' WHERE ArtistId = 1")
+        await self.tool(sql="SELECT * FROM Artist")
+        await self.tool(sql="SELECT * FROM Album")
+        self.assertEqual(self.calls.count("SELECT * FROM Artist"), 2)
+        self.assertEqual(self.calls.count("SELECT * FROM Album"), 1)
+
+        # A statement naming no table clears the whole database
+        await self.tool(sql="VACUUM")
+        self.assertEqual(len(self.cache), 0)
+
+    async def test_reads_overtaken_by_a_write_are_not_cached(self):
+        release = asyncio.Event()
+
+        async def chinook_execute_query(sql: str) -> str:
+            self.calls.append(sql)
+            if sql.startswith("SELECT"):
+                await release.wait()
+            return f"rows for {sql}"
+
+        tool = self.cache.wrap_execute_tool(chinook_execute_query, "chinook")
+
+        async def write():
+            await tool(sql="UPDATE Artist SET Name = 'x'")
+            release.set()
+
+        await asyncio.gather(tool(sql="SELECT * FROM Artist"), write())
+        self.assertEqual(len(self.cache), 0)
+        release.set()
+        await tool(sql="SELECT * FROM Artist")
+        self.assertEqual(len(self.cache), 1)
+
+    async def test_cancelling_the_first_caller_does_not_cancel_the_others(self):
+        started = asyncio.Event()
+
+        async def chinook_execute_query(sql: str) -> str:
+            self.calls.append(sql)
+            started.set()
+            await asyncio.sleep(0.01)
+            return f"rows for {sql}"
+
+        tool = self.cache.wrap_execute_tool(chinook_execute_query, "chinook")
+        first = asyncio.create_task(tool(sql="SELECT 1 FROM t"))
+        await started.wait()
+        others = asyncio.gather(*(tool(sql="SELECT 1 FROM t") for _ in range(2)))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        self.assertEqual(await others, ["rows for SELECT 1 FROM t"] * 2)
+        # One of the remaining callers ran the query again for both
+        self.assertEqual(len(self.calls), 2)
+
+    async def test_invalidation_by_table_and_byte_budget(self):
+        await self.tool(sql="SELECT * FROM Artist")
+        await self.tool(sql="SELECT * FROM Album")
+        self.assertEqual(self.cache.invalidate("chinook", table="album"), 1)
+        self.assertEqual(len(self.cache), 1)
+
+        self.assertFalse(self.cache.put("chinook", "SELECT big", "x" * 101))
+        self.cache.put("chinook", "SELECT a", "x" * 60)
+        self.cache.put("chinook", "SELECT b", "x" * 60)
+        self.assertLessEqual(self.cache.bytes, 100)
+        self.assertIsNone(self.cache.get("chinook", "SELECT a"))
+
+if __name__ == '__main__':
+    unittest.main()
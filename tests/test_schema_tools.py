@@ -0,0 +1,93 @@
+import os
+import unittest
+import shutil
+from pathlib import Path
+from unittest.mock import patch
+
+from google.adk.tools import FunctionTool
+from sqlalchemy import create_engine, inspect, text
+
+from tools.schema_tools import build_catalog_tools
+from utils.schema_index import tokenize_terms
+from utils.schema_catalog import SchemaCatalogStore, build_schema_catalog, read_schema_catalog, write_schema_catalog
+
+class TestSchemaTools(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.catalog_dir = Path("test_catalog_dir")
+        engine = create_engine("sqlite://")
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE artist (id INTEGER PRIMARY KEY, name VARCHAR)"))
+            connection.execute(text("CREATE TABLE album (id INTEGER PRIMARY KEY, artist_id INTEGER REFERENCES artist(id))"))
+            connection.execute(text('CREATE TABLE "InvoiceLine" ("InvoiceLineId" INTEGER, "UnitPrice" NUMERIC, "Quantity" INTEGER)'))
+        catalog = build_schema_catalog(inspect(engine), "music", "sqlite")
+        write_schema_catalog(self.catalog_dir / "music.json", catalog)
+        self.store = SchemaCatalogStore(self.catalog_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.catalog_dir)
+
+    async def test_tools_are_named_per_db_key(self):
+        tools = {tool.__name__: tool for tool in build_catalog_tools(self.store)}
+        self.assertEqual(set(tools), {"music_list_tables", "music_describe_table", "music_describe_tables", "music_search_schema"})
+
+        listed = await tools["music_list_tables"]()
+        self.assertEqual(listed["tables"], ["InvoiceLine", "album", "artist"])
+
+    async def test_describe_table_includes_keys(self):
+        tools = {tool.__name__: tool for tool in build_catalog_tools(self.store)}
+        described = await tools["music_describe_table"]("ALBUM")
+
+        self.assertEqual(described["table"], "album")
+        self.assertEqual(described["primary_key"], ["id"])
+        self.assertEqual(described["foreign_keys"][0]["referred_table"], "artist")
+
+        missing = await tools["music_describe_table"]("tracks")
+        self.assertIn("error", missing)
+
+    async def test_describe_tables_batches_lookups(self):
+        tools = {tool.__name__: tool for tool in build_catalog_tools(self.store)}
+        described = await tools["music_describe_tables"](["album", "Artist", "album"])
+        self.assertEqual([t["table"] for t in described["tables"]], ["album", "artist"])
+        self.assertNotIn("unknown_tables", described)
+
+        described = await tools["music_describe_tables"]("album, tracks")
+        self.assertEqual([t["table"] for t in described["tables"]], ["album"])
+        self.assertEqual(described["unknown_tables"], ["tracks"])
+
+    async def test_describe_table_includes_column_profiles(self):
+        catalog = read_schema_catalog(self.catalog_dir / "music.json")
+        catalog["profiles"] = {"artist": {"estimated_rows": 2, "columns": {"name": {"null_fraction": 0.0, "distinct": 2}}}}
+        self.assertTrue(write_schema_catalog(self.catalog_dir / "music.json", catalog))
+
+        tools = {tool.__name__: tool for tool in build_catalog_tools(self.store)}
+        described = await tools["music_describe_table"]("artist")
+        self.assertEqual(described["estimated_rows"], 2)
+        self.assertEqual(described["columns"][1]["profile"], {"null_fraction": 0.0, "distinct": 2})
+        self.assertNotIn("profile", described["columns"][0])
+
+    async def test_search_schema_ranks_relevant_tables(self):
+        tools = {tool.__name__: tool for tool in build_catalog_tools(self.store)}
+
+        found = await tools["music_search_schema"]("total quantity sold per invoice line and unit price", k=1)
+        self.assertEqual([t["table"] for t in found["tables"]], ["InvoiceLine"])
+        self.assertIn({"name": "UnitPrice", "type": "NUMERIC"}, found["tables"][0]["columns"])
+
+        found = await tools["music_search_schema"]("albums by each artist", k=5)
+        self.assertEqual({t["table"] for t in found["tables"]}, {"album", "artist"})
+
+    def test_declarations_have_no_defaults(self):
+        # The Gemini API drops parameter defaults from function declarations, with a warning
+        # per tool, so `k` is required and the model is told the usual value instead
+        with patch.dict(os.environ, {"GOOGLE_GENAI_USE_VERTEXAI": "false"}), self.assertNoLogs("google_adk", "WARNING"):
+            declarations = {tool.__name__: FunctionTool(tool)._get_declaration() for tool in build_catalog_tools(self.store)}
+        self.assertEqual(declarations["music_search_schema"].parameters.required, ["question", "k"])
+
+class TestSchemaIndex(unittest.TestCase):
+
+    def test_tokenize_terms_splits_identifiers(self):
+        self.assertEqual(tokenize_terms("InvoiceLine"), ["invoice", "line", "invoiceline"])
+        self.assertEqual(tokenize_terms("unit_prices"), ["unit", "price"])
+        self.assertEqual(tokenize_terms("How many categories?"), ["category"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+from google.adk.sessions import InMemorySessionService
+
+from fastapi import HTTPException
+
+from agent.server import AskRequest, ConcurrencyLimiter, SessionRegistry, create_app
+
+class FakeEvent:
+    invocation_id = "inv-1"
+
+    def __init__(self, text=None, call=None):
+        self.content = MagicMock(parts=[MagicMock(text=text)]) if text else None
+        self._call = call
+
+    def get_function_calls(self):
+        return [self._call] if self._call else []
+
+    def get_function_responses(self):
+        return []
+
+    def is_final_response(self):
+        return self.content is not None
+
+class FakeRunner:
+    def __init__(self):
+        self.session_service = InMemorySessionService()
+        self.calls = []
+
+    async def run_async(self, new_message, user_id, session_id):
+        self.calls.append((user_id, session_id, new_message.parts[0].text))
+        call = MagicMock(args={"sql": "SELECT 1"})
+        call.name = "chinook_execute_query"
+        yield FakeEvent(call=call)
+        await asyncio.sleep(0)
+        yield FakeEvent(text=f"answer for {user_id}")
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.runner = FakeRunner()
+        self.app = create_app(runner_factory=self.factory)
+
+    async def factory(self):
+        return self.runner, None
+
+    def read_events(self, response):
+        return [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+
+    def test_ask_streams_events_per_user_session(self):
+        with TestClient(self.app) as client:
+            alice = self.read_events(client.post("/ask", json={"user_id": "alice", "question": "@chinook top albums"}))
+            bob = self.read_events(client.post("/ask", json={"user_id": "bob", "question": "@chinook artists"}))
+
+        self.assertEqual([e["type"] for e in alice], ["tool_call", "final", "done"])
+        self.assertEqual(alice[0]["name"], "chinook_execute_query")
+        self.assertEqual(bob[1]["text"], "answer for bob")
+        self.assertEqual([c[:2] for c in self.runner.calls], [("alice", "alice"), ("bob", "bob")])
+
+    def test_sessions_are_created_once_per_user(self):
+        with TestClient(self.app) as client:
+            client.post("/ask", json={"user_id": "alice", "question": "q1"})
+            client.post("/ask", json={"user_id": "alice", "question": "q2", "session_id": "s2"})
+            client.post("/ask", json={"user_id": "alice", "question": "q3"})
+
+            sessions = asyncio.run(self.runner.session_service.list_sessions(app_name="dynamic_text2sql_agent", user_id="alice"))
+        self.assertEqual(sorted(s.id for s in sessions.sessions), ["alice", "s2"])
+
+    def test_metrics_endpoint_reports_questions(self):
+        with TestClient(self.app) as client:
+            client.post("/ask", json={"user_id": "alice", "question": "q1"})
+            body = client.get("/metrics").text
+        self.assertIn('text2sql_span_duration_seconds_count{kind="question",name="question"}', body)
+
+    def test_queued_turns_of_one_session_do_not_hold_run_slots(self):
+        bob_started = asyncio.Event()
+        alice_running = threading.Event()
+
+        class BlockingRunner(FakeRunner):
+            async def run_async(self, new_message, user_id, session_id):
+                self.calls.append((user_id, session_id, new_message.parts[0].text))
+                if user_id == "bob":
+                    bob_started.set()
+                else:
+                    alice_running.set()
+                    # Only finishes once bob got a slot while alice's second turn waits for her session
+                    await asyncio.wait_for(bob_started.wait(), 5)
+                yield FakeEvent(text=f"answer for {user_id}")
+
+        self.runner = BlockingRunner()
+        with patch("agent.server.MAX_CONCURRENT_LLM_CALLS", 2), TestClient(create_app(runner_factory=self.factory)) as client:
+            def ask(user_id, question):
+                results[question] = self.read_events(client.post("/ask", json={"user_id": user_id, "question": question}))
+
+            results = {}
+            first = threading.Thread(target=ask, args=("alice", "q1"))
+            first.start()
+            alice_running.wait(5)
+            second = threading.Thread(target=ask, args=("alice", "q2"))
+            second.start()
+            time.sleep(0.2)
+            ask("bob", "q3")
+            first.join(10)
+            second.join(10)
+
+        self.assertEqual([e["type"] for e in results["q1"]], ["final", "done"])
+        self.assertEqual([c[2] for c in self.runner.calls], ["q1", "q3", "q2"])
+
+    def test_session_locks_are_dropped_when_idle(self):
+        registry = SessionRegistry(InMemorySessionService())
+
+        async def turns():
+            async def turn():
+                async with registry.lock("alice", "s"):
+                    await asyncio.sleep(0)
+            await asyncio.gather(turn(), turn())
+
+        asyncio.run(turns())
+        self.assertEqual(registry._locks, {})
+
+    def test_disconnected_turns_give_back_their_reservation(self):
+        class BlockingRunner(FakeRunner):
+            async def run_async(self, new_message, user_id, session_id):
+                self.running.set()
+                await asyncio.Event().wait()
+                yield FakeEvent(text="never")
+
+        async def scenario():
+            self.runner = BlockingRunner()
+            self.runner.running = asyncio.Event()
+            app = create_app(runner_factory=self.factory)
+            routes = {getattr(route, "path", None): route.endpoint for route in app.routes}
+
+            async def consume(response):
+                async for _ in response.body_iterator:
+                    pass
+
+            async with app.router.lifespan_context(app):
+                request = AskRequest(user_id="alice", question="q", session_id="s")
+                first = asyncio.create_task(consume(await routes["/ask"](request)))
+                await self.runner.running.wait()
+
+                # Queued behind the session's running turn when the client leaves
+                queued = asyncio.create_task(consume(await routes["/ask"](request)))
+                await asyncio.sleep(0.05)
+                self.assertEqual((await routes["/health"]())["pending"], 1)
+                queued.cancel()
+                await asyncio.gather(queued, return_exceptions=True)
+                self.assertEqual((await routes["/health"]())["pending"], 0)
+
+                # Left before the stream started: only the background task runs
+                await (await routes["/ask"](request)).background()
+                self.assertEqual((await routes["/health"]())["pending"], 0)
+
+                first.cancel()
+                await asyncio.gather(first, return_exceptions=True)
+
+        asyncio.run(scenario())
+
+    def test_limiter_rejects_when_queue_is_full(self):
+        limiter = ConcurrencyLimiter(max_running=1, max_pending=1)
+        limiter.reserve()
+        with self.assertRaises(HTTPException) as ctx:
+            limiter.reserve()
+        self.assertEqual(ctx.exception.status_code, 429)
+
+if __name__ == '__main__':
+    unittest.main()
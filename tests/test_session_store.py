@@ -0,0 +1,88 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from google.adk.events import Event, EventActions
+from google.genai.types import Content, FunctionCall, FunctionResponse, Part
+
+from utils.session_store import COMPACTED_TURNS_KEY, TRUNCATED_KEY, BoundedSessionService
+
+APP, USER = "app", "analyst"
+
+def turn_events(n: int, rows: int = 200) -> list:
+    """One question, a tool call, a large tool response and an answer."""
+    return [
+        Event(author="user", content=Content(role="user", parts=[Part(text=f"question {n}")])),
+        Event(author="agent", content=Content(role="model", parts=[Part(function_call=FunctionCall(name="db_execute_query", args={"sql": "SELECT 1"}))])),
+        Event(author="agent", content=Content(role="user", parts=[Part(function_response=FunctionResponse(
+            name="db_execute_query", response={"rows": [[i, f"value {i}"] for i in range(rows)]}
+        ))])),
+        Event(author="agent", content=Content(role="model", parts=[Part(text=f"answer {n}")])),
+    ]
+
+class TestBoundedSessionService(unittest.IsolatedAsyncioTestCase):
+
+    async def append_turns(self, service, session, turns, start: int = 0):
+        for n in range(start, start + turns):
+            for event in turn_events(n):
+                await service.append_event(session, event)
+
+    async def test_old_tool_outputs_are_truncated_and_recent_turns_kept(self):
+        service = BoundedSessionService(max_bytes=None, max_tokens=None, keep_turns=2, tool_output_chars=100)
+        session = await service.create_session(app_name=APP, user_id=USER, session_id="s")
+        await self.append_turns(service, session, 4)
+
+        stored = await service.get_session(app_name=APP, user_id=USER, session_id="s")
+        responses = [e.content.parts[0].function_response.response for e in stored.events if e.get_function_responses()]
+        self.assertEqual([TRUNCATED_KEY in r for r in responses], [True, True, False, False])
+        self.assertEqual(len(responses[0]["preview"]), 100)
+
+    async def test_history_over_budget_is_summarized(self):
+        service = BoundedSessionService(max_bytes=8_000, keep_turns=2, tool_output_chars=100)
+        session = await service.create_session(app_name=APP, user_id=USER, session_id="s")
+        await self.append_turns(service, session, 10)
+
+        stored = await service.get_session(app_name=APP, user_id=USER, session_id="s")
+        summary = stored.events[0]
+        self.assertGreaterEqual(summary.custom_metadata[COMPACTED_TURNS_KEY], 8)
+        self.assertIn("- Q: question 0 -> A: answer 0", summary.content.parts[0].text)
+        # The last two turns are verbatim
+        self.assertEqual(stored.events[-4].content.parts[0].text, "question 9")
+        self.assertEqual(len(stored.events[-2].content.parts[0].function_response.response["rows"]), 200)
+        # The runner's working copy was compacted the same way
+        self.assertEqual(len(session.events), len(stored.events))
+
+    async def test_idle_sessions_are_evicted(self):
+        now = [1000.0]
+        service = BoundedSessionService(idle_seconds=60, clock=lambda: now[0])
+        await service.create_session(app_name=APP, user_id=USER, session_id="old")
+        service.sessions[APP][USER]["old"].last_update_time = 1000.0
+
+        now[0] += 61
+        await service.create_session(app_name=APP, user_id=USER, session_id="new")
+        self.assertIsNone(await service.get_session(app_name=APP, user_id=USER, session_id="old"))
+        self.assertIsNotNone(await service.get_session(app_name=APP, user_id=USER, session_id="new"))
+
+    async def test_sessions_persist_to_sqlite(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = str(Path(tmp) / "sessions.db")
+            service = BoundedSessionService(db_path=db_path)
+            session = await service.create_session(app_name=APP, user_id=USER, session_id="s")
+            await self.append_turns(service, session, 1)
+            await service.append_event(session, Event(author="agent", actions=EventActions(state_delta={"user:theme": "dark", "k": 1})))
+            service.close()
+
+            reopened = BoundedSessionService(db_path=db_path)
+            restored = await reopened.get_session(app_name=APP, user_id=USER, session_id="s")
+            self.assertEqual(restored.events[0].content.parts[0].text, "question 0")
+            self.assertEqual((restored.state["k"], restored.state["user:theme"]), (1, "dark"))
+            self.assertEqual([s.id for s in (await reopened.list_sessions(app_name=APP, user_id=USER)).sessions], ["s"])
+
+            await reopened.delete_session(app_name=APP, user_id=USER, session_id="s")
+            reopened.close()
+            fresh = BoundedSessionService(db_path=db_path)
+            self.assertIsNone(await fresh.get_session(app_name=APP, user_id=USER, session_id="s"))
+            fresh.close()
+
+if __name__ == "__main__":
+    unittest.main()
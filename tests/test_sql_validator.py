@@ -0,0 +1,80 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from tools.sql_validator import SchemaLookup, SqlValidator, closest_matches, edit_distance, extract_references, find_problems
+from utils.schema_catalog import SchemaCatalogStore
+
+CATALOG = {
+    "db_key": "chinook",
+    "kind": "sqlite",
+    "fingerprint": "abc",
+    "tables": {
+        "Artist": {"columns": [{"name": "ArtistId"}, {"name": "Name"}]},
+        "Album": {"columns": [{"name": "AlbumId"}, {"name": "Title"}, {"name": "ArtistId"}]},
+        "Invoice": {"columns": [{"name": "InvoiceId"}, {"name": "InvoiceDate"}, {"name": "Total"}]},
+    },
+}
+
+def problems(sql: str, db_type: str = "sqlite") -> list:
+    refs = extract_references(sql, db_type)
+    return find_problems(refs, SchemaLookup.from_catalog(CATALOG)) if refs is not None else []
+
+class TestSqlValidator(unittest.IsolatedAsyncioTestCase):
+
+    def test_edit_distance(self):
+        self.assertEqual(edit_distance("title", "titel", 3), 2)
+        self.assertEqual(edit_distance("artist", "invoicedate", 2), 3)
+        self.assertEqual(closest_matches("Artsit", ["Album", "Artist", "Invoice"]), ["Artist"])
+
+    def test_valid_queries_pass(self):
+        for sql in (
+            "SELECT a.Name, COUNT(*) AS n FROM Artist a JOIN Album al ON al.ArtistId = a.ArtistId GROUP BY a.Name ORDER BY n DESC",
+            "SELECT strftime('%Y', InvoiceDate) y, SUM(Total) total FROM Invoice GROUP BY y",
+            "WITH t AS (SELECT ArtistId, COUNT(*) c FROM Album GROUP BY ArtistId) SELECT t.c, Name FROM t JOIN Artist USING (ArtistId)",
+            "SELECT * FROM (SELECT Title FROM Album) s WHERE s.Title LIKE 'A%'",
+            "SELECT Name FROM Artist WHERE ArtistId IN (SELECT ArtistId FROM Album WHERE Title = 'X')",
+            "SELECT CASE WHEN Total > 10 THEN 'big' ELSE 'small' END size FROM Invoice",
+            "SELECT name FROM sqlite_master WHERE type = 'table'",
+            "PRAGMA table_info(Nope)",
+        ):
+            self.assertEqual(problems(sql), [], sql)
+        self.assertEqual(problems("SELECT EXTRACT(YEAR FROM InvoiceDate), Total::text FROM Invoice", "postgres"), [])
+        upsert = "INSERT INTO Invoice (InvoiceId, Total) VALUES (1, 2) ON CONFLICT (InvoiceId) DO UPDATE SET Total = EXCLUDED.Total"
+        for db_type in ("sqlite", "postgres"):
+            self.assertEqual(problems(upsert, db_type), [], db_type)
+        self.assertEqual(problems(upsert.replace("EXCLUDED.Total", "excluded.Totl"))[0]["name"], "excluded.Totl")
+        self.assertEqual(problems(upsert.replace("(InvoiceId, Total)", "(InvoiceId, Totl)"))[0]["name"], "Totl")
+
+    def test_unknown_names_get_suggestions(self):
+        self.assertEqual(problems("SELECT Name FROM Artists"), [{"kind": "table", "name": "Artists", "suggestions": ["Artist"]}])
+        self.assertEqual(problems("SELECT Titel FROM Album"), [{"kind": "column", "name": "Titel", "suggestions": ["Title"]}])
+        self.assertEqual(
+            problems("SELECT a.Nme FROM Artist a"), [{"kind": "column", "name": "a.Nme", "suggestions": ["a.Name"]}]
+        )
+        self.assertEqual(problems("SELECT x.Name FROM Artist a")[0]["kind"], "alias")
+
+    async def test_wrapped_tool_rejects_before_the_database(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            (Path(tmp) / "chinook.json").write_text(json.dumps(CATALOG))
+            validator = SqlValidator(SchemaCatalogStore(tmp))
+            executed = []
+
+            async def chinook_execute_query(sql: str) -> str:
+                """Execute SQL on chinook."""
+                executed.append(sql)
+                return "[]"
+
+            tool = validator.wrap_execute_tool(chinook_execute_query, "chinook")
+            result = await tool(sql="SELECT Title FROM Albums")
+            self.assertEqual(result["problems"][0]["suggestions"], ["Album"])
+            self.assertEqual(await tool(sql="SELECT Title FROM Album"), "[]")
+            self.assertEqual(await validator.wrap_execute_tool(chinook_execute_query, "other")(sql="SELECT x FROM y"), "[]")
+
+        self.assertEqual(executed, ["SELECT Title FROM Album", "SELECT x FROM y"])
+        self.assertEqual(validator.rejected, 1)
+        self.assertEqual(tool.__name__, "chinook_execute_query")
+
+if __name__ == "__main__":
+    unittest.main()
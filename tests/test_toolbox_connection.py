@@ -0,0 +1,133 @@
+import asyncio
+import unittest
+
+from aiohttp import ServerDisconnectedError
+
+from tools.toolbox_connection import (
+    CircuitBreaker,
+    ToolboxConnection,
+    ToolboxUnavailableError,
+    backoff_delay,
+    is_transient_error,
+)
+
+class FakeClient:
+    """A toolbox client whose execute tool fails with the queued errors before answering."""
+
+    def __init__(self, errors, calls):
+        self.errors = errors
+        self.calls = calls
+        self.closed = False
+
+    def make_tool(self):
+        async def chinook_execute_query(sql: str) -> str:
+            self.calls.append((self, sql))
+            if self.errors:
+                raise self.errors.pop(0)
+            return "[]"
+        return chinook_execute_query
+
+    async def load_toolset(self, name=None):
+        return [self.make_tool()]
+
+    async def load_tool(self, name):
+        return self.make_tool()
+
+    async def close(self):
+        self.closed = True
+
+class TestToolboxConnection(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.errors, self.calls, self.clients, self.sleeps = [], [], [], []
+
+        def factory(url, session=None):
+            client = FakeClient(self.errors, self.calls)
+            self.clients.append(client)
+            return client
+
+        async def sleep(delay):
+            self.sleeps.append(delay)
+
+        self.connection = ToolboxConnection("http://toolbox", client_factory=factory, max_attempts=3, sleep=sleep)
+        await self.connection.__aenter__()
+        [self.tool] = await self.connection.load_toolset("chinook_toolset")
+
+    async def asyncTearDown(self):
+        await self.connection.close()
+
+    def test_backoff_and_transient_errors(self):
+        self.assertEqual(backoff_delay(1, 0.25, 4.0, rng=lambda: 1.0), 0.25)
+        self.assertEqual(backoff_delay(10, 0.25, 4.0, rng=lambda: 1.0), 4.0)
+        self.assertTrue(is_transient_error(ServerDisconnectedError()))
+        self.assertTrue(is_transient_error(RuntimeError("API request failed with status 503 (Service Unavailable)")))
+        self.assertFalse(is_transient_error(RuntimeError("MCP request failed: syntax error")))
+
+    async def test_read_is_retried_on_a_fresh_client_with_backoff(self):
+        self.errors.append(ServerDisconnectedError())
+        self.assertEqual(await self.tool(sql="SELECT 1"), "[]")
+        self.assertEqual(len(self.clients), 2)
+        self.assertTrue(self.clients[0].closed)
+        self.assertIs(self.calls[-1][0], self.clients[1])
+        self.assertEqual(len(self.sleeps), 1)
+        self.assertEqual(self.tool.__name__, "chinook_execute_query")
+
+    async def test_write_is_not_retried_after_the_request_was_sent(self):
+        self.errors.append(ServerDisconnectedError())
+        with self.assertRaises(ServerDisconnectedError):
+            await self.tool(sql="DELETE FROM t")
+        self.assertEqual(len(self.calls), 1)
+
+    async def test_tool_errors_are_not_retried(self):
+        self.errors.append(RuntimeError("MCP request failed: no such table"))
+        with self.assertRaises(RuntimeError):
+            await self.tool(sql="SELECT * FROM missing")
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.connection.breaker.state, "closed")
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_opens_fails_fast_and_recovers(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10, clock=lambda: now[0])
+        breaker.record_failure()
+        breaker.check()
+        breaker.record_failure()
+        with self.assertRaises(ToolboxUnavailableError):
+            breaker.check()
+
+        now[0] = 11
+        breaker.check()  # the single half-open trial
+        with self.assertRaises(ToolboxUnavailableError):
+            breaker.check()
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+
+class TestCancelledTrial(unittest.IsolatedAsyncioTestCase):
+
+    async def test_cancelled_trial_frees_the_half_open_slot(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10, clock=lambda: now[0])
+        connection = ToolboxConnection("http://toolbox", client_factory=lambda url, session=None: FakeClient([], []), breaker=breaker)
+        await connection.__aenter__()
+        breaker.record_failure()
+        now[0] = 11
+
+        started = asyncio.Event()
+        async def hang(client):
+            started.set()
+            await asyncio.sleep(3600)
+        trial = asyncio.create_task(connection.call(hang))
+        await started.wait()
+        trial.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await trial
+
+        # The cancelled trial neither counted as a failure nor kept the slot
+        self.assertEqual((breaker.state, breaker.failures), ("half-open", 1))
+        self.assertEqual(await connection.call(lambda client: asyncio.sleep(0, "ok")), "ok")
+        self.assertEqual(breaker.state, "closed")
+        await connection.close()
+
+if __name__ == "__main__":
+    unittest.main()
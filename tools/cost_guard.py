@@ -0,0 +1,267 @@
+import asyncio
+import json
+import logging
+import math
+import re
+import time
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+from tools.query_refiner import tokenize
+from tools.result_cache import analyze_sql
+from tools.tool_utils import copy_tool_metadata
+from utils.constants import MYSQL, POSTGRES, SQLITE
+from utils.helpers import get_explain_statement
+
+logger = logging.getLogger(__name__)
+
+# Only plain queries are explained and limited; writes and SHOW/PRAGMA go straight through
+GUARDED_STATEMENTS = ("SELECT", "WITH", "VALUES")
+
+_SQLITE_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?"?([A-Za-z_][\w$]*)"?')
+
+@dataclass
+class CostThresholds:
+    """
+    Limits for one database. Queries over `max_cost` or `max_rows` are
+    rejected; queries expected to return more than `limit_rows` rows get a
+    LIMIT. None disables a check.
+    """
+    max_cost: Optional[float] = 1e8
+    max_rows: Optional[float] = 1e8
+    limit_rows: Optional[int] = 10_000
+
+@dataclass
+class PlanEstimate:
+    cost: Optional[float] = None
+    rows: Optional[float] = None
+    full_scans: List[str] = field(default_factory=list)
+
+def load_cost_thresholds(path: Optional[str]) -> Dict[str, CostThresholds]:
+    """
+    Reads per-db_key thresholds from a YAML file shaped like
+    `{default: {max_cost: ...}, databases: {<db_key>: {limit_rows: ...}}}`.
+    The "*" entry of the result holds the defaults.
+    """
+    config = (yaml.safe_load(Path(path).read_text()) or {}) if path else {}
+    names = {f.name for f in fields(CostThresholds)}
+
+    def build(base: CostThresholds, values: dict) -> CostThresholds:
+        unknown = set(values) - names
+        if unknown:
+            raise ValueError(f"Unknown cost guard settings: {sorted(unknown)}")
+        return CostThresholds(**{**base.__dict__, **values})
+
+    default = build(CostThresholds(), config.get("default") or {})
+    thresholds = {"*": default}
+    for db_key, values in (config.get("databases") or {}).items():
+        thresholds[db_key] = build(default, values or {})
+    return thresholds
+
+def _decode_rows(response: Any) -> List[dict]:
+    rows = json.loads(response) if isinstance(response, str) else response
+    if not isinstance(rows, list):
+        raise ValueError(f"Unexpected EXPLAIN output: {str(response)[:200]}")
+    return rows
+
+def _first_value(rows: List[dict]) -> Any:
+    value = next(iter(rows[0].values()))
+    return json.loads(value) if isinstance(value, str) else value
+
+def _parse_postgres(rows: List[dict]) -> PlanEstimate:
+    plan = _first_value(rows)[0]["Plan"]
+    scans = []
+
+    def walk(node: dict) -> None:
+        if node.get("Node Type") == "Seq Scan" and node.get("Relation Name"):
+            scans.append(node["Relation Name"])
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan)
+    return PlanEstimate(plan.get("Total Cost"), plan.get("Plan Rows"), scans)
+
+def _parse_mysql(rows: List[dict]) -> PlanEstimate:
+    block = _first_value(rows)["query_block"]
+    cost = (block.get("cost_info") or {}).get("query_cost")
+    produced, scans = [], []
+
+    def walk(node: Any) -> None:
+        if isinstance(node, dict):
+            table = node.get("table")
+            if isinstance(table, dict):
+                if table.get("access_type") == "ALL":
+                    scans.append(table.get("table_name"))
+                if table.get("rows_produced_per_join") is not None:
+                    produced.append(float(table["rows_produced_per_join"]))
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(block)
+    # rows_produced_per_join of the last table in a nested loop is the join's output estimate
+    return PlanEstimate(float(cost) if cost is not None else None, max(produced) if produced else None, scans)
+
+def _parse_sqlite(rows: List[dict]) -> PlanEstimate:
+    # SQLite plans have no costs, only which tables are scanned in full; rows are estimated separately
+    scans = []
+    for row in rows:
+        match = _SQLITE_SCAN_RE.match(str(row.get("detail", "")))
+        if match and match.group(1).upper() != "CONSTANT":
+            scans.append(match.group(1))
+    return PlanEstimate(None, None, scans)
+
+_PLAN_PARSERS = {POSTGRES: _parse_postgres, MYSQL: _parse_mysql, SQLITE: _parse_sqlite}
+
+def parse_explain(kind: str, response: Any) -> PlanEstimate:
+    """Extracts the estimated cost, rows and full table scans from an EXPLAIN result."""
+    if kind not in _PLAN_PARSERS:
+        raise ValueError(f"Unsupported DB kind for explain: {kind}")
+    rows = _decode_rows(response)
+    if not rows:
+        return PlanEstimate()
+    return _PLAN_PARSERS[kind](rows)
+
+def has_top_level_limit(sql: str, db_type: str = None) -> bool:
+    """True if the outermost query already has LIMIT, FETCH or OFFSET."""
+    depth = 0
+    for kind, text in tokenize(sql, db_type):
+        if kind == "punct":
+            depth += text.count("(") - text.count(")")
+        elif kind == "ident" and depth == 0 and text.upper() in ("LIMIT", "FETCH", "OFFSET"):
+            return True
+    return False
+
+class CostGuard:
+    """
+    Explains generated SQL before it runs and, per db_key, runs it as is,
+    runs it with an injected LIMIT, or returns a structured rejection the
+    model can act on.
+
+    SQLite plans carry no row counts, so the sizes of fully scanned tables
+    come from the schema catalog's profiles when given, else from a
+    MAX(rowid) lookup that is cached for `table_size_ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        thresholds: Optional[Dict[str, CostThresholds]] = None,
+        table_size_ttl: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.thresholds = thresholds or {"*": CostThresholds()}
+        self.table_size_ttl = table_size_ttl
+        self._clock = clock
+        self._table_sizes: Dict[Tuple[str, str], Tuple[float, int]] = {}
+        self.rejected = 0
+        self.limited = 0
+
+    def thresholds_for(self, db_key: str) -> CostThresholds:
+        return self.thresholds.get(db_key) or self.thresholds.get("*") or CostThresholds()
+
+    async def estimate(
+        self,
+        explain_tool: Callable,
+        kind: str,
+        sql: str,
+        db_key: str = "",
+        table_rows: Optional[Dict[str, int]] = None,
+    ) -> PlanEstimate:
+        estimate = parse_explain(kind, await explain_tool(sql=get_explain_statement(kind, sql)))
+        if kind == SQLITE and estimate.full_scans:
+            # A nested loop over full scans visits the product of the scanned tables' rows
+            sizes = await asyncio.gather(
+                *(self._table_size(explain_tool, db_key, table, table_rows) for table in estimate.full_scans)
+            )
+            estimate.rows = estimate.cost = math.prod(sizes)
+        return estimate
+
+    async def _table_size(self, explain_tool: Callable, db_key: str, table: str, table_rows: Optional[Dict[str, int]]) -> int:
+        known = (table_rows or {}).get(table.lower())
+        if known is not None:
+            return max(1, int(known))
+        key = (db_key, table.lower())
+        cached = self._table_sizes.get(key)
+        if cached and cached[0] > self._clock():
+            return cached[1]
+        size = await _sqlite_row_estimate(explain_tool, table)
+        self._table_sizes[key] = (self._clock() + self.table_size_ttl, size)
+        return size
+
+    def wrap_execute_tool(
+        self,
+        tool: Callable,
+        db_key: str,
+        kind: str,
+        explain_tool: Optional[Callable] = None,
+        table_rows: Optional[Dict[str, int]] = None,
+    ) -> Callable:
+        """
+        Guards an execute tool that takes `sql`. EXPLAIN statements are sent
+        through `explain_tool` (default: `tool` itself), which must return
+        rows as a JSON list. `table_rows` maps table names to known row
+        counts, such as the catalog profiles' `estimated_rows`.
+        """
+        explain_tool = explain_tool or tool
+        table_rows = {table.lower(): rows for table, rows in (table_rows or {}).items()}
+        thresholds = self.thresholds_for(db_key)
+
+        async def guarded_execute(**kwargs):
+            sql = kwargs.get("sql")
+            if not isinstance(sql, str) or kind not in _PLAN_PARSERS:
+                return await tool(**kwargs)
+            normalized, _, read_only = analyze_sql(sql, kind)
+            if not read_only or normalized.split(" ", 1)[0] not in GUARDED_STATEMENTS:
+                return await tool(**kwargs)
+
+            try:
+                estimate = await self.estimate(explain_tool, kind, normalized, db_key, table_rows)
+            except Exception as e:
+                # Broken SQL fails the same way when executed, with the database's own message
+                logger.debug(f"EXPLAIN failed on {db_key}: {e}")
+                return await tool(**kwargs)
+
+            reason = _rejection_reason(estimate, thresholds)
+            if reason:
+                self.rejected += 1
+                logger.warning(f"Cost guard rejected a query on {db_key}: {reason}")
+                return {
+                    "error": "Query rejected by the cost guard before running",
+                    "reason": reason,
+                    "estimated_cost": estimate.cost,
+                    "estimated_rows": estimate.rows,
+                    "full_table_scans": estimate.full_scans,
+                    "hint": "Filter on indexed or key columns, join on foreign keys, aggregate in SQL, or add a LIMIT.",
+                }
+
+            limit = thresholds.limit_rows
+            if limit and estimate.rows is not None and estimate.rows > limit and not has_top_level_limit(normalized, kind):
+                self.limited += 1
+                result = await tool(**{**kwargs, "sql": f"{normalized} LIMIT {int(limit)}"})
+                if isinstance(result, dict):
+                    result = {**result, "limit_applied": int(limit), "estimated_rows": estimate.rows}
+                return result
+            return await tool(**kwargs)
+
+        return copy_tool_metadata(tool, guarded_execute)
+
+def _rejection_reason(estimate: PlanEstimate, thresholds: CostThresholds) -> Optional[str]:
+    if thresholds.max_cost is not None and estimate.cost is not None and estimate.cost > thresholds.max_cost:
+        return f"estimated cost {estimate.cost:.0f} exceeds {thresholds.max_cost:.0f}"
+    if thresholds.max_rows is not None and estimate.rows is not None and estimate.rows > thresholds.max_rows:
+        return f"estimated {estimate.rows:.0f} rows exceeds {thresholds.max_rows:.0f}"
+    return None
+
+async def _sqlite_row_estimate(explain_tool: Callable, table: str) -> int:
+    """MAX(rowid) is an index lookup, so it sizes a table without counting it."""
+    try:
+        rows = _decode_rows(await explain_tool(sql=f'SELECT MAX(rowid) AS n FROM "{table}"'))
+        return max(1, int(rows[0]["n"] or 0))
+    except Exception:
+        # Views, CTEs and WITHOUT ROWID tables have no rowid to look at
+        return 1
@@ -0,0 +1,181 @@
+import asyncio
+import functools
+import logging
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.tools import BaseTool, FunctionTool
+from google.adk.tools.base_toolset import BaseToolset
+
+from tools.cost_guard import CostGuard
+from tools.federation import Federation
+from tools.pagination import QueryPager
+from tools.result_cache import ResultCache
+from tools.schema_tools import build_schema_tools
+from tools.sql_validator import SqlValidator
+from utils.helpers import split_tool_name
+from utils.schema_catalog import SchemaCatalogStore
+
+logger = logging.getLogger(__name__)
+
+# Session state key holding the db_keys the conversation is currently about
+ACTIVE_DB_KEYS_STATE = "active_db_keys"
+
+# How long a db_key whose toolset failed to load is skipped before retrying
+FAILED_LOAD_RETRY_SECONDS = 30.0
+
+# '@chinook' but not the domain of 'me@example.com'
+_MENTION_RE = re.compile(r"(?<![\w.@])@([A-Za-z_][\w-]*)")
+
+def extract_db_keys(text: Optional[str]) -> List[str]:
+    """Returns the distinct @db_key mentions in a question, in order of appearance."""
+    return list(dict.fromkeys(_MENTION_RE.findall(text or "")))
+
+def _content_text(content) -> str:
+    if content is None or not content.parts:
+        return ""
+    return " ".join(part.text for part in content.parts if part.text)
+
+class DatabaseToolset(BaseToolset):
+    """
+    Exposes only the tools of the databases a turn is about.
+
+    The `<db_key>_toolset` of each database mentioned as `@db_key` is loaded
+    from the toolbox on first use and cached, so startup no longer depends on
+    how many databases are registered. Follow-up questions without a mention
+    keep the databases of the last question that had one.
+    """
+
+    def __init__(
+        self,
+        client,
+        catalog_store: SchemaCatalogStore,
+        result_cache: Optional[ResultCache] = None,
+        pager: Optional[QueryPager] = None,
+        cost_guard: Optional[CostGuard] = None,
+        sql_validator: Optional[SqlValidator] = None,
+        federation: Optional[Federation] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        super().__init__()
+        self._client = client
+        self._catalog_store = catalog_store
+        self._result_cache = result_cache
+        self._pager = pager
+        self._cost_guard = cost_guard
+        self._sql_validator = sql_validator
+        self._clock = clock
+        self._tools: Dict[str, List[BaseTool]] = {}
+        # Unpaged execute tools, used for the sub-queries of federated queries
+        self._query_tools: Dict[str, Callable] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._failed: Dict[str, float] = {}
+        self._list_databases = FunctionTool(self._make_list_databases())
+        self._federated_query = FunctionTool(federation.build_tool(self.query_tool)) if federation else None
+
+    def _make_list_databases(self) -> Callable:
+        async def list_databases() -> Dict[str, Any]:
+            return {"databases": sorted(set(self._catalog_store.db_keys()) | set(self._tools))}
+
+        list_databases.__doc__ = (
+            "List the registered databases. Tools for a database are only available "
+            "once the user mentions it as @db_key."
+        )
+        return list_databases
+
+    def active_db_keys(self, readonly_context: Optional[ReadonlyContext]) -> List[str]:
+        """Mentions in the current question, else the databases remembered for the session."""
+        if readonly_context is None:
+            return list(self._tools)
+        mentioned = extract_db_keys(_content_text(readonly_context.user_content))
+        return mentioned or list(readonly_context.state.get(ACTIVE_DB_KEYS_STATE, []))
+
+    def remember_db_keys(self, callback_context) -> None:
+        """before_agent_callback that stores the question's @db_key mentions in session state."""
+        mentioned = extract_db_keys(_content_text(callback_context.user_content))
+        if mentioned and mentioned != callback_context.state.get(ACTIVE_DB_KEYS_STATE):
+            callback_context.state[ACTIVE_DB_KEYS_STATE] = mentioned
+        return None
+
+    async def get_tools(self, readonly_context: Optional[ReadonlyContext] = None) -> List[BaseTool]:
+        db_keys = self.active_db_keys(readonly_context)
+        loaded = await asyncio.gather(*(self.load(db_key) for db_key in db_keys))
+        tools = [self._list_databases, *(tool for tools in loaded for tool in tools)]
+        if self._federated_query is not None and len(db_keys) > 1:
+            tools.append(self._federated_query)
+        return tools
+
+    async def query_tool(self, db_key: str) -> Optional[Callable]:
+        """The unpaged execute tool of a database, loading its toolset if needed."""
+        await self.load(db_key)
+        return self._query_tools.get(db_key)
+
+    async def load(self, db_key: str) -> List[BaseTool]:
+        """Loads and caches the tools of one database; returns [] if its toolset can't be loaded."""
+        if db_key in self._tools:
+            return self._tools[db_key]
+        failed_at = self._failed.get(db_key)
+        if failed_at is not None and self._clock() - failed_at < FAILED_LOAD_RETRY_SECONDS:
+            return []
+
+        async with self._locks.setdefault(db_key, asyncio.Lock()):
+            if db_key not in self._tools:
+                try:
+                    toolbox_tools = await self._client.load_toolset(f"{db_key}_toolset")
+                except Exception as e:
+                    logger.warning(f"Could not load toolset for '{db_key}': {e}")
+                    self._failed[db_key] = self._clock()
+                    return []
+                self._failed.pop(db_key, None)
+                self._tools[db_key] = self._build_tools(db_key, toolbox_tools)
+                logger.info(f"Loaded {len(self._tools[db_key])} tools for '{db_key}'")
+        return self._tools[db_key]
+
+    def _build_tools(self, db_key: str, toolbox_tools) -> List[BaseTool]:
+        if not isinstance(toolbox_tools, list):
+            toolbox_tools = [toolbox_tools]
+
+        # Schema lookups with a local catalog are served in-process and
+        # replace their toolbox counterparts
+        catalog = self._catalog_store.get(db_key)
+        local_tools = build_schema_tools(self._catalog_store, db_key) if catalog else []
+        local_names = {tool.__name__ for tool in local_tools}
+
+        tools = list(local_tools)
+        for tool in toolbox_tools:
+            name = getattr(tool, "__name__", None)
+            if name in local_names:
+                continue
+            if not split_tool_name(name or "", ("execute_query",)):
+                tools.append(tool)
+                continue
+
+            raw_tool, extra = tool, []
+            self._query_tools[db_key] = self._guard(raw_tool, db_key, catalog, cache=False)
+            if self._pager is not None:
+                # Backends that can page with a server-side cursor do; others are sliced after the fact
+                fetch = getattr(self._client, "fetch_page", None)
+                fetch = functools.partial(fetch, name) if fetch else None
+                tool, *extra = self._pager.build_tools(db_key, tool, fetch)
+            tools += [self._guard(tool, db_key, catalog, explain_tool=raw_tool), *extra]
+        return [FunctionTool(tool) for tool in tools]
+
+    def _guard(self, tool: Callable, db_key: str, catalog: Optional[dict], explain_tool: Optional[Callable] = None, cache: bool = True) -> Callable:
+        kind = (catalog or {}).get("kind")
+        if self._cost_guard is not None:
+            # EXPLAIN goes through the unpaged tool, which returns plain JSON rows
+            profiles = (catalog or {}).get("profiles") or {}
+            table_rows = {t: p["estimated_rows"] for t, p in profiles.items() if p.get("estimated_rows") is not None}
+            tool = self._cost_guard.wrap_execute_tool(tool, db_key, kind, explain_tool=explain_tool, table_rows=table_rows)
+        if cache and self._result_cache is not None:
+            tool = self._result_cache.wrap_execute_tool(tool, db_key, kind)
+        if self._sql_validator is not None:
+            # Outermost, so unknown names are caught before EXPLAIN or the query reach the database
+            tool = self._sql_validator.wrap_execute_tool(tool, db_key, kind)
+        return tool
+
+    async def close(self) -> None:
+        # The toolbox client is shared and closed by its owner
+        pass
@@ -0,0 +1,209 @@
+import asyncio
+import json
+import logging
+import re
+import sqlite3
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from tools.native_tools import set_sqlite_deadline
+from tools.query_refiner import SQL_FUNCTIONS, SQL_KEYWORDS, tokenize
+from tools.result_cache import analyze_sql
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ROWS_PER_SOURCE = 10_000
+DEFAULT_MAX_RESULT_ROWS = 200
+DEFAULT_TIMEOUT_SECONDS = 30.0
+MAX_SOURCES = 8
+
+# Sub-queries only read; their rows are loaded into local tables
+READ_STATEMENTS = ("SELECT", "WITH", "VALUES")
+
+_TABLE_NAME_RE = re.compile(r"^[A-Za-z_]\w*$")
+
+QueryToolLookup = Callable[[str], Awaitable[Optional[Callable]]]
+
+class FederatedSource(BaseModel):
+    """One sub-query of a federated query; its rows become the local table `table`."""
+    table: str
+    db_key: str
+    sql: str
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def _sqlite_value(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return value
+
+def _columns_read(sql: str, table: str, taken: set) -> List[str]:
+    """
+    The columns `sql` may read from `table`, for sources that returned no
+    rows and so have no column names: names qualified with the table or one
+    of its aliases, plus unqualified names that no other source has. Extra
+    columns do no harm, since the table stays empty.
+    """
+    tokens = [(kind, text[1:-1] if kind == "quoted" else text)
+              for kind, text in tokenize(sql, "sqlite") if kind not in ("space", "comment")]
+    names = [(kind, text) if kind in ("ident", "quoted") else (None, text) for kind, text in tokens]
+
+    # <table> [AS] <alias> names the table in FROM and JOIN clauses
+    qualifiers, skip = {table.lower()}, set()
+    for i, (kind, text) in enumerate(names):
+        if kind and text.lower() == table.lower() and (i == 0 or names[i - 1][1] != "."):
+            j = i + 2 if i + 1 < len(names) and names[i + 1][1].upper() == "AS" else i + 1
+            if j < len(names) and names[j][0] and names[j][1].upper() not in SQL_KEYWORDS:
+                qualifiers.add(names[j][1].lower())
+        if kind and i and names[i - 1][1].upper() == "AS":
+            skip.add(text.lower())
+
+    columns = []
+    for i, (kind, text) in enumerate(names):
+        if not kind or (i + 1 < len(names) and names[i + 1][1] in (".", "(")):
+            continue
+        if i > 1 and names[i - 1][1] == ".":
+            if names[i - 2][1].lower() in qualifiers:
+                columns.append(text)
+        elif kind == "quoted" or text.upper() not in SQL_KEYWORDS | SQL_FUNCTIONS:
+            if text.lower() not in taken | qualifiers | skip:
+                columns.append(text)
+    return list(dict.fromkeys(columns)) or ["_"]
+
+def _deny_attach(action: int, *args) -> int:
+    # The final query must not reach files on disk through ATTACH
+    return sqlite3.SQLITE_DENY if action in (sqlite3.SQLITE_ATTACH, sqlite3.SQLITE_DETACH) else sqlite3.SQLITE_OK
+
+class Federation:
+    """
+    Answers questions spanning several databases. Each source's sub-query
+    runs through that database's execute tool, all in parallel and capped
+    at `max_rows_per_source` rows. The rows are loaded into an in-memory
+    SQLite database, where the final join or aggregation runs.
+    """
+
+    def __init__(
+        self,
+        max_rows_per_source: int = DEFAULT_MAX_ROWS_PER_SOURCE,
+        max_result_rows: int = DEFAULT_MAX_RESULT_ROWS,
+        timeout: Optional[float] = DEFAULT_TIMEOUT_SECONDS,
+    ):
+        self.max_rows_per_source = max_rows_per_source
+        self.max_result_rows = max_result_rows
+        self.timeout = timeout
+
+    def build_tool(self, get_query_tool: QueryToolLookup) -> Callable:
+        """
+        Args:
+            get_query_tool: Returns the unpaged execute tool of a db_key (a
+                JSON list of row dicts per call), or None if it can't be loaded.
+        """
+        async def federated_query(sources: List[FederatedSource], sql: str) -> Dict[str, Any]:
+            parsed = [s if isinstance(s, FederatedSource) else FederatedSource.model_validate(s) for s in sources]
+            return await self.run(parsed, sql, get_query_tool)
+
+        federated_query.__doc__ = (
+            "Answer a question that spans several databases. Each source's SELECT runs on its own "
+            f"database (at most {self.max_rows_per_source} rows each, all in parallel) and its rows are "
+            "loaded into the local table `table` of an in-memory SQLite database, where `sql` then "
+            "joins or aggregates them. Keep sub-queries narrow: filter and aggregate on the source.\n\n"
+            "Args:\n"
+            "    sources: One {table, db_key, sql} per sub-query; `sql` uses the source's own SQL dialect.\n"
+            "    sql: A SQLite query over the local tables.\n"
+        )
+        return federated_query
+
+    async def run(self, sources: List[FederatedSource], sql: str, get_query_tool: QueryToolLookup) -> Dict[str, Any]:
+        problem = self._check_sources(sources)
+        if problem:
+            return {"error": problem}
+
+        fetched = await asyncio.gather(*(self._fetch(source, get_query_tool) for source in sources))
+        failed = {source.table: result for source, result in zip(sources, fetched) if "error" in result}
+        if failed:
+            return {"error": "Some sub-queries failed; nothing was joined", "sources": failed}
+
+        result = await asyncio.to_thread(self._join, sources, fetched, sql)
+        result["sources"] = {
+            source.table: {"db_key": source.db_key, "rows": len(f["rows"]), "truncated": f["truncated"]}
+            for source, f in zip(sources, fetched)
+        }
+        return result
+
+    def _check_sources(self, sources: List[FederatedSource]) -> Optional[str]:
+        if not sources:
+            return "Give at least one source"
+        if len(sources) > MAX_SOURCES:
+            return f"At most {MAX_SOURCES} sources per federated query"
+        tables = [source.table.lower() for source in sources]
+        if len(set(tables)) != len(tables):
+            return "Each source needs its own table name"
+        for source in sources:
+            if not _TABLE_NAME_RE.match(source.table):
+                return f"Invalid table name '{source.table}': use letters, digits and underscores"
+            statement = analyze_sql(source.sql)[0].split(" ", 1)[0]
+            if statement not in READ_STATEMENTS:
+                return f"The sub-query for '{source.table}' must be a SELECT"
+        return None
+
+    async def _fetch(self, source: FederatedSource, get_query_tool: QueryToolLookup) -> Dict[str, Any]:
+        tool = await get_query_tool(source.db_key)
+        if tool is None:
+            return {"error": f"Unknown database '{source.db_key}'; use list_databases"}
+        # One extra row tells whether the cap cut the result
+        capped = f"SELECT * FROM ({source.sql.strip().rstrip(';')}) AS federated_source LIMIT {self.max_rows_per_source + 1}"
+        try:
+            response = await tool(sql=capped)
+        except Exception as e:
+            return {"error": str(e)}
+        if isinstance(response, dict) and response.get("error"):
+            return response
+        try:
+            rows = json.loads(response) if isinstance(response, str) else response
+        except ValueError:
+            return {"error": f"Unexpected response from {source.db_key}: {str(response)[:200]}"}
+        if not isinstance(rows, list):
+            return {"error": f"The sub-query on {source.db_key} returned no rows"}
+        return {"rows": rows[: self.max_rows_per_source], "truncated": len(rows) > self.max_rows_per_source}
+
+    def _join(self, sources: List[FederatedSource], fetched: List[Dict[str, Any]], sql: str) -> Dict[str, Any]:
+        # An empty source is a legitimate answer (LEFT JOIN, anti-joins,
+        # UNION), so it becomes an empty table with the columns `sql` reads
+        taken = {source.table.lower() for source in sources}
+        for result in fetched:
+            taken.update(str(c).lower() for c in (result["rows"][0] if result["rows"] else ()))
+        conn = sqlite3.connect(":memory:")
+        try:
+            empty = []
+            for source, result in zip(sources, fetched):
+                rows = result["rows"]
+                if rows:
+                    columns = list(rows[0])
+                else:
+                    empty.append(source.table)
+                    columns = _columns_read(sql, source.table, taken)
+                conn.execute(f"CREATE TABLE {_quote(source.table)} ({', '.join(_quote(c) for c in columns)})")
+                insert = f"INSERT INTO {_quote(source.table)} VALUES ({', '.join('?' * len(columns))})"
+                conn.executemany(insert, (tuple(_sqlite_value(row.get(c)) for c in columns) for row in rows))
+
+            conn.execute("PRAGMA query_only = 1")
+            conn.set_authorizer(_deny_attach)
+            if self.timeout:
+                set_sqlite_deadline(conn, self.timeout)
+            cursor = conn.execute(sql)
+            columns = [d[0] for d in cursor.description or []]
+            rows = cursor.fetchmany(self.max_result_rows + 1)
+        except sqlite3.Error as e:
+            return {"error": f"Federated query failed: {e}"}
+        finally:
+            conn.close()
+        result = {
+            "columns": columns,
+            "rows": [list(row) for row in rows[: self.max_result_rows]],
+            "truncated": len(rows) > self.max_result_rows,
+        }
+        if empty:
+            result["empty_sources"] = empty
+        return result
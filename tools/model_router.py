@@ -0,0 +1,181 @@
+import json
+import logging
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+import yaml
+from google.adk.plugins.base_plugin import BasePlugin
+
+from tools.db_toolset import ACTIVE_DB_KEYS_STATE
+
+logger = logging.getLogger(__name__)
+
+FAST = "fast"
+STRONG = "strong"
+TIERS = (FAST, STRONG)
+
+# Session state key recording which tier gave the final answer to the last question
+ANSWERED_BY_STATE = "answered_by_tier"
+
+# Routes of invocations that never produced a final answer are dropped oldest first
+MAX_TRACKED_INVOCATIONS = 1024
+
+@dataclass
+class RoutingPolicy:
+    """
+    Routing for one database. Questions start on `start_tier` and move to
+    the strong tier after `max_failures` tool calls that returned an error,
+    or once the same tool call with the same arguments is made
+    `max_repeated_calls` times.
+    """
+    start_tier: str = FAST
+    max_failures: int = 1
+    max_repeated_calls: int = 3
+
+@dataclass
+class _Route:
+    tier: str
+    policy: RoutingPolicy
+    failures: int = 0
+    calls: Counter = field(default_factory=Counter)
+
+def load_routing_policies(path: Optional[str]) -> Dict[str, RoutingPolicy]:
+    """
+    Reads per-db_key policies from a YAML file shaped like
+    `{default: {start_tier: fast, ...}, databases: {<db_key>: {start_tier: strong}}}`.
+    The "*" entry of the result holds the defaults.
+    """
+    config = (yaml.safe_load(Path(path).read_text()) or {}) if path else {}
+    names = {f.name for f in fields(RoutingPolicy)}
+
+    def build(base: RoutingPolicy, values: dict) -> RoutingPolicy:
+        unknown = set(values) - names
+        if unknown:
+            raise ValueError(f"Unknown model routing settings: {sorted(unknown)}")
+        policy = RoutingPolicy(**{**base.__dict__, **values})
+        if policy.start_tier not in TIERS:
+            raise ValueError(f"Unknown model tier '{policy.start_tier}', expected one of {TIERS}")
+        return policy
+
+    default = build(RoutingPolicy(), config.get("default") or {})
+    policies = {"*": default}
+    for db_key, values in (config.get("databases") or {}).items():
+        policies[db_key] = build(default, values or {})
+    return policies
+
+def is_failed_response(response: Any) -> bool:
+    """Tool responses carrying an "error" key: SQL validation, cost guard and lookup failures."""
+    return isinstance(response, dict) and bool(response.get("error"))
+
+def _call_key(name: str, args: Optional[dict]) -> tuple:
+    return name, json.dumps(args or {}, sort_keys=True, default=str)
+
+class ModelRouter:
+    """
+    Sends each question to the fast model first and switches to the strong
+    model for the rest of the question once the fast one fails.
+
+    The model is chosen per LLM call by overriding `llm_request.model` in a
+    before_model callback, so both tiers share the agent's tools, instruction
+    and session. Tool errors and repeated identical calls escalate within the
+    question. Tools that raise are turned into error responses by
+    `ToolErrorPlugin`, so they escalate the same way instead of ending the
+    question.
+    """
+
+    def __init__(self, fast_model: str, strong_model: str, policies: Optional[Dict[str, RoutingPolicy]] = None):
+        self.models = {FAST: fast_model, STRONG: strong_model}
+        self._policies = policies or {"*": RoutingPolicy()}
+        self._routes: OrderedDict[str, _Route] = OrderedDict()
+        self.answered: Counter = Counter()
+        self.escalations: Counter = Counter()
+
+    def policy(self, db_keys: Iterable[str]) -> RoutingPolicy:
+        """Combines the policies of the databases a question is about, taking the most cautious setting of each."""
+        default = self._policies.get("*", RoutingPolicy())
+        chosen = [self._policies.get(db_key, default) for db_key in db_keys] or [default]
+        return RoutingPolicy(
+            start_tier=STRONG if any(p.start_tier == STRONG for p in chosen) else FAST,
+            max_failures=min(p.max_failures for p in chosen),
+            max_repeated_calls=min(p.max_repeated_calls for p in chosen),
+        )
+
+    def _route(self, context) -> _Route:
+        route = self._routes.get(context.invocation_id)
+        if route is None:
+            policy = self.policy(context.state.get(ACTIVE_DB_KEYS_STATE) or [])
+            route = _Route(policy.start_tier, policy)
+            self._routes[context.invocation_id] = route
+            while len(self._routes) > MAX_TRACKED_INVOCATIONS:
+                self._routes.popitem(last=False)
+        return route
+
+    def _escalate(self, route: _Route, reason: str, invocation_id: str) -> None:
+        if route.tier == STRONG:
+            return
+        route.tier = STRONG
+        self.escalations[reason] += 1
+        logger.info(f"Escalating invocation {invocation_id} to {self.models[STRONG]} after {reason}")
+
+    def adk_callbacks(self) -> dict:
+        """Returns Agent callback kwargs that pick the model of every LLM turn and watch tool calls for failures."""
+        def before_model(callback_context, llm_request):
+            llm_request.model = self.models[self._route(callback_context).tier]
+            return None
+
+        def after_model(callback_context, llm_response):
+            content = llm_response.content
+            if llm_response.partial or content is None or not content.parts:
+                return None
+            if any(part.function_call for part in content.parts):
+                return None
+            route = self._routes.pop(callback_context.invocation_id, None)
+            if route is not None:
+                callback_context.state[ANSWERED_BY_STATE] = route.tier
+                self.answered[route.tier] += 1
+            return None
+
+        def before_tool(tool, args, tool_context):
+            route = self._route(tool_context)
+            key = _call_key(tool.name, args)
+            route.calls[key] += 1
+            if route.calls[key] >= route.policy.max_repeated_calls:
+                self._escalate(route, "tool_loop", tool_context.invocation_id)
+            return None
+
+        def after_tool(tool, args, tool_context, tool_response):
+            if not is_failed_response(tool_response):
+                return None
+            route = self._route(tool_context)
+            route.failures += 1
+            if route.failures >= route.policy.max_failures:
+                reason = "validation_error" if "problems" in tool_response else "tool_error"
+                self._escalate(route, reason, tool_context.invocation_id)
+            return None
+
+        return {
+            "before_model_callback": before_model,
+            "after_model_callback": after_model,
+            "before_tool_callback": before_tool,
+            "after_tool_callback": after_tool,
+        }
+
+    def summary(self) -> dict:
+        return {"answered": dict(self.answered), "escalations": dict(self.escalations)}
+
+class ToolErrorPlugin(BasePlugin):
+    """
+    Returns `{"error": ...}` for a tool call that raised, instead of letting
+    the exception end the invocation. The model sees the error and can fix
+    its call, and the router's after_tool callback escalates as for any
+    other failed response.
+    """
+
+    def __init__(self):
+        super().__init__(name="tool_errors")
+
+    async def on_tool_error_callback(self, *, tool, tool_args, tool_context, error: Exception) -> Optional[dict]:
+        logger.warning(f"Tool {tool.name} raised {type(error).__name__}: {error}")
+        return {"error": f"{type(error).__name__}: {error}"}
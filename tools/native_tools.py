@@ -0,0 +1,236 @@
+import asyncio
+import inspect
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import create_engine, inspect as sa_inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+from tools.pagination import collect_page
+from tools.result_cache import analyze_sql
+from utils.constants import SQLITE
+from utils.helpers import get_connect_args, get_source_url, get_transaction_guard_statements, split_tool_name
+from utils.register_db import read_tools_yaml
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_OVERFLOW = 10
+DEFAULT_STATEMENT_TIMEOUT_SECONDS = 30.0
+DEFAULT_CONNECT_TIMEOUT_SECONDS = 10.0
+POOL_RECYCLE_SECONDS = 1800
+
+# Rows buffered client-side per round trip of a server-side cursor
+STREAM_BUFFER_ROWS = 500
+STREAMABLE_STATEMENTS = ("SELECT", "WITH", "VALUES")
+
+# SQLite VM instructions between deadline checks
+SQLITE_PROGRESS_INTERVAL = 10_000
+
+NATIVE_TOOL_SUFFIXES = ("list_tables", "describe_table", "describe_tables", "execute_query")
+
+class NativeToolbox:
+    """
+    Serves the `<db_key>_list_tables`, `<db_key>_describe_table`,
+    `<db_key>_describe_tables` and `<db_key>_execute_query` tools of a tools.yaml in-process with pooled
+    SQLAlchemy engines instead of going through the MCP toolbox.
+
+    It has the same `load_toolset`/`load_tool`/`close` surface as the toolbox
+    client, and tools return the same JSON row lists. Blocking database work
+    runs in worker threads.
+    """
+
+    def __init__(
+        self,
+        tools_yaml_path: str,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        max_overflow: int = DEFAULT_MAX_OVERFLOW,
+        statement_timeout: Optional[float] = DEFAULT_STATEMENT_TIMEOUT_SECONDS,
+        read_only: bool = True,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT_SECONDS,
+    ):
+        self.tools_yaml_path = tools_yaml_path
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.statement_timeout = statement_timeout
+        self.read_only = read_only
+        self.connect_timeout = connect_timeout
+        self._engines: Dict[str, Engine] = {}
+        self._engines_lock = threading.Lock()
+        # tool name -> (source name, source config), for fetch_page
+        self._tool_sources: Dict[str, tuple] = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self) -> None:
+        with self._engines_lock:
+            engines, self._engines = list(self._engines.values()), {}
+        for engine in engines:
+            await asyncio.to_thread(engine.dispose)
+
+    async def load_toolset(self, name: Optional[str] = None) -> List[Callable]:
+        # Re-read on every load so databases registered after startup are picked up
+        config = await asyncio.to_thread(read_tools_yaml, self.tools_yaml_path)
+        if name is None:
+            tool_names = list(config.get("tools", {}))
+        elif name in config.get("toolsets", {}):
+            tool_names = config["toolsets"][name]
+        else:
+            raise ValueError(f"Toolset '{name}' not found in {self.tools_yaml_path}")
+        return [self._make_tool(config, tool_name) for tool_name in tool_names]
+
+    async def load_tool(self, name: str) -> Callable:
+        config = await asyncio.to_thread(read_tools_yaml, self.tools_yaml_path)
+        return self._make_tool(config, name)
+
+    def engine(self, source_name: str, source: dict) -> Engine:
+        """Returns the pooled engine of a source, creating it on first use."""
+        with self._engines_lock:
+            engine = self._engines.get(source_name)
+            if engine is None:
+                kind = source["kind"]
+                options = {"pool_pre_ping": True}
+                if kind != SQLITE or source["database"] not in (None, "", ":memory:"):
+                    options.update(pool_size=self.pool_size, max_overflow=self.max_overflow, pool_recycle=POOL_RECYCLE_SECONDS)
+                engine = create_engine(
+                    get_source_url(source), connect_args=get_connect_args(kind, self.connect_timeout), **options
+                )
+                self._engines[source_name] = engine
+            return engine
+
+    def _make_tool(self, config: dict, tool_name: str) -> Callable:
+        spec = config.get("tools", {}).get(tool_name)
+        if spec is None:
+            raise ValueError(f"Tool '{tool_name}' not found in {self.tools_yaml_path}")
+        parsed = split_tool_name(tool_name, NATIVE_TOOL_SUFFIXES)
+        if parsed is None:
+            raise ValueError(f"Tool '{tool_name}' has no native implementation")
+        source_name = spec["source"]
+        source = config["sources"][source_name]
+        suffix = parsed[1]
+        self._tool_sources[tool_name] = (source_name, source)
+
+        if suffix == "list_tables":
+            async def tool() -> str:
+                return await asyncio.to_thread(self._list_tables, source_name, source)
+            params = []
+        elif suffix == "describe_table":
+            async def tool(table: str) -> str:
+                return await asyncio.to_thread(self._describe_table, source_name, source, table)
+            params = ["table"]
+        elif suffix == "describe_tables":
+            async def tool(tables: str) -> str:
+                return await asyncio.to_thread(self._describe_tables, source_name, source, tables)
+            params = ["tables"]
+        else:
+            async def tool(sql: str) -> str:
+                return await asyncio.to_thread(self._execute, source_name, source, sql)
+            params = ["sql"]
+
+        tool.__name__ = tool.__qualname__ = tool_name
+        tool.__doc__ = spec.get("description", "")
+        tool.__signature__ = inspect.Signature(
+            [inspect.Parameter(p, inspect.Parameter.KEYWORD_ONLY, annotation=str) for p in params],
+            return_annotation=str,
+        )
+        tool.__annotations__ = {**{p: str for p in params}, "return": str}
+        return tool
+
+    def _list_tables(self, source_name: str, source: dict) -> str:
+        inspector = sa_inspect(self.engine(source_name, source))
+        return json.dumps([{"table_name": name} for name in inspector.get_table_names()])
+
+    def _describe_table(self, source_name: str, source: dict, table: str) -> str:
+        inspector = sa_inspect(self.engine(source_name, source))
+        columns = inspector.get_columns(table)
+        return json.dumps([{"column_name": c["name"], "data_type": str(c["type"])} for c in columns])
+
+    def _describe_tables(self, source_name: str, source: dict, tables: str) -> str:
+        names = [name.strip() for name in tables.split(",") if name.strip()]
+        inspector = sa_inspect(self.engine(source_name, source))
+        # The get_multi_* calls reflect all the tables with one query per kind of metadata
+        columns = inspector.get_multi_columns(filter_names=names)
+        primary_keys = inspector.get_multi_pk_constraint(filter_names=names)
+        foreign_keys = inspector.get_multi_foreign_keys(filter_names=names)
+        rows = []
+        for key, table_columns in sorted(columns.items(), key=lambda item: item[0][1]):
+            pk = set(primary_keys.get(key, {}).get("constrained_columns") or [])
+            references = {}
+            for fk in foreign_keys.get(key, []):
+                for column, referred in zip(fk["constrained_columns"], fk["referred_columns"]):
+                    references.setdefault(column, []).append(f"{fk['referred_table']}.{referred}")
+            rows += [
+                {
+                    "table_name": key[1],
+                    "column_name": c["name"],
+                    "data_type": str(c["type"]),
+                    "primary_key": c["name"] in pk,
+                    "foreign_key": ", ".join(references[c["name"]]) if c["name"] in references else None,
+                }
+                for c in table_columns
+            ]
+        return json.dumps(rows)
+
+    def _execute(self, source_name: str, source: dict, sql: str) -> str:
+        def consume(result):
+            if not result.returns_rows:
+                return json.dumps({"rows_affected": result.rowcount})
+            return json.dumps([dict(row) for row in result.mappings()], default=str)
+
+        return self._run(source_name, source, sql, consume)
+
+    async def fetch_page(self, tool_name: str, sql: str, offset: int, max_rows: int, max_bytes: int) -> Any:
+        """
+        Pages an execute_query tool's result with a server-side cursor, so only
+        the requested rows are held in memory.
+        """
+        source_name, source = self._tool_sources[tool_name]
+
+        def consume(result):
+            if not result.returns_rows:
+                return {"rows_affected": result.rowcount}
+            return collect_page(list(result.keys()), result, offset, max_rows, max_bytes)
+
+        return await asyncio.to_thread(self._run, source_name, source, sql, consume, True)
+
+    def _run(self, source_name: str, source: dict, sql: str, consume: Callable, stream: bool = False) -> Any:
+        kind = source["kind"]
+        timeout_ms = int(self.statement_timeout * 1000) if self.statement_timeout else None
+        try:
+            sql = sql.strip().rstrip(";")
+            options = {}
+            # Server-side cursors only work for queries; Postgres can't DECLARE a cursor for SHOW or SET
+            if stream and analyze_sql(sql, source["kind"])[0].split(" ", 1)[0] in STREAMABLE_STATEMENTS:
+                options = {"stream_results": True, "max_row_buffer": STREAM_BUFFER_ROWS}
+            with self.engine(source_name, source).connect() as conn:
+                with conn.begin():
+                    for statement in get_transaction_guard_statements(kind, timeout_ms, self.read_only):
+                        conn.exec_driver_sql(statement)
+                    dbapi_connection = conn.connection.dbapi_connection
+                    if kind == SQLITE and self.statement_timeout:
+                        set_sqlite_deadline(dbapi_connection, self.statement_timeout)
+                    try:
+                        result = conn.exec_driver_sql(sql, execution_options=options)
+                        try:
+                            return consume(result)
+                        finally:
+                            result.close()
+                    finally:
+                        if kind == SQLITE and self.statement_timeout:
+                            dbapi_connection.set_progress_handler(None, 0)
+        except SQLAlchemyError as e:
+            # Same failure surface as the toolbox: the error text goes back to the model
+            raise RuntimeError(f"Query on '{source_name}' failed: {getattr(e, 'orig', None) or e}") from e
+
+def set_sqlite_deadline(dbapi_connection: Any, timeout_seconds: float) -> None:
+    """Interrupts the running SQLite statement once the deadline passes."""
+    deadline = time.monotonic() + timeout_seconds
+    dbapi_connection.set_progress_handler(lambda: time.monotonic() > deadline, SQLITE_PROGRESS_INTERVAL)
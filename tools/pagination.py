@@ -0,0 +1,192 @@
+import json
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from tools.tool_utils import copy_tool_metadata
+
+DEFAULT_PAGE_MAX_ROWS = 200
+DEFAULT_PAGE_MAX_BYTES = 32 * 1024
+DEFAULT_TOKEN_TTL_SECONDS = 900.0
+DEFAULT_MAX_TOKENS = 4096
+
+# Rows past the page that are scanned (not kept) to report how many rows the query has
+DEFAULT_COUNT_SCAN_LIMIT = 10_000
+
+_JSON_SCALARS = (str, int, float, bool, type(None))
+
+@dataclass
+class Page:
+    """One bounded slice of a query result in columnar form."""
+    columns: List[str]
+    rows: List[list]
+    offset: int = 0
+    has_more: bool = False
+    total_rows: Optional[int] = None
+    total_is_exact: bool = True
+
+def _json_value(value: Any) -> Any:
+    return value if isinstance(value, _JSON_SCALARS) else str(value)
+
+def collect_page(
+    columns: List[str],
+    rows: Iterable[tuple],
+    offset: int = 0,
+    max_rows: int = DEFAULT_PAGE_MAX_ROWS,
+    max_bytes: int = DEFAULT_PAGE_MAX_BYTES,
+    count_scan_limit: int = DEFAULT_COUNT_SCAN_LIMIT,
+) -> Page:
+    """
+    Builds a page from a row iterator without materializing the rest of it.
+
+    Skips `offset` rows, keeps rows until `max_rows` or `max_bytes` (always at
+    least one row) and then only counts up to `count_scan_limit` further rows.
+    """
+    iterator = iter(rows)
+    skipped = sum(1 for _ in islice(iterator, offset))
+    if skipped < offset:
+        return Page(columns, [], offset, False, skipped, True)
+
+    page_rows, size, has_more = [], 0, False
+    for row in iterator:
+        values = [_json_value(v) for v in row]
+        row_bytes = len(json.dumps(values, default=str))
+        if page_rows and (len(page_rows) >= max_rows or size + row_bytes > max_bytes):
+            has_more = True
+            break
+        page_rows.append(values)
+        size += row_bytes
+
+    total, exact = offset + len(page_rows), True
+    if has_more:
+        total += 1
+        for _ in iterator:
+            if total - offset - len(page_rows) >= count_scan_limit:
+                exact = False
+                break
+            total += 1
+    return Page(columns, page_rows, offset, has_more, total, exact)
+
+def page_from_json_rows(rows: List[dict], offset: int, max_rows: int, max_bytes: int) -> Page:
+    """Pages a toolbox result (a list of row dicts) into columnar form."""
+    columns = list(rows[0]) if rows else []
+    values = ([row.get(c) for c in columns] for row in rows)
+    return collect_page(columns, values, offset, max_rows, max_bytes, count_scan_limit=len(rows))
+
+class PageTokenStore:
+    """Short opaque continuation tokens mapped to (db_key, sql, offset), with LRU and TTL bounds."""
+
+    def __init__(self, ttl_seconds: float = DEFAULT_TOKEN_TTL_SECONDS, max_tokens: int = DEFAULT_MAX_TOKENS, clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_tokens = max_tokens
+        self._clock = clock
+        self._tokens: "OrderedDict[str, Tuple[float, str, str, int]]" = OrderedDict()
+
+    def issue(self, db_key: str, sql: str, offset: int) -> str:
+        token = secrets.token_urlsafe(9)
+        self._tokens[token] = (self._clock() + self.ttl_seconds, db_key, sql, offset)
+        while len(self._tokens) > self.max_tokens:
+            self._tokens.popitem(last=False)
+        return token
+
+    def resolve(self, token: str) -> Optional[Tuple[str, str, int]]:
+        entry = self._tokens.get(token)
+        if entry is None or entry[0] <= self._clock():
+            self._tokens.pop(token, None)
+            return None
+        return entry[1:]
+
+# fetch(sql, offset, max_rows, max_bytes) returns a Page, or the raw response when it isn't a result set
+PageFetcher = Callable[[str, int, int, int], Awaitable[Any]]
+
+class QueryPager:
+    """
+    Turns an `<db_key>_execute_query` tool into a paginated one plus a
+    `<db_key>_fetch_page(token)` tool for the following pages.
+
+    Results come back as {"columns": [...], "rows": [[...], ...]} capped by
+    rows and bytes, with a total-row count (exact, or a lower bound when the
+    count scan stopped early) and a continuation token when more rows exist.
+    Pages are fetched by re-running the query, so only ordered queries have
+    stable pages.
+    """
+
+    def __init__(
+        self,
+        max_rows: int = DEFAULT_PAGE_MAX_ROWS,
+        max_bytes: int = DEFAULT_PAGE_MAX_BYTES,
+        tokens: Optional[PageTokenStore] = None,
+    ):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.tokens = tokens or PageTokenStore()
+
+    def build_tools(self, db_key: str, execute_tool: Callable, fetch: Optional[PageFetcher] = None) -> List[Callable]:
+        """
+        Args:
+            db_key: The database the tools belong to.
+            execute_tool: The backend's execute tool, returning a JSON list of row dicts.
+            fetch: Optional backend fetcher that pages with a server-side cursor;
+                without it the full result is fetched and sliced.
+        """
+        async def fetch_from_tool(sql: str, offset: int, max_rows: int, max_bytes: int) -> Any:
+            response = await execute_tool(sql=sql)
+            try:
+                rows = json.loads(response) if isinstance(response, str) else response
+            except ValueError:
+                return response
+            if rows is None:
+                rows = []
+            if not isinstance(rows, list):
+                return response
+            return page_from_json_rows(rows, offset, max_rows, max_bytes)
+
+        fetch = fetch or fetch_from_tool
+
+        async def run(sql: str, offset: int) -> Any:
+            page = await fetch(sql, offset, self.max_rows, self.max_bytes)
+            if not isinstance(page, Page):
+                return page
+            next_token = self.tokens.issue(db_key, sql, offset + len(page.rows)) if page.has_more else None
+            return self.encode(page, next_token)
+
+        async def execute_query(sql: str) -> Dict[str, Any]:
+            return await run(sql, 0)
+
+        async def fetch_page(token: str) -> Dict[str, Any]:
+            resolved = self.tokens.resolve(token)
+            if resolved is None or resolved[0] != db_key:
+                return {"error": f"Unknown or expired page token for {db_key}; run the query again."}
+            return await run(resolved[1], resolved[2])
+
+        copy_tool_metadata(execute_tool, execute_query)
+        execute_query.__doc__ = (
+            f"{(execute_tool.__doc__ or '').strip()}\n\n"
+            f"Returns at most {self.max_rows} rows as columns plus row arrays, the total row count "
+            f"and a next_token when there are more rows; pass it to {db_key}_fetch_page. "
+            "Use ORDER BY for stable pages and aggregate in SQL rather than paging through large results."
+        )
+        execute_query.__annotations__["return"] = Dict[str, Any]
+        execute_query.__signature__ = execute_query.__signature__.replace(return_annotation=Dict[str, Any])
+        fetch_page.__name__ = fetch_page.__qualname__ = f"{db_key}_fetch_page"
+        fetch_page.__doc__ = (
+            f"Fetch the next page of a {db_key}_execute_query result.\n\n"
+            "Args:\n"
+            "    token: The next_token of the previous page.\n"
+        )
+        return [execute_query, fetch_page]
+
+    @staticmethod
+    def encode(page: Page, next_token: Optional[str]) -> Dict[str, Any]:
+        return {
+            "columns": page.columns,
+            "rows": page.rows,
+            "offset": page.offset,
+            "row_count": len(page.rows),
+            "total_rows": page.total_rows,
+            "total_is_exact": page.total_is_exact,
+            "next_token": next_token,
+        }
@@ -1,9 +1,14 @@
 import re
-from typing import Dict, Match
+from functools import lru_cache
+from typing import Dict, List, Tuple
 
-SQL_KEYWORDS = {
+from utils.constants import MYSQL, POSTGRES, SQLITE
+
+SQL_KEYWORDS = frozenset({
     # Data Query Language
     "SELECT", "FROM", "WHERE", "GROUP", "BY", "HAVING", "ORDER", "LIMIT", "OFFSET", "FETCH", "WITH",
+    "RECURSIVE", "WINDOW", "OVER", "PARTITION", "ROWS", "RANGE", "UNBOUNDED", "PRECEDING", "FOLLOWING",
+    "CURRENT", "ROW", "NEXT", "ONLY", "LATERAL", "EXPLAIN",
 
     # Data Manipulation Language
     "INSERT", "INTO", "VALUES", "UPDATE", "SET", "DELETE", "MERGE",
@@ -18,13 +23,15 @@ SQL_KEYWORDS = {
     "GRANT", "REVOKE",
 
     # Join Keywords
-    "JOIN", "INNER", "LEFT", "RIGHT", "FULL", "OUTER", "CROSS", "ON", "USING",
+    "JOIN", "INNER", "LEFT", "RIGHT", "FULL", "OUTER", "CROSS", "ON", "USING", "NATURAL",
 
     # Operators and Conditions
-    "AND", "OR", "NOT", "IN", "BETWEEN", "LIKE", "IS", "NULL", "EXISTS", "ALL", "ANY", "UNION", "INTERSECT", "EXCEPT",
+    "AND", "OR", "NOT", "IN", "BETWEEN", "LIKE", "IS", "NULL", "EXISTS", "ALL", "ANY", "SOME", "UNION",
+    "INTERSECT", "EXCEPT", "TRUE", "FALSE", "ESCAPE",
 
     # Functions / Aliasing / Distinctness
-    "AS", "DISTINCT", "COUNT", "SUM", "AVG", "MIN", "MAX",
+    "AS", "DISTINCT", "COUNT", "SUM", "AVG", "MIN", "MAX", "CAST",
+    "CURRENT_DATE", "CURRENT_TIME", "CURRENT_TIMESTAMP",
 
     # Case Expressions
     "CASE", "WHEN", "THEN", "ELSE", "END",
@@ -34,12 +41,153 @@ SQL_KEYWORDS = {
 
     # Ordering
     "ASC", "DESC", "NULLS", "FIRST", "LAST",
+})
+
+DIALECT_KEYWORDS = {
+    POSTGRES: frozenset({"ILIKE", "SIMILAR", "RETURNING", "FILTER", "WITHIN", "LOCALTIME", "LOCALTIMESTAMP", "INTERVAL", "ARRAY", "SYMMETRIC"}),
+    MYSQL: frozenset({"REGEXP", "RLIKE", "DIV", "XOR", "STRAIGHT_JOIN", "SQL_CALC_FOUND_ROWS", "INTERVAL", "IGNORE", "DUPLICATE", "HIGH_PRIORITY"}),
+    SQLITE: frozenset({"GLOB", "REGEXP", "MATCH", "RETURNING", "PRAGMA", "ISNULL", "NOTNULL", "COLLATE", "NOCASE", "FILTER"}),
+}
+
+# Only treated as function names when directly followed by '('
+SQL_FUNCTIONS = frozenset({
+    "COUNT", "SUM", "AVG", "MIN", "MAX", "COALESCE", "NULLIF", "LOWER", "UPPER", "LENGTH", "SUBSTR",
+    "SUBSTRING", "TRIM", "LTRIM", "RTRIM", "REPLACE", "ROUND", "ABS", "CAST", "CONCAT", "CEIL", "FLOOR",
+    "MOD", "POWER", "SQRT", "ROW_NUMBER", "RANK", "DENSE_RANK", "PERCENT_RANK", "CUME_DIST", "NTILE",
+    "LAG", "LEAD", "FIRST_VALUE", "LAST_VALUE", "NTH_VALUE", "EXISTS", "IN", "VALUES",
+})
+
+DIALECT_FUNCTIONS = {
+    POSTGRES: frozenset({
+        "NOW", "AGE", "DATE_TRUNC", "DATE_PART", "EXTRACT", "TO_CHAR", "TO_DATE", "TO_TIMESTAMP", "TO_NUMBER",
+        "STRING_AGG", "ARRAY_AGG", "JSON_AGG", "JSONB_AGG", "JSON_BUILD_OBJECT", "GENERATE_SERIES", "POSITION",
+        "SPLIT_PART", "LEFT", "RIGHT", "INITCAP", "REGEXP_REPLACE", "REGEXP_MATCHES", "GREATEST", "LEAST",
+        "CEILING", "TRUNC", "BOOL_AND", "BOOL_OR", "PERCENTILE_CONT", "PERCENTILE_DISC", "UNNEST", "ANY", "ALL",
+    }),
+    MYSQL: frozenset({
+        "NOW", "CURDATE", "CURTIME", "DATE", "DATE_FORMAT", "DATE_ADD", "DATE_SUB", "DATEDIFF", "TIMESTAMPDIFF",
+        "YEAR", "MONTH", "DAY", "HOUR", "MINUTE", "SECOND", "WEEK", "QUARTER", "DAYNAME", "MONTHNAME",
+        "IFNULL", "IF", "GROUP_CONCAT", "CONCAT_WS", "STR_TO_DATE", "LEFT", "RIGHT", "GREATEST", "LEAST",
+        "CEILING", "TRUNCATE", "LOCATE", "INSTR", "CONVERT", "FORMAT", "CHAR_LENGTH", "JSON_EXTRACT",
+    }),
+    SQLITE: frozenset({
+        "DATE", "TIME", "DATETIME", "JULIANDAY", "STRFTIME", "UNIXEPOCH", "IFNULL", "IIF", "GROUP_CONCAT",
+        "PRINTF", "FORMAT", "INSTR", "TYPEOF", "TOTAL", "RANDOM", "HEX", "QUOTE", "LIKELIHOOD", "JSON_EXTRACT",
+        "PRAGMA_TABLE_INFO",
+    }),
 }
 
+# Words that may follow a type name inside a cast, e.g. `character varying`
+_TYPE_CONTINUATIONS = frozenset({"VARYING", "PRECISION", "WITH", "WITHOUT", "TIME", "ZONE", "UNSIGNED", "SIGNED"})
+_CAST_FUNCTIONS = frozenset({"CAST", "TRY_CAST"})
+
+_DIALECT_ALIASES = {
+    "postgres": POSTGRES, "postgresql": POSTGRES, "pg": POSTGRES,
+    "mysql": MYSQL, "mariadb": MYSQL,
+    "sqlite": SQLITE, "sqlite3": SQLITE,
+}
+
+REFINER_CACHE_SIZE = 1024
+
+def _build_token_pattern(dialect: str) -> "re.Pattern[str]":
+    """Compiles the tokenizer for a dialect. Alternatives are tried left to right."""
+    if dialect == MYSQL:
+        comment = r"--[^\n]*|\#[^\n]*|/\*.*?\*/"
+        string = r"[NnXxBb]?'(?:''|\\.|[^'\\])*'"
+    else:
+        comment = r"--[^\n]*|/\*.*?\*/"
+        string = r"[EeNnXxBb]?'(?:''|[^'])*'"
+
+    quoted = r'"(?:""|[^"])*"|`(?:``|[^`])*`'
+    if dialect == SQLITE:
+        quoted += r"|\[[^\]]*\]"
+
+    parts = [
+        rf"(?P<space>\s+)",
+        rf"(?P<comment>{comment})",
+    ]
+    if dialect == POSTGRES:
+        parts.append(r"(?P<dollar>\$(?P<tag>[A-Za-z_]\w*|)\$.*?\$(?P=tag)\$)")
+    parts += [
+        rf"(?P<string>{string})",
+        rf"(?P<quoted>{quoted})",
+        r"(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?\w*)",
+        r"(?P<cast>::)",
+        r"(?P<param>\$\d+|:[A-Za-z_]\w*|\?|%s|@@?[A-Za-z_]\w*)",
+        r"(?P<ident>[A-Za-z_][\w$]*)",
+        r"(?P<punct>.)",
+    ]
+    return re.compile("|".join(parts), re.DOTALL)
+
+_TOKEN_PATTERNS = {dialect: _build_token_pattern(dialect) for dialect in (POSTGRES, MYSQL, SQLITE, None)}
+_KEYWORDS = {dialect: SQL_KEYWORDS | words for dialect, words in DIALECT_KEYWORDS.items()}
+_FUNCTIONS = {dialect: SQL_FUNCTIONS | names for dialect, names in DIALECT_FUNCTIONS.items()}
+
+def normalize_dialect(db_type: str) -> str:
+    """Maps a database type name such as 'postgresql' or 'sqlite3' to its canonical dialect."""
+    db_type = (db_type or "").strip().lower()
+    return _DIALECT_ALIASES.get(db_type, db_type)
+
+def tokenize(query: str, db_type: str) -> List[Tuple[str, str]]:
+    """
+    Splits a SQL query into (kind, text) tokens in a single pass.
+
+    Kinds are 'space', 'comment', 'dollar', 'string', 'quoted', 'number',
+    'cast', 'param', 'ident' and 'punct'. Joining the texts reproduces the query.
+    """
+    pattern = _TOKEN_PATTERNS.get(normalize_dialect(db_type), _TOKEN_PATTERNS[None])
+    return [(m.lastgroup, m.group()) for m in pattern.finditer(query)]
+
+@lru_cache(maxsize=REFINER_CACHE_SIZE)
+def _refine(query: str, dialect: str) -> str:
+    keywords = _KEYWORDS.get(dialect, SQL_KEYWORDS)
+    functions = _FUNCTIONS.get(dialect, SQL_FUNCTIONS)
+    open_quote, close_quote = ("`", "`") if dialect in (MYSQL, SQLITE) else ('"', '"')
+
+    tokens = tokenize(query, dialect)
+    significant = [i for i, (kind, _) in enumerate(tokens) if kind not in ("space", "comment")]
+    out = [text for _, text in tokens]
+
+    cast_parens: List[bool] = []
+    type_context = None  # None, "start" (a type name is expected) or "cont" (after a type name)
+    prev_kind, prev_text = None, None
+
+    for pos, i in enumerate(significant):
+        kind, text = tokens[i]
+        next_text = tokens[significant[pos + 1]][1] if pos + 1 < len(significant) else None
+
+        if kind == "ident":
+            upper = text.upper()
+            if prev_text == "." or next_text == ".":
+                # Part of a qualified name such as schema.table.column
+                out[i] = f"{open_quote}{text}{close_quote}"
+                type_context = None
+            elif type_context == "start" or (type_context == "cont" and upper in _TYPE_CONTINUATIONS):
+                type_context = "cont"
+            elif upper in keywords:
+                type_context = "start" if upper == "AS" and cast_parens and cast_parens[-1] else None
+            elif next_text == "(" and upper in functions:
+                type_context = None
+            else:
+                out[i] = f"{open_quote}{text}{close_quote}"
+                type_context = None
+        elif kind == "cast":
+            type_context = "start"
+        else:
+            if text == "(":
+                cast_parens.append(prev_kind == "ident" and prev_text.upper() in _CAST_FUNCTIONS)
+            elif text == ")" and cast_parens:
+                cast_parens.pop()
+            type_context = None
+
+        prev_kind, prev_text = kind, text
+
+    return "".join(out)
+
 def query_refiner(query: str, db_type: str) -> Dict[str, str]:
     """
     Refines a SQL query by quoting identifiers based on the database type,
-    while ignoring SQL keywords and string literals.
+    while ignoring SQL keywords, function names and string literals.
 
     Args:
         query: The SQL query string.
@@ -48,32 +196,4 @@ def query_refiner(query: str, db_type: str) -> Dict[str, str]:
     Returns:
         A dictionary containing the refined SQL query.
     """
-    def repl(m: Match[str]) -> str:
-        """Replacement function for re.sub that handles identifiers and literals."""
-        # The pattern has two capturing groups: one for literals, one for identifiers.
-        literal, identifier = m.group(1), m.group(2)
-        
-        if literal:
-            # This is a string literal (e.g., '%Batman%'), return it unchanged.
-            return literal
-
-        if identifier:
-            if identifier.upper() in SQL_KEYWORDS:
-                # This is a SQL keyword, return it unchanged.
-                return identifier
-
-            # This is an identifier, quote it based on the DB type.
-            return f'`{identifier}`' if db_type in ("mysql", "sqlite") else f'"{identifier}"'
-
-        return m.group(0) # Should not be reached with the current regex
-
-    # This regex uses an OR '|' to match either a single-quoted string literal
-    # or an unquoted identifier.
-    # Group 1: ((?:'[^']*'|\"[^\"]*\"))
-    # - Captures string literals, which can be enclosed in either single (') or double (") quotes.
-    # - The inner (?:...) is a non-capturing group to handle the OR condition for the two quote types.
-    # Group 2: (?<![`\"\w\.])([a-zA-Z_][a-zA-Z0-9_]*)
-    # - Captures valid identifiers that are not already quoted or part of a qualified name (e.g. table.column).
-    pattern = r"((?:'[^']*'|\"[^\"]*\"))|(?<![`\"\w\.])([a-zA-Z_][a-zA-Z0-9_]*)"
-    refined_query = re.sub(pattern, repl, query)
-    return {"refined_query": refined_query}
+    return {"refined_query": _refine(query, normalize_dialect(db_type))}
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Optional, Tuple
+
+from tools.query_refiner import SQL_KEYWORDS, tokenize
+from tools.tool_utils import copy_tool_metadata
+
+# Statements that may start a cacheable (read-only) query
+READ_ONLY_STATEMENTS = frozenset({"SELECT", "WITH", "VALUES", "SHOW", "DESCRIBE", "EXPLAIN"})
+
+# Any of these anywhere in the statement makes it uncacheable, e.g. `WITH ... DELETE` or `SELECT ... INTO`
+WRITE_KEYWORDS = frozenset({
+    "INSERT", "UPDATE", "DELETE", "MERGE", "CREATE", "ALTER", "DROP", "TRUNCATE", "GRANT", "REVOKE",
+    "INTO", "CALL", "COPY", "LOCK", "VACUUM", "ATTACH", "DETACH", "PRAGMA",
+})
+
+_WRITE_WORDS = frozenset(word.lower() for word in WRITE_KEYWORDS)
+
+def analyze_sql(sql: str, db_type: str = None) -> Tuple[str, FrozenSet[str], bool]:
+    """
+    Normalizes a SQL statement for use as a cache key.
+
+    Comments are dropped, whitespace is collapsed, keywords are upper-cased
+    and trailing semicolons are removed; literals and identifiers keep their
+    exact text. Also returns the lower-cased names of referenced identifiers
+    and whether the statement is read-only.
+    """
+    parts, identifiers = [], set()
+    first_word, writes = None, False
+    for kind, text in tokenize(sql, db_type):
+        if kind == "comment":
+            continue
+        if kind == "space":
+            if parts and parts[-1] != " ":
+                parts.append(" ")
+            continue
+        if kind == "ident":
+            upper = text.upper()
+            first_word = first_word or upper
+            writes = writes or upper in WRITE_KEYWORDS
+            if upper in SQL_KEYWORDS:
+                text = upper
+            else:
+                identifiers.add(text.lower())
+        elif kind == "quoted":
+            identifiers.add(text[1:-1].lower())
+        parts.append(text)
+
+    normalized = "".join(parts).strip().rstrip(";").rstrip()
+    return normalized, frozenset(identifiers), first_word in READ_ONLY_STATEMENTS and not writes
+
+class _LeaderCancelled(Exception):
+    """Tells callers sharing a cancelled execution to run the query themselves."""
+
+def _payload_size(value: Any) -> int:
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return len(json.dumps(value, default=str))
+
+class ResultCache:
+    """
+    LRU cache of query results keyed on (db_key, normalized SQL), bounded by
+    total payload bytes and a per-entry TTL.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, int, Any, FrozenSet[str]]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        # Bumped by invalidate(), so reads that started before a write don't cache what they read;
+        # keyed on (db_key, table), with None for "every db_key" or "every table"
+        self._generations: Dict[Tuple[Optional[str], Optional[str]], int] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, db_key: str, normalized_sql: str) -> Optional[Any]:
+        key = (db_key, normalized_sql)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] <= self._clock():
+            self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def put(self, db_key: str, normalized_sql: str, value: Any, tables: FrozenSet[str] = frozenset()) -> bool:
+        """Stores a result; results larger than the whole budget are not cached."""
+        size = _payload_size(value)
+        if size > self.max_bytes:
+            return False
+        key = (db_key, normalized_sql)
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (self._clock() + self.ttl_seconds, size, value, tables)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+        return True
+
+    def invalidate(self, db_key: Optional[str] = None, table: Optional[str] = None) -> int:
+        """Drops entries for a db_key, optionally only those referencing a table. Returns the count dropped."""
+        table = table.lower() if table else None
+        generation = (db_key, table) if db_key is not None else (None, None)
+        self._generations[generation] = self._generations.get(generation, 0) + 1
+        doomed = [
+            key for key, entry in self._entries.items()
+            if (db_key is None or key[0] == db_key) and (table is None or table in entry[3])
+        ]
+        for key in doomed:
+            self._drop(key)
+        return len(doomed)
+
+    def _generation(self, db_key: str, tables: FrozenSet[str]) -> Tuple[int, ...]:
+        keys = [(None, None), (db_key, None), *((db_key, table) for table in sorted(tables))]
+        return tuple(self._generations.get(key, 0) for key in keys)
+
+    def _drop(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key)
+        self.bytes -= entry[1]
+
+    def wrap_execute_tool(self, tool: Callable, db_key: str, db_type: str = None) -> Callable:
+        """
+        Wraps a `<db_key>_execute_query` tool so read-only statements are served
+        from the cache. Concurrent identical queries share a single execution.
+        Any other statement drops the cached results that reference its tables.
+        """
+        async def cached_execute(**kwargs):
+            sql = kwargs.get("sql")
+            if not isinstance(sql, str) or self.max_bytes <= 0:
+                return await tool(**kwargs)
+
+            normalized, tables, read_only = analyze_sql(sql, db_type)
+            if not read_only:
+                try:
+                    return await tool(**kwargs)
+                finally:
+                    # Even a failed write may have been applied; identifiers that aren't tables match nothing
+                    for table in (tables - _WRITE_WORDS) or [None]:
+                        self.invalidate(db_key, table)
+
+            hit = self.get(db_key, normalized)
+            if hit is not None:
+                return hit
+
+            key = (db_key, normalized)
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                try:
+                    return await asyncio.shield(inflight)
+                except _LeaderCancelled:
+                    # Only the caller that ran the query was cancelled; one of the others takes over
+                    return await cached_execute(**kwargs)
+
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            generation = self._generation(db_key, tables)
+            try:
+                result = await tool(**kwargs)
+            except asyncio.CancelledError:
+                future.set_exception(_LeaderCancelled())
+                future.exception()
+                raise
+            except Exception as e:
+                future.set_exception(e)
+                # Mark retrieved so an unawaited failure doesn't log a warning
+                future.exception()
+                raise
+            finally:
+                self._inflight.pop(key, None)
+            future.set_result(result)
+            if self._generation(db_key, tables) == generation:
+                self.put(db_key, normalized, result, tables)
+            return result
+
+        return copy_tool_metadata(tool, cached_execute)
@@ -0,0 +1,122 @@
+from typing import Any, Callable, Dict, List
+
+from utils.schema_catalog import SchemaCatalogStore
+from utils.schema_index import build_schema_index, search_schema_index
+
+DEFAULT_SEARCH_RESULTS = 5
+MAX_SEARCH_RESULTS = 25
+
+def _catalog_or_error(store: SchemaCatalogStore, db_key: str) -> Dict[str, Any]:
+    catalog = store.get(db_key)
+    if catalog is None:
+        raise LookupError(f"No schema catalog registered for '{db_key}'")
+    return catalog
+
+def _describe(catalog: Dict[str, Any], db_key: str, table: str) -> Dict[str, Any]:
+    tables = catalog["tables"]
+    if table not in tables:
+        # Fall back to a case-insensitive match before giving up
+        matches = [name for name in tables if name.lower() == table.lower()]
+        if not matches:
+            return {"error": f"Unknown table '{table}' in {db_key}", "tables": list(tables)}
+        table = matches[0]
+    described = {"table": table, **tables[table]}
+    profile = (catalog.get("profiles") or {}).get(table)
+    if profile:
+        # Sampled value statistics answer "which values exist" without a SELECT DISTINCT
+        described["columns"] = [
+            {**column, "profile": profile["columns"][column["name"]]} if column["name"] in profile["columns"] else column
+            for column in described["columns"]
+        ]
+        described["estimated_rows"] = profile["estimated_rows"]
+    return described
+
+def build_schema_tools(store: SchemaCatalogStore, db_key: str) -> List[Callable]:
+    """
+    Builds local `<db_key>_list_tables`, `<db_key>_describe_table`,
+    `<db_key>_describe_tables` and `<db_key>_search_schema` tools that answer
+    from the precomputed schema catalog instead of the MCP toolbox.
+
+    Args:
+        store: The catalog store to read from.
+        db_key: The registered database key.
+
+    Returns:
+        A list of tool callables named after the toolbox tools they replace.
+    """
+    async def list_tables() -> Dict[str, Any]:
+        catalog = _catalog_or_error(store, db_key)
+        return {"tables": list(catalog["tables"])}
+
+    async def describe_table(table: str) -> Dict[str, Any]:
+        return _describe(_catalog_or_error(store, db_key), db_key, table)
+
+    async def describe_tables(tables: List[str]) -> Dict[str, Any]:
+        catalog = _catalog_or_error(store, db_key)
+        if isinstance(tables, str):
+            # The toolbox version of this tool takes a comma-separated string
+            tables = tables.split(",")
+        described = {table: _describe(catalog, db_key, table) for table in dict.fromkeys(t.strip() for t in tables)}
+        result = {"tables": [d for d in described.values() if "error" not in d]}
+        unknown = [table for table, d in described.items() if "error" in d]
+        if unknown:
+            result["unknown_tables"] = unknown
+            result["all_tables"] = list(catalog["tables"])
+        return result
+
+    # No default for k: ADK strips defaults from Gemini API function declarations
+    # (logging a warning per tool), so k is required there anyway. A missing or
+    # zero k still falls back to DEFAULT_SEARCH_RESULTS below.
+    async def search_schema(question: str, k: int) -> Dict[str, Any]:
+        catalog = _catalog_or_error(store, db_key)
+        if "search_index" not in catalog:
+            # Catalogs written before the index existed are indexed on first use
+            catalog["search_index"] = build_schema_index(catalog["tables"])
+        k = max(1, min(int(k or DEFAULT_SEARCH_RESULTS), MAX_SEARCH_RESULTS))
+        ranked = search_schema_index(catalog["search_index"], question, k)
+        tables = catalog["tables"]
+        return {
+            "tables": [
+                {
+                    "table": name,
+                    "score": round(score, 3),
+                    "columns": [{"name": c["name"], "type": c["type"]} for c in tables[name]["columns"]],
+                    "primary_key": tables[name]["primary_key"],
+                    "foreign_keys": tables[name]["foreign_keys"],
+                }
+                for name, score in ranked
+            ]
+        }
+
+    list_tables.__name__ = f"{db_key}_list_tables"
+    list_tables.__doc__ = f"List tables in {db_key}."
+    describe_table.__name__ = f"{db_key}_describe_table"
+    describe_table.__doc__ = (
+        f"Describe columns, primary key and foreign keys of a table in {db_key}. Columns of "
+        "profiled databases also list their null fraction, distinct count, min/max and most "
+        "common values, so check them before querying for distinct values.\n\n"
+        "Args:\n"
+        "    table: Name of table to inspect.\n"
+    )
+    describe_tables.__name__ = f"{db_key}_describe_tables"
+    describe_tables.__doc__ = (
+        f"Describe several tables of {db_key} in one call, e.g. every table of a join, with the "
+        f"same details as {db_key}_describe_table.\n\n"
+        "Args:\n"
+        "    tables: Names of the tables to inspect.\n"
+    )
+    search_schema.__name__ = f"{db_key}_search_schema"
+    search_schema.__doc__ = (
+        f"Find the tables in {db_key} most relevant to a question, with their columns and keys.\n\n"
+        "Args:\n"
+        "    question: The user's question or the concepts to look for.\n"
+        f"    k: Number of tables to return, usually {DEFAULT_SEARCH_RESULTS}.\n"
+    )
+    return [list_tables, describe_table, describe_tables, search_schema]
+
+def build_catalog_tools(store: SchemaCatalogStore) -> List[Callable]:
+    """Builds local schema tools for every db_key that has a catalog in the store."""
+    tools = []
+    for db_key in store.db_keys():
+        tools.extend(build_schema_tools(store, db_key))
+    return tools
@@ -0,0 +1,371 @@
+import logging
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from tools.query_refiner import DIALECT_FUNCTIONS, DIALECT_KEYWORDS, SQL_FUNCTIONS, SQL_KEYWORDS, normalize_dialect, tokenize
+from tools.tool_utils import copy_tool_metadata
+from utils.constants import MYSQL, SQLITE
+from utils.schema_catalog import SchemaCatalogStore
+
+logger = logging.getLogger(__name__)
+
+VALIDATOR_CACHE_SIZE = 2048
+MAX_SUGGESTIONS = 3
+
+# Statements whose references are checked; anything else (SHOW, PRAGMA, DDL) passes
+VALIDATED_STATEMENTS = frozenset({"SELECT", "WITH", "INSERT", "UPDATE", "DELETE"})
+
+# Words after which a table name is expected
+_TABLE_STARTERS = frozenset({"FROM", "JOIN", "UPDATE", "INTO"})
+
+# Words that end a FROM list, so a comma after them doesn't introduce another table
+_CLAUSE_ENDERS = frozenset({
+    "WHERE", "GROUP", "ORDER", "HAVING", "LIMIT", "OFFSET", "UNION", "INTERSECT", "EXCEPT", "ON", "USING",
+    "SET", "VALUES", "RETURNING", "WINDOW", "FETCH", "FOR", "SELECT",
+})
+
+# Non-reserved words that are never columns: date parts, type names and clause words
+_NON_COLUMN_WORDS = frozenset({
+    "YEAR", "MONTH", "DAY", "HOUR", "MINUTE", "SECOND", "EPOCH", "DOW", "DOY", "WEEK", "QUARTER", "MILLISECOND",
+    "MICROSECOND", "DATE", "TIME", "TIMESTAMP", "TIMESTAMPTZ", "INTERVAL", "ZONE", "AT", "TEXT", "INTEGER", "INT",
+    "REAL", "NUMERIC", "DECIMAL", "VARCHAR", "CHAR", "CHARACTER", "VARYING", "PRECISION", "BOOLEAN", "BOOL",
+    "FLOAT", "DOUBLE", "BIGINT", "SMALLINT", "BLOB", "JSON", "JSONB", "UUID", "SIGNED", "UNSIGNED", "CONFLICT",
+    "DO", "NOTHING", "EXCLUDED", "OF", "SHARE", "NOWAIT", "SKIP", "LOCKED", "TIES", "PERCENT", "ROWID", "OID",
+    "CTID", "DUAL", "REPLACE", "IGNORE", "BOTH", "LEADING", "TRAILING", "DUPLICATE", "LATERAL",
+})
+
+# Tables that exist in every database but aren't in the catalog
+_SYSTEM_SCHEMAS = frozenset({"information_schema", "pg_catalog", "mysql", "performance_schema", "sys"})
+_SYSTEM_TABLE_PREFIXES = ("sqlite_", "pg_")
+
+@dataclass(frozen=True, eq=False)
+class SchemaLookup:
+    """Lower-cased table and column names of one catalog, mapped to their catalog spelling."""
+    tables: Dict[str, str]
+    columns: Dict[str, Dict[str, str]]
+
+    @classmethod
+    def from_catalog(cls, catalog: dict) -> "SchemaLookup":
+        tables, columns = {}, {}
+        for table, info in catalog["tables"].items():
+            tables[table.lower()] = table
+            columns[table.lower()] = {c["name"].lower(): c["name"] for c in info["columns"]}
+        return cls(tables, columns)
+
+@dataclass
+class SqlReferences:
+    """
+    The names a statement refers to. `relations` maps each table name and
+    alias to the lower-cased tables it may stand for, where None means a CTE,
+    derived table or function whose columns aren't in the catalog.
+    """
+    tables: List[str] = field(default_factory=list)
+    relations: Dict[str, List[Optional[str]]] = field(default_factory=dict)
+    output_aliases: set = field(default_factory=set)
+    qualified_columns: List[Tuple[str, str]] = field(default_factory=list)
+    columns: List[str] = field(default_factory=list)
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, or limit + 1 as soon as it can't be within `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+def closest_matches(name: str, candidates, limit: int = MAX_SUGGESTIONS) -> List[str]:
+    """Up to `limit` candidates within an edit distance of about a third of the name, closest first."""
+    needle = name.lower()
+    max_distance = max(2, len(needle) // 3)
+    scored = []
+    for candidate in candidates:
+        lowered = candidate.lower()
+        # A prefix match ('Track' for 'Tracks') counts as close regardless of length
+        distance = 1 if lowered != needle and (lowered.startswith(needle) or needle.startswith(lowered)) else \
+            edit_distance(needle, lowered, max_distance)
+        if distance <= max_distance:
+            scored.append((distance, candidate))
+    return [candidate for _, candidate in sorted(scored)[:limit]]
+
+@lru_cache(maxsize=VALIDATOR_CACHE_SIZE)
+def extract_references(sql: str, db_type: str) -> Optional[SqlReferences]:
+    """
+    Collects the table, alias and column references of a statement in one
+    pass over the query_refiner tokens. Returns None for statements that
+    aren't validated. The result is cached, so treat it as read-only.
+    """
+    dialect = normalize_dialect(db_type)
+    keywords = SQL_KEYWORDS | DIALECT_KEYWORDS.get(dialect, frozenset())
+    functions = SQL_FUNCTIONS | DIALECT_FUNCTIONS.get(dialect, frozenset())
+
+    # (kind, text, quoted); identifiers and quoted identifiers both become "name"
+    tokens = []
+    for kind, text in tokenize(sql, dialect):
+        if kind in ("space", "comment"):
+            continue
+        if kind == "quoted":
+            tokens.append(("name", text[1:-1], text[0]))
+        else:
+            tokens.append(("name" if kind == "ident" else kind, text, None))
+    if not tokens or tokens[0][0] != "name" or tokens[0][1].upper() not in VALIDATED_STATEMENTS:
+        return None
+
+    def word(i: int) -> Optional[str]:
+        """Upper-cased text of an unquoted identifier, else None."""
+        if 0 <= i < len(tokens) and tokens[i][0] == "name" and not tokens[i][2]:
+            return tokens[i][1].upper()
+        return None
+
+    def is_name(i: int) -> bool:
+        """An identifier that isn't a keyword."""
+        return 0 <= i < len(tokens) and tokens[i][0] == "name" and (tokens[i][2] or word(i) not in keywords)
+
+    def text_at(i: int) -> Optional[str]:
+        return tokens[i][1] if 0 <= i < len(tokens) else None
+
+    def matching_paren(i: int) -> int:
+        depth = 0
+        for j in range(i, len(tokens)):
+            if tokens[j][0] == "punct":
+                depth += (tokens[j][1] == "(") - (tokens[j][1] == ")")
+                if depth == 0:
+                    return j
+        return len(tokens) - 1
+
+    refs = SqlReferences()
+
+    def add_relation(name: str, table: Optional[str]) -> None:
+        refs.relations.setdefault(name.lower(), []).append(table)
+
+    # One entry per open paren: "func" (arguments), "table" (derived table) or "group"
+    parens: List[str] = []
+    from_depth = None
+    ctes = set()
+    insert_target = []
+    i = 0
+    while i < len(tokens):
+        kind, text, quote = tokens[i]
+        upper = word(i)
+        prev_word = word(i - 1)
+
+        if kind == "punct" and text == "(":
+            if prev_word in _TABLE_STARTERS or prev_word == "LATERAL" or (from_depth == len(parens) and text_at(i - 1) == ","):
+                parens.append("table")
+            elif i > 0 and tokens[i - 1][0] == "name" and not (prev_word in keywords and prev_word not in functions):
+                parens.append("func")
+            else:
+                parens.append("group")
+            i += 1
+            continue
+        if kind == "punct" and text == ")":
+            opened = parens.pop() if parens else "group"
+            if from_depth is not None and from_depth > len(parens):
+                from_depth = None
+            if opened == "table":
+                # Derived table; the columns of its alias aren't in the catalog
+                j = i + 1 + (word(i + 1) == "AS")
+                if is_name(j):
+                    add_relation(tokens[j][1], None)
+                    i = j
+                from_depth = len(parens)
+            i += 1
+            continue
+        if upper == "SELECT" and parens and parens[-1] == "func":
+            # `IN (SELECT ...)` and `EXISTS (SELECT ...)` hold a query, not arguments
+            parens[-1] = "group"
+
+        starts_table = upper in _TABLE_STARTERS and not (parens and parens[-1] == "func")
+        if upper == "UPDATE" and prev_word in ("KEY", "FOR", "DO"):
+            starts_table = False
+        if starts_table or (kind == "punct" and text == "," and from_depth == len(parens)):
+            if upper in ("FROM", "JOIN"):
+                from_depth = len(parens)
+            j = i + 1
+            while word(j) in ("LATERAL", "ONLY"):
+                j += 1
+            # `INSERT INTO t (a, b)` is a table and its column list, not a function call
+            if is_name(j) and (text_at(j + 1) != "(" or upper == "INTO"):
+                parts = [tokens[j][1]]
+                while text_at(j + 1) == "." and is_name(j + 2):
+                    parts.append(tokens[j + 2][1])
+                    j += 2
+                table, schema = parts[-1], (parts[-2].lower() if len(parts) > 1 else None)
+                key = table.lower()
+                if key in ctes or schema in _SYSTEM_SCHEMAS or key.startswith(_SYSTEM_TABLE_PREFIXES):
+                    resolved = None
+                else:
+                    resolved = key
+                    refs.tables.append(table)
+                add_relation(table, resolved)
+                if upper == "INTO" and word(0) == "INSERT" and not insert_target:
+                    insert_target.append(resolved)
+                j += 1
+                if upper != "INTO":
+                    j += word(j) == "AS"
+                    if is_name(j) and word(j) not in _NON_COLUMN_WORDS:
+                        add_relation(tokens[j][1], resolved)
+                        j += 1
+                i = j
+                continue
+            if is_name(j):
+                # Table-valued function such as generate_series(...)
+                close = matching_paren(j + 1)
+                k = close + 1 + (word(close + 1) == "AS")
+                add_relation(tokens[j][1], None)
+                if is_name(k):
+                    add_relation(tokens[k][1], None)
+            i += 1
+            continue
+
+        if upper in _CLAUSE_ENDERS and from_depth == len(parens):
+            from_depth = None
+        if kind != "name" or (upper in keywords and not quote):
+            i += 1
+            continue
+
+        nxt = text_at(i + 1)
+        if nxt == "(" and (prev_word in ("WITH", "RECURSIVE") or text_at(i - 1) == ","):
+            close = matching_paren(i + 1)
+            if word(close + 1) == "AS":
+                # CTE with a column list: `name (a, b) AS (...)`
+                ctes.add(text.lower())
+                add_relation(text, None)
+                i = close + 1
+                continue
+        if word(i + 1) == "AS" and text_at(i + 2) == "(":
+            ctes.add(text.lower())
+            add_relation(text, None)
+        elif nxt == "(" or prev_word == "AS" or text_at(i - 1) in (".", "::"):
+            # Function calls, aliases and type names after `AS` or `::`
+            if prev_word == "AS":
+                refs.output_aliases.add(text.lower())
+        elif nxt == ".":
+            k = i
+            while text_at(k + 1) == "." and 0 <= k + 2 < len(tokens) and tokens[k + 2][0] == "name":
+                k += 2
+            if k > i:
+                # Only the last two parts of schema.table.column matter
+                refs.qualified_columns.append((tokens[k - 2][1], tokens[k][1]))
+            i = k
+        elif _ends_expression(tokens, i - 1, keywords):
+            # A bare alias right after an expression, e.g. `COUNT(*) total`
+            refs.output_aliases.add(text.lower())
+        elif quote == '"' and dialect in (MYSQL, SQLITE):
+            # Both accept double-quoted strings where a column isn't found
+            pass
+        elif quote or upper not in _NON_COLUMN_WORDS:
+            refs.columns.append(text)
+        i += 1
+
+    if insert_target and dialect != MYSQL and "excluded" not in refs.relations:
+        # `ON CONFLICT ... DO UPDATE SET x = EXCLUDED.x` names the row that failed to insert
+        add_relation("excluded", insert_target[0])
+    return refs
+
+def _ends_expression(tokens: list, i: int, keywords: FrozenSet[str]) -> bool:
+    if i < 0:
+        return False
+    kind, text, quote = tokens[i]
+    if kind in ("number", "string", "dollar"):
+        return True
+    if kind == "punct":
+        return text in (")", "*") and i > 0 and (text == ")" or tokens[i - 1][1] == ".")
+    if kind == "name":
+        return bool(quote) or text.upper() not in keywords or text.upper() == "END"
+    return False
+
+def find_problems(refs: SqlReferences, lookup: SchemaLookup) -> List[dict]:
+    """Checks references against a catalog; each problem names the reference and its closest matches."""
+    problems, seen = [], set()
+
+    def report(kind: str, name: str, candidates) -> None:
+        if (kind, name.lower()) not in seen:
+            seen.add((kind, name.lower()))
+            problems.append({"kind": kind, "name": name, "suggestions": closest_matches(name, candidates)})
+
+    for table in refs.tables:
+        if table.lower() not in lookup.tables:
+            report("table", table, lookup.tables.values())
+
+    def columns_of(tables) -> Optional[Dict[str, str]]:
+        """Known columns of the tables a name may stand for, or None if any are unknown."""
+        found = {}
+        for table in tables:
+            if table is None or table not in lookup.columns:
+                return None
+            found.update(lookup.columns[table])
+        return found
+
+    for qualifier, column in refs.qualified_columns:
+        tables = refs.relations.get(qualifier.lower())
+        if tables is None:
+            report("alias", qualifier, [name for name in refs.relations])
+            continue
+        known = columns_of(tables)
+        if known is not None and column.lower() not in known:
+            report("column", f"{qualifier}.{column}", [f"{qualifier}.{c}" for c in known.values()])
+
+    in_scope = columns_of({t for tables in refs.relations.values() for t in tables})
+    if refs.relations and in_scope is not None:
+        for column in refs.columns:
+            lowered = column.lower()
+            if lowered not in in_scope and lowered not in refs.output_aliases and lowered not in refs.relations:
+                report("column", column, in_scope.values())
+    return problems
+
+class SqlValidator:
+    """
+    Resolves the tables and columns of generated SQL against the schema
+    catalog before it is sent to the database, so invented or misspelled
+    names come back with suggestions instead of costing a round trip.
+
+    Databases without a catalog, and statements other than SELECT, WITH,
+    INSERT, UPDATE and DELETE, are not checked.
+    """
+
+    def __init__(self, catalog_store: SchemaCatalogStore):
+        self._catalog_store = catalog_store
+        # db_key -> (catalog fingerprint, lookup), rebuilt only when the schema changes
+        self._lookups: Dict[str, Tuple[Optional[str], SchemaLookup]] = {}
+        self.rejected = 0
+
+    def lookup(self, db_key: str) -> Optional[SchemaLookup]:
+        catalog = self._catalog_store.get(db_key)
+        if catalog is None:
+            return None
+        cached = self._lookups.get(db_key)
+        if cached is None or cached[0] != catalog.get("fingerprint"):
+            cached = self._lookups[db_key] = (catalog.get("fingerprint"), SchemaLookup.from_catalog(catalog))
+        return cached[1]
+
+    def validate(self, db_key: str, sql: str, db_type: Optional[str] = None) -> List[dict]:
+        """Returns the unresolved references of `sql`; empty when it checks out or can't be checked."""
+        lookup = self.lookup(db_key)
+        if lookup is None:
+            return []
+        refs = extract_references(sql, db_type or self._catalog_store.get(db_key).get("kind"))
+        return find_problems(refs, lookup) if refs is not None else []
+
+    def wrap_execute_tool(self, tool: Callable, db_key: str, db_type: Optional[str] = None) -> Callable:
+        """Rejects calls of an execute tool taking `sql` whose references don't resolve."""
+        async def validated_execute(**kwargs):
+            sql = kwargs.get("sql")
+            problems = self.validate(db_key, sql, db_type) if isinstance(sql, str) else []
+            if not problems:
+                return await tool(**kwargs)
+            self.rejected += 1
+            logger.info(f"SQL validation rejected a query on {db_key}: {problems}")
+            return {
+                "error": "Query references tables or columns that don't exist in the schema; nothing was run",
+                "problems": problems,
+                "hint": f"Use the suggestions, or {db_key}_describe_table to check the exact names.",
+            }
+
+        return copy_tool_metadata(tool, validated_execute)
@@ -0,0 +1,11 @@
+import inspect
+from typing import Callable
+
+def copy_tool_metadata(tool: Callable, wrapper: Callable) -> Callable:
+    """Gives a wrapper the wrapped tool's name, docstring and signature so the LLM sees the same declaration."""
+    wrapper.__name__ = tool.__name__
+    wrapper.__qualname__ = tool.__name__
+    wrapper.__doc__ = tool.__doc__
+    wrapper.__signature__ = inspect.signature(tool)
+    wrapper.__annotations__ = dict(getattr(tool, "__annotations__", {}))
+    return wrapper
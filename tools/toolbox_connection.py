@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import random
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import aiohttp
+from toolbox_core import ToolboxClient
+
+from tools.result_cache import analyze_sql
+from tools.tool_utils import copy_tool_metadata
+from utils.helpers import split_tool_name
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 32
+DEFAULT_KEEPALIVE_SECONDS = 30.0
+DEFAULT_REQUEST_TIMEOUT_SECONDS = 60.0
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BASE_DELAY_SECONDS = 0.25
+DEFAULT_MAX_DELAY_SECONDS = 4.0
+
+# HTTP statuses worth retrying; toolbox_core reports them as RuntimeError("... status 503 ...")
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+_STATUS_RE = re.compile(r"\bstatus (\d{3})\b")
+
+class ToolboxUnavailableError(ConnectionError):
+    """Raised without contacting the toolbox while its circuit breaker is open."""
+
+def is_transient_error(error: BaseException) -> bool:
+    """True for dropped connections, timeouts and retryable HTTP statuses."""
+    if isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in TRANSIENT_STATUSES
+    if isinstance(error, RuntimeError):
+        match = _STATUS_RE.search(str(error))
+        return bool(match) and int(match.group(1)) in TRANSIENT_STATUSES
+    return False
+
+def backoff_delay(attempt: int, base: float, cap: float, rng: Callable[[], float] = random.random) -> float:
+    """Exponential backoff with full jitter, so clients that failed together don't retry together."""
+    return rng() * min(cap, base * (2 ** (attempt - 1)))
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive transient failures and fails
+    calls fast for `reset_seconds`; then lets a single trial call through and
+    closes again if it succeeds.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self._clock() - self.opened_at < self.reset_seconds:
+            return "open"
+        return "half-open"
+
+    def check(self) -> bool:
+        """Raises while the circuit is open; returns True if the caller now holds the half-open trial."""
+        state = self.state
+        if state == "open" or (state == "half-open" and self._trial_in_flight):
+            raise ToolboxUnavailableError("Toolbox is unavailable (circuit open), retry later")
+        if state == "half-open":
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release_trial(self) -> None:
+        """Frees the trial slot of a call that ended without an outcome, e.g. one that was cancelled."""
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial_in_flight or self.failures >= self.failure_threshold:
+            if self.opened_at is None or self._trial_in_flight:
+                logger.warning(f"Toolbox circuit opened after {self.failures} consecutive failures")
+            self.opened_at = self._clock()
+            self._trial_in_flight = False
+
+class ToolboxConnection:
+    """
+    A long-lived toolbox connection shared by every agent turn.
+
+    Requests go through one pooled keep-alive aiohttp session. Tool calls
+    returned by `load_toolset` retry transient failures with jittered
+    exponential backoff behind a circuit breaker, and a failed connection is
+    replaced in place, so the Agent, Runner and sessions built on top of it
+    never need to be rebuilt.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        client_factory: Callable[..., Any] = ToolboxClient,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        keepalive_seconds: float = DEFAULT_KEEPALIVE_SECONDS,
+        request_timeout: float = DEFAULT_REQUEST_TIMEOUT_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        base_delay: float = DEFAULT_BASE_DELAY_SECONDS,
+        max_delay: float = DEFAULT_MAX_DELAY_SECONDS,
+        breaker: Optional[CircuitBreaker] = None,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self.url = url
+        self._client_factory = client_factory
+        self._pool_size = pool_size
+        self._keepalive_seconds = keepalive_seconds
+        self._request_timeout = request_timeout
+        self.max_attempts = max(1, max_attempts)
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self._sleep = sleep
+        self._http: Optional[aiohttp.ClientSession] = None
+        self._client = None
+        self.generation = 0
+        self._reconnect_lock = asyncio.Lock()
+        # Tools re-fetched from the current client after a reconnect, by name
+        self._current_tools: Dict[str, Any] = {}
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def connect(self) -> None:
+        if self._client is not None:
+            return
+        if self._http is None:
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._pool_size, keepalive_timeout=self._keepalive_seconds),
+                timeout=aiohttp.ClientTimeout(total=self._request_timeout),
+            )
+        self._client = self._client_factory(self.url, session=self._http)
+
+    async def close(self) -> None:
+        client, self._client = self._client, None
+        try:
+            if client is not None:
+                await client.close()
+        finally:
+            if self._http is not None:
+                await self._http.close()
+                self._http = None
+
+    async def reconnect(self, generation: int) -> None:
+        """Replaces the client unless another caller already did since `generation`."""
+        async with self._reconnect_lock:
+            if generation != self.generation:
+                return
+            old, self._client = self._client, None
+            self.generation += 1
+            self._current_tools.clear()
+            if old is not None:
+                try:
+                    await old.close()
+                except Exception as e:
+                    logger.debug(f"Error closing stale toolbox client: {e}")
+            await self.connect()
+            logger.info(f"Reconnected to toolbox at {self.url} (generation {self.generation})")
+
+    async def call(self, operation: Callable[[Any], Awaitable[Any]], idempotent: bool = True) -> Any:
+        """
+        Runs operation(client) with retries, backoff and the circuit breaker.
+        Non-idempotent operations are only retried when the request never
+        reached the toolbox.
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            trial = self.breaker.check()
+            try:
+                await self.connect()
+                generation = self.generation
+                try:
+                    result = await operation(self._client)
+                except Exception as e:
+                    if not is_transient_error(e):
+                        # The toolbox answered, so the connection itself is healthy
+                        self.breaker.record_success()
+                        raise
+                    self.breaker.record_failure()
+                    if attempt == self.max_attempts or not (idempotent or isinstance(e, aiohttp.ClientConnectorError)):
+                        raise
+                    delay = backoff_delay(attempt, self._base_delay, self._max_delay)
+                    logger.warning(f"Toolbox call failed ({type(e).__name__}: {e}); retry {attempt} in {delay:.2f}s")
+                    await self.reconnect(generation)
+                    await self._sleep(delay)
+                else:
+                    self.breaker.record_success()
+                    return result
+            finally:
+                # Cancellation or a failed connect() leaves no outcome; the next caller gets the trial
+                if trial:
+                    self.breaker.release_trial()
+
+    async def load_toolset(self, name: Optional[str] = None) -> list:
+        tools = await self.call(lambda client: client.load_toolset(name))
+        return [self._wrap_tool(tool, self.generation) for tool in tools]
+
+    def _wrap_tool(self, tool, generation: int):
+        name = tool.__name__
+        # A write whose response was lost may already have been applied, so only reads are retried freely
+        executes_sql = split_tool_name(name, ("execute_query",)) is not None
+
+        async def resolve(client):
+            if self.generation == generation:
+                return tool
+            if name not in self._current_tools:
+                self._current_tools[name] = await client.load_tool(name)
+            return self._current_tools[name]
+
+        async def wrapper(**kwargs):
+            async def invoke(client):
+                return await (await resolve(client))(**kwargs)
+            sql = kwargs.get("sql")
+            idempotent = not executes_sql or (isinstance(sql, str) and analyze_sql(sql)[2])
+            return await self.call(invoke, idempotent=idempotent)
+
+        return copy_tool_metadata(tool, wrapper)
@@ -0,0 +1,156 @@
+# column_profile.py
+
+import json
+import logging
+import random
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+
+from .constants import MYSQL, POSTGRES, SQLITE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLE_ROWS = 5000
+DEFAULT_TOP_VALUES = 10
+
+# Longer text values are cut in profiles so a few wide columns can't bloat the catalog
+MAX_VALUE_CHARS = 64
+
+# Values seen only once in the sample say nothing about which literals are common
+MIN_TOP_VALUE_COUNT = 2
+
+def _row_estimate(conn, kind: str, table: str, quoted: str) -> Optional[int]:
+    """Cheap row-count estimate from planner statistics or the rowid index; never a COUNT(*)."""
+    if kind == POSTGRES:
+        value = conn.execute(text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:t)"), {"t": quoted}).scalar()
+    elif kind == MYSQL:
+        value = conn.execute(
+            text("SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t"),
+            {"t": table},
+        ).scalar()
+    elif kind == SQLITE:
+        value = conn.execute(text(f"SELECT MAX(rowid) FROM {quoted}")).scalar()
+    else:
+        return None
+    # Postgres reports -1 for tables that were never analyzed
+    return int(value) if value is not None and value >= 0 else None
+
+def _sample_statement(kind: str, quoted: str, sample_rows: int, estimated_rows: Optional[int], rng: random.Random) -> tuple:
+    """Returns (statement, whether it reads rows from the start of the table)."""
+    if estimated_rows is not None and estimated_rows > sample_rows:
+        if kind == POSTGRES:
+            # Block sampling reads only the chosen pages; oversample so LIMIT is usually reached
+            percent = min(100.0, 200.0 * sample_rows / estimated_rows)
+            return f"SELECT * FROM {quoted} TABLESAMPLE SYSTEM ({percent:.6f}) LIMIT {sample_rows}", False
+        if kind == SQLITE:
+            # Random rowids are index lookups; gaps in the rowid range just shrink the sample
+            rowids = rng.sample(range(1, estimated_rows + 1), sample_rows)
+            return f"SELECT * FROM {quoted} WHERE rowid IN ({','.join(map(str, rowids))})", False
+    # MySQL has no cheap random sampling, so large tables are profiled from their first rows
+    return f"SELECT * FROM {quoted} LIMIT {sample_rows}", True
+
+def estimate_distinct(counts: Counter, sampled: int, total: Optional[int]) -> int:
+    """
+    Scales the distinct values of a sample up to the table with the
+    Haas-Stokes Duj1 estimator (the one Postgres' ANALYZE uses).
+    """
+    distinct = len(counts)
+    if not total or sampled >= total or sampled == 0:
+        return distinct
+    singletons = sum(1 for count in counts.values() if count == 1)
+    estimate = sampled * distinct / (sampled - singletons + singletons * sampled / total)
+    return int(round(min(max(estimate, distinct), total)))
+
+def _profile_value(value: Any) -> Any:
+    if isinstance(value, (int, float, bool)):
+        return value
+    value = str(value)
+    return value if len(value) <= MAX_VALUE_CHARS else value[:MAX_VALUE_CHARS] + "..."
+
+def profile_column(values: List[Any], total: Optional[int], exact: bool, top_values: int = DEFAULT_TOP_VALUES) -> dict:
+    """Null fraction, distinct count, min/max and most common values of one column's sample."""
+    non_null = [v for v in values if v is not None]
+    profile = {"null_fraction": round(1 - len(non_null) / len(values), 4) if values else None}
+    if any(isinstance(v, (bytes, bytearray, memoryview)) for v in non_null[:1]):
+        return profile
+    structured = any(isinstance(v, (dict, list)) for v in non_null)
+    if structured:
+        # JSON and ARRAY values arrive as dicts and lists, which can't be counted; their JSON text can
+        non_null = [json.dumps(v, sort_keys=True, default=str) if isinstance(v, (dict, list)) else v for v in non_null]
+
+    counts = Counter(non_null)
+    profile["distinct"] = len(counts) if exact else estimate_distinct(counts, len(non_null), _non_null_total(total, values, non_null))
+    if non_null and not structured:
+        try:
+            profile["min"], profile["max"] = _profile_value(min(non_null)), _profile_value(max(non_null))
+        except TypeError:
+            pass  # Mixed types, e.g. SQLite columns holding both text and numbers
+    common = [(v, c) for v, c in counts.most_common(top_values) if c >= MIN_TOP_VALUE_COUNT]
+    if common:
+        profile["top_values"] = [{"value": _profile_value(v), "fraction": round(c / len(values), 4)} for v, c in common]
+    return profile
+
+def _non_null_total(total: Optional[int], values: list, non_null: list) -> Optional[int]:
+    if total is None or not values:
+        return total
+    return int(total * len(non_null) / len(values))
+
+def profile_table(
+    conn,
+    kind: str,
+    table: str,
+    sample_rows: int = DEFAULT_SAMPLE_ROWS,
+    top_values: int = DEFAULT_TOP_VALUES,
+    rng: Optional[random.Random] = None,
+) -> dict:
+    """
+    Profiles every column of a table from a bounded sample.
+
+    Tables up to `sample_rows` rows are read whole and get exact figures;
+    larger ones are sampled (TABLESAMPLE on Postgres, random rowids on SQLite,
+    the first rows on MySQL), and their distinct counts are estimates.
+    """
+    quoted = conn.dialect.identifier_preparer.quote(table)
+    try:
+        estimated_rows = _row_estimate(conn, kind, table, quoted)
+    except Exception as e:
+        # e.g. WITHOUT ROWID tables in SQLite
+        logger.debug(f"No row estimate for '{table}': {e}")
+        conn.rollback()
+        estimated_rows = None
+
+    statement, from_start = _sample_statement(kind, quoted, sample_rows, estimated_rows, rng or random.Random())
+    result = conn.execute(text(statement))
+    columns = list(result.keys())
+    rows = result.fetchall()
+
+    exact = from_start and len(rows) < sample_rows
+    total = len(rows) if exact else estimated_rows
+    profiles = {}
+    for i, column in enumerate(columns):
+        try:
+            profiles[column] = profile_column([row[i] for row in rows], total, exact, top_values)
+        except Exception as e:
+            # One odd column shouldn't cost the rest of the table its profile
+            logger.warning(f"Could not profile column '{table}.{column}': {e}")
+    return {"sampled_rows": len(rows), "estimated_rows": total, "exact": exact, "columns": profiles}
+
+def profile_database(
+    engine,
+    kind: str,
+    tables: List[str],
+    sample_rows: int = DEFAULT_SAMPLE_ROWS,
+    top_values: int = DEFAULT_TOP_VALUES,
+) -> Dict[str, dict]:
+    """Profiles each table; a table that can't be sampled is logged and left out."""
+    profiles = {}
+    with engine.connect() as conn:
+        for table in tables:
+            try:
+                profiles[table] = profile_table(conn, kind, table, sample_rows, top_values)
+            except Exception as e:
+                logger.warning(f"Could not profile table '{table}': {e}")
+                conn.rollback()
+    return profiles
@@ -12,4 +12,9 @@ ParameterTypes = {
     "sqlite": "templateParameters",
     "mysql": "parameters",
     "postgres": "parameters"
-}
\ No newline at end of file
+}
+
+SCHEMA_CATALOG_DIR_NAME = "schema_catalog"
+
+# Per-database tools are named <db_key>_<suffix>
+DB_TOOL_SUFFIXES = ("list_tables", "describe_table", "describe_tables", "search_schema", "execute_query", "fetch_page")
@@ -1,5 +1,10 @@
 # utils/db/helpers.py
 
+import os
+from typing import Optional
+
+from sqlalchemy.engine import URL
+
 from .constants import (
     POSTGRES,
     MYSQL,
@@ -49,6 +54,132 @@ def normalize_url(url: str) -> str:
         return url.replace(MYSQL_URL_PREFIX, "mysql+pymysql://", 1)
     return url
 
+def split_tool_name(name: str, suffixes: tuple) -> Optional[tuple]:
+    """Splits '<db_key>_<suffix>' into (db_key, suffix) for the first matching suffix."""
+    for suffix in suffixes:
+        if name.endswith(f"_{suffix}") and len(name) > len(suffix) + 1:
+            return name[: -len(suffix) - 1], suffix
+    return None
+
+def get_connect_args(kind: str, timeout: float = None, statement_timeout: float = None) -> dict:
+    """
+    Returns DBAPI connect arguments that bound connection time for the
+    database kind and, with `statement_timeout`, the run time of each
+    statement (PostgreSQL) or each read from the server (MySQL).
+    """
+    args = {}
+    if kind in (POSTGRES, MYSQL):
+        if timeout is not None:
+            args["connect_timeout"] = max(1, int(timeout))
+        if statement_timeout is not None and kind == POSTGRES:
+            args["options"] = f"-c statement_timeout={max(1, int(statement_timeout * 1000))}"
+        elif statement_timeout is not None:
+            args["read_timeout"] = max(1, int(statement_timeout))
+        return args
+    if kind == SQLITE:
+        return {"timeout": timeout} if timeout is not None else {}
+    raise ValueError(f"Unsupported DB kind for connect args: {kind}")
+
+def get_source_url(source: dict) -> URL:
+    """Rebuilds a SQLAlchemy URL from a tools.yaml source, resolving the ${...} password placeholder."""
+    kind = source["kind"]
+    if kind == SQLITE:
+        return URL.create("sqlite", database=source["database"])
+    if kind not in (POSTGRES, MYSQL):
+        raise ValueError(f"Unsupported DB kind for source URL: {kind}")
+    password = source.get("password")
+    return URL.create(
+        "postgresql" if kind == POSTGRES else "mysql+pymysql",
+        username=source.get("user"),
+        password=os.path.expandvars(password) if password else None,
+        host=source.get("host"),
+        port=source.get("port"),
+        database=source.get("database"),
+    )
+
+def get_transaction_guard_statements(kind: str, timeout_ms: int = None, read_only: bool = False) -> list[str]:
+    """Returns statements that make the current transaction read-only and bound its statement run time."""
+    statements = []
+    if kind == POSTGRES:
+        if read_only:
+            statements.append("SET TRANSACTION READ ONLY")
+        if timeout_ms:
+            statements.append(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+        return statements
+    if kind == MYSQL:
+        if read_only:
+            statements.append("SET TRANSACTION READ ONLY")
+        if timeout_ms:
+            # Only applies to SELECT; MySQL has no general statement timeout
+            statements.append(f"SET SESSION MAX_EXECUTION_TIME = {int(timeout_ms)}")
+        return statements
+    if kind == SQLITE:
+        # SQLite has no statement timeout; callers interrupt it with a progress handler
+        return [f"PRAGMA query_only = {1 if read_only else 0}"]
+    raise ValueError(f"Unsupported DB kind for transaction guards: {kind}")
+
+def get_explain_statement(kind: str, sql: str) -> str:
+    """Returns the statement that asks the database for its plan of `sql` without running it."""
+    if kind == POSTGRES:
+        return f"EXPLAIN (FORMAT JSON) {sql}"
+    if kind == MYSQL:
+        return f"EXPLAIN FORMAT=JSON {sql}"
+    if kind == SQLITE:
+        return f"EXPLAIN QUERY PLAN {sql}"
+    raise ValueError(f"Unsupported DB kind for explain: {kind}")
+
+def get_schema_version_statement(kind: str) -> Optional[str]:
+    """
+    Returns a statement whose single value changes whenever the schema does,
+    or None when the dialect has no such counter.
+    """
+    if kind == SQLITE:
+        return "PRAGMA schema_version"
+    if kind in (POSTGRES, MYSQL):
+        return None
+    raise ValueError(f"Unsupported DB kind for schema version: {kind}")
+
+def get_table_fingerprints_statement(kind: str) -> str:
+    """
+    Returns a statement yielding one (table_name, digest) row per table,
+    where the digest changes with its columns and its primary, unique and
+    foreign keys.
+    """
+    if kind == POSTGRES:
+        return (
+            "SELECT c.table_name, md5(c.columns || '|' || coalesce(k.keys, '')) "
+            "FROM (SELECT table_name, string_agg("
+            "column_name || ':' || data_type || ':' || is_nullable || ':' || coalesce(column_default, ''), "
+            "',' ORDER BY ordinal_position) AS columns "
+            "FROM information_schema.columns "
+            "WHERE table_schema='public' GROUP BY table_name) c "
+            "LEFT JOIN (SELECT table_name, string_agg("
+            "constraint_name || ':' || column_name || ':' || ordinal_position || ':' || coalesce(position_in_unique_constraint, 0), "
+            "',' ORDER BY constraint_name, ordinal_position) AS keys "
+            "FROM information_schema.key_column_usage "
+            "WHERE table_schema='public' GROUP BY table_name) k ON k.table_name = c.table_name;"
+        )
+    if kind == MYSQL:
+        # GROUP_CONCAT is cut at group_concat_max_len, so columns and keys are folded with an order-independent XOR
+        return (
+            "SELECT c.table_name, CONCAT(c.n, '-', c.digest, '-', COALESCE(k.n, 0), '-', COALESCE(k.digest, 0)) "
+            "FROM (SELECT table_name, COUNT(*) AS n, BIT_XOR(CRC32(CONCAT_WS(':', "
+            "ordinal_position, column_name, column_type, is_nullable, COALESCE(column_default, '')))) AS digest "
+            "FROM information_schema.columns "
+            "WHERE table_schema = DATABASE() GROUP BY table_name) c "
+            "LEFT JOIN (SELECT table_name, COUNT(*) AS n, BIT_XOR(CRC32(CONCAT_WS(':', "
+            "constraint_name, column_name, ordinal_position, "
+            "COALESCE(referenced_table_name, ''), COALESCE(referenced_column_name, '')))) AS digest "
+            "FROM information_schema.key_column_usage "
+            "WHERE table_schema = DATABASE() GROUP BY table_name) k ON k.table_name = c.table_name;"
+        )
+    if kind == SQLITE:
+        return (
+            "SELECT name, sql FROM sqlite_master "
+            "WHERE type='table' AND name NOT LIKE 'sqlite~_%' ESCAPE '~';"
+        )
+    raise ValueError(f"Unsupported DB kind for table fingerprints: {kind}")
+
 def get_describe_table_statement(kind: str) -> str:
     """Returns the SQL statement to describe a table based on the database kind."""
     if kind == POSTGRES:
@@ -69,6 +200,56 @@ def get_describe_table_statement(kind: str) -> str:
         )
     raise ValueError(f"Unsupported DB kind for describe table: {kind}")
 
+def get_describe_tables_statement(kind: str) -> str:
+    """
+    Returns one statement describing the columns, primary keys and foreign keys
+    of several tables, bound to a single comma-separated list of table names.
+    """
+    if kind == POSTGRES:
+        return (
+            "SELECT c.table_name, c.column_name, c.data_type, "
+            "coalesce(bool_or(tc.constraint_type = 'PRIMARY KEY'), false) AS primary_key, "
+            "string_agg(DISTINCT rk.table_name || '.' || rk.column_name, ', ') "
+            "FILTER (WHERE tc.constraint_type = 'FOREIGN KEY') AS foreign_key "
+            "FROM information_schema.columns c "
+            "LEFT JOIN information_schema.key_column_usage k "
+            "ON k.table_schema = c.table_schema AND k.table_name = c.table_name AND k.column_name = c.column_name "
+            "LEFT JOIN information_schema.table_constraints tc "
+            "ON tc.constraint_schema = k.constraint_schema AND tc.constraint_name = k.constraint_name "
+            "LEFT JOIN information_schema.referential_constraints rc "
+            "ON rc.constraint_schema = k.constraint_schema AND rc.constraint_name = k.constraint_name "
+            "LEFT JOIN information_schema.key_column_usage rk "
+            "ON rk.constraint_schema = rc.unique_constraint_schema AND rk.constraint_name = rc.unique_constraint_name "
+            "AND rk.ordinal_position = k.position_in_unique_constraint "
+            "WHERE c.table_schema = 'public' AND c.table_name = ANY(string_to_array(replace($1, ' ', ''), ',')) "
+            "GROUP BY c.table_name, c.column_name, c.data_type, c.ordinal_position "
+            "ORDER BY c.table_name, c.ordinal_position;"
+        )
+    if kind == MYSQL:
+        return (
+            # MySQL 8 labels information_schema columns in upper case unless aliased
+            "SELECT c.table_name AS table_name, c.column_name AS column_name, c.data_type AS data_type, "
+            "COALESCE(MAX(k.constraint_name = 'PRIMARY'), 0) AS primary_key, "
+            "GROUP_CONCAT(DISTINCT CONCAT(k.referenced_table_name, '.', k.referenced_column_name) SEPARATOR ', ') AS foreign_key "
+            "FROM information_schema.columns c "
+            "LEFT JOIN information_schema.key_column_usage k "
+            "ON k.table_schema = c.table_schema AND k.table_name = c.table_name AND k.column_name = c.column_name "
+            "WHERE c.table_schema = DATABASE() AND FIND_IN_SET(c.table_name, REPLACE(?, ' ', '')) "
+            "GROUP BY c.table_name, c.column_name, c.data_type, c.ordinal_position "
+            "ORDER BY c.table_name, c.ordinal_position;"
+        )
+    if kind == SQLITE:
+        # Table-valued pragmas join against sqlite_master, unlike PRAGMA table_info(...)
+        return (
+            "SELECT m.name AS table_name, p.name AS column_name, p.type AS data_type, p.pk > 0 AS primary_key, "
+            "(SELECT group_concat(f.\"table\" || '.' || f.\"to\", ', ') FROM pragma_foreign_key_list(m.name) f "
+            "WHERE f.\"from\" = p.name) AS foreign_key "
+            "FROM sqlite_master m JOIN pragma_table_info(m.name) p "
+            "WHERE m.type = 'table' AND instr(',' || lower(replace(?, ' ', '')) || ',', ',' || lower(m.name) || ',') > 0 "
+            "ORDER BY m.name, p.cid;"
+        )
+    raise ValueError(f"Unsupported DB kind for describe tables: {kind}")
+
 def get_list_tables_statement(kind: str) -> str:
     """Returns the SQL statement to list tables based on the database kind."""
     if kind == POSTGRES:
@@ -1,17 +1,146 @@
 # logger.py
+import atexit
+import json
 import logging
-from rich.logging import RichHandler
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import Any, Optional
 
-def setup_logging(level: str = "INFO"):
-    logging.basicConfig(
-        level=level,
-        format="%(message)s",
-        datefmt="[%X]",
-        handlers=[RichHandler(rich_tracebacks=True)]
-    )
+DEFAULT_QUEUE_SIZE = 10_000
+DEFAULT_PAYLOAD_CHARS = 2000
+# Lists and dicts in logged payloads keep only their first items
+DEFAULT_PAYLOAD_ITEMS = 20
 
-# Call setup at import or main entry
-setup_logging()
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+_handler: Optional["DroppingQueueHandler"] = None
+
+def sample_payload(value: Any, max_chars: int = DEFAULT_PAYLOAD_CHARS, max_items: int = DEFAULT_PAYLOAD_ITEMS) -> Any:
+    """A copy of `value` with strings cut to `max_chars` and lists/dicts cut to their first `max_items` entries."""
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else f"{value[:max_chars]}... ({len(value) - max_chars} more chars)"
+    if isinstance(value, (list, tuple)):
+        sampled = [sample_payload(v, max_chars, max_items) for v in value[:max_items]]
+        if len(value) > max_items:
+            sampled.append(f"... {len(value) - max_items} more items")
+        return sampled
+    if isinstance(value, dict):
+        sampled = {k: sample_payload(v, max_chars, max_items) for k, v in list(value.items())[:max_items]}
+        if len(value) > max_items:
+            sampled["..."] = f"{len(value) - max_items} more keys"
+        return sampled
+    return value
+
+class LogPayload:
+    """
+    Wraps a tool payload passed as a logging argument. Nothing is rendered
+    until a handler formats the record on the logging thread, and then only
+    a sample of at most about `max_chars` characters.
+    """
+    __slots__ = ("value", "max_chars", "max_items")
+
+    def __init__(self, value: Any, max_chars: int = DEFAULT_PAYLOAD_CHARS, max_items: int = DEFAULT_PAYLOAD_ITEMS):
+        self.value = value
+        self.max_chars = max_chars
+        self.max_items = max_items
+
+    def sample(self) -> Any:
+        return sample_payload(self.value, self.max_chars, self.max_items)
+
+    def __str__(self) -> str:
+        text = str(self.sample())
+        return text if len(text) <= self.max_chars else f"{text[:self.max_chars]}... ({len(text) - self.max_chars} more chars)"
+
+class DroppingQueueHandler(QueueHandler):
+    """Hands records to the logging thread as is; when the queue is full they are counted and dropped instead of blocking."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stdlib version formats the message here, on the caller's thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class JsonlHandler(logging.Handler):
+    """Appends one JSON object per record, including `extra` fields; LogPayload values are written as their sample."""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self._file = Path(path).open("a", encoding="utf-8")
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            entry = {"ts": record.created, "level": record.levelname, "logger": record.name, "message": record.getMessage()}
+            entry.update({k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS})
+            self._file.write(json.dumps(entry, default=_json_default) + "\n")
+            self._file.flush()
+        except Exception:
+            self.handleError(record)
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+def _json_default(value: Any) -> Any:
+    return value.sample() if isinstance(value, LogPayload) else str(value)
+
+def setup_logging(level: str = "INFO", jsonl_path: Optional[str] = None, queue_size: int = DEFAULT_QUEUE_SIZE):
+    """
+    Routes all logging through a bounded queue to a background thread that
+    owns the console (and optional JSONL) handlers, so formatting and I/O
+    never run on the caller's thread. Calling it again replaces the pipeline.
+    Entry points call this; importing the module configures nothing.
+    """
+    # rich is only needed once there is a console to log to
+    from rich.console import Console
+    from rich.logging import RichHandler
+
+    global _listener, _handler
+    stop_logging()
+
+    # stderr, so stdout carries only a command's output (e.g. the answer of `ask`)
+    console = RichHandler(console=Console(stderr=True), rich_tracebacks=True)
+    console.setFormatter(logging.Formatter("%(message)s", datefmt="[%X]"))
+    handlers = [console]
+    if jsonl_path:
+        handlers.append(JsonlHandler(jsonl_path))
+
+    log_queue = queue.Queue(queue_size)
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _handler = DroppingQueueHandler(log_queue)
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(level)
+    _listener.start()
+
+def flush_logging() -> None:
+    """Blocks until every queued record has been handled, e.g. before prompting on the console."""
+    if _listener is not None:
+        _listener.queue.join()
+
+def stop_logging() -> None:
+    """Drains the queue, stops the logging thread and closes its handlers."""
+    global _listener, _handler
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        if _handler.dropped:
+            logging.getLogger(__name__).warning(f"{_handler.dropped} log records were dropped because the log queue was full")
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+    _listener = _handler = None
+
+atexit.register(stop_logging)
 
-# Create and export logger instance
 logger = logging.getLogger(__name__)
@@ -0,0 +1,223 @@
+# metrics.py
+
+import json
+import logging
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Optional
+
+from .constants import DB_TOOL_SUFFIXES
+from .helpers import split_tool_name
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SPANS = 10_000
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Tool responses larger than this are not parsed just to count rows
+ROW_COUNT_PARSE_LIMIT = 256 * 1024
+
+def _payload_bytes(value: Any) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict) and len(value) == 1:
+        # ADK wraps plain tool results as {"result": ...}; avoid re-serializing large strings
+        inner = next(iter(value.values()))
+        if isinstance(inner, (str, bytes)):
+            return len(inner)
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+def _row_count(response: Any) -> Optional[int]:
+    """Best-effort row count of a tool response; None when it isn't a result set."""
+    if isinstance(response, dict):
+        for key in ("rows", "result"):
+            if key in response:
+                return _row_count(response[key])
+        return None
+    if isinstance(response, list):
+        return len(response)
+    if isinstance(response, str) and response[:1] == "[" and len(response) <= ROW_COUNT_PARSE_LIMIT:
+        try:
+            parsed = json.loads(response)
+        except ValueError:
+            return None
+        return len(parsed) if isinstance(parsed, list) else None
+    return None
+
+def _db_key(tool_name: str) -> Optional[str]:
+    split = split_tool_name(tool_name, DB_TOOL_SUFFIXES)
+    return split[0] if split else None
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+class MetricsRecorder:
+    """
+    Collects timing spans in-process for questions, LLM turns and tool calls.
+
+    Spans are plain dicts kept in a bounded deque, so recording is an append;
+    aggregation only happens when a summary or export is requested. Counts,
+    durations, bytes and rows are also added to running totals that never
+    drop, for the Prometheus counters.
+    """
+
+    def __init__(self, max_spans: int = DEFAULT_MAX_SPANS):
+        self.spans: deque = deque(maxlen=max_spans)
+        self._open: dict[Any, tuple[float, dict]] = {}
+        # (kind, name) -> [count, duration seconds, response bytes, rows] since start
+        self.totals: dict[tuple[str, str], list] = {}
+
+    def start(self, key: Any, kind: str, name: str, **attrs) -> None:
+        self._open[key] = (time.perf_counter(), {"kind": kind, "name": name, "ts": time.time(), **attrs})
+
+    def finish(self, key: Any, **attrs) -> Optional[dict]:
+        opened = self._open.pop(key, None)
+        if opened is None:
+            return None
+        started, span = opened
+        span["duration_s"] = time.perf_counter() - started
+        span.update(attrs)
+        self.spans.append(span)
+        totals = self.totals.setdefault((span["kind"], span["name"]), [0, 0.0, 0, 0])
+        totals[0] += 1
+        totals[1] += span["duration_s"]
+        totals[2] += span.get("response_bytes") or 0
+        totals[3] += span.get("rows") or 0
+        return span
+
+    def discard_open(self, invocation_id: str) -> None:
+        """Drops spans left open by a failed invocation."""
+        for key in [k for k, (_, span) in self._open.items() if span.get("invocation_id") == invocation_id]:
+            self._open.pop(key, None)
+
+    @contextmanager
+    def span(self, kind: str, name: str, **attrs):
+        """Times a block; the yielded dict can be filled with extra attributes."""
+        key = object()
+        self.start(key, kind, name, **attrs)
+        extra: dict = {}
+        try:
+            yield extra
+        except BaseException as e:
+            extra["error"] = type(e).__name__
+            if extra.get("invocation_id"):
+                self.discard_open(extra["invocation_id"])
+            raise
+        finally:
+            self.finish(key, **extra)
+
+    def adk_callbacks(self) -> dict:
+        """Returns Agent callback kwargs that time every LLM turn and tool call."""
+        def before_model(callback_context, llm_request):
+            invocation_id = callback_context.invocation_id
+            self.start(("llm", invocation_id), "llm", getattr(llm_request, "model", None) or "llm", invocation_id=invocation_id)
+            return None
+
+        def after_model(callback_context, llm_response):
+            usage = getattr(llm_response, "usage_metadata", None)
+            self.finish(
+                ("llm", callback_context.invocation_id),
+                prompt_tokens=getattr(usage, "prompt_token_count", None),
+                output_tokens=getattr(usage, "candidates_token_count", None),
+            )
+            return None
+
+        def before_tool(tool, args, tool_context):
+            self.start(
+                ("tool", tool_context.function_call_id), "tool", tool.name,
+                invocation_id=tool_context.invocation_id,
+                db_key=_db_key(tool.name),
+                request_bytes=_payload_bytes(args),
+            )
+            return None
+
+        def after_tool(tool, args, tool_context, tool_response):
+            self.finish(
+                ("tool", tool_context.function_call_id),
+                response_bytes=_payload_bytes(tool_response),
+                rows=_row_count(tool_response),
+            )
+            return None
+
+        return {
+            "before_model_callback": before_model,
+            "after_model_callback": after_model,
+            "before_tool_callback": before_tool,
+            "after_tool_callback": after_tool,
+        }
+
+    def summary(self, kind: str = "tool") -> dict:
+        """Per-name count, mean and p50/p95/p99 latency (seconds) for spans of a kind."""
+        durations: dict[str, list[float]] = {}
+        for span in self.spans:
+            if span["kind"] == kind:
+                durations.setdefault(span["name"], []).append(span["duration_s"])
+
+        result = {}
+        for name, values in sorted(durations.items()):
+            values.sort()
+            result[name] = {
+                "count": len(values),
+                "mean": sum(values) / len(values),
+                **{f"p{int(q * 100)}": percentile(values, q) for q in QUANTILES},
+            }
+        return result
+
+    def export_jsonl(self, path: str) -> int:
+        """Appends all recorded spans to a JSONL file and returns how many were written."""
+        spans = list(self.spans)
+        with Path(path).open("a") as f:
+            for span in spans:
+                f.write(json.dumps(span, default=str) + "\n")
+        return len(spans)
+
+    def to_prometheus(self, prefix: str = "text2sql") -> str:
+        """
+        Renders span latencies as Prometheus summaries plus tool payload/row
+        counters. Quantiles cover the recent spans still kept; counts, sums
+        and the counters are totals since the recorder was created.
+        """
+        lines = [
+            f"# HELP {prefix}_span_duration_seconds Latency of questions, LLM turns and tool calls.",
+            f"# TYPE {prefix}_span_duration_seconds summary",
+        ]
+        for kind in ("question", "llm", "tool"):
+            recent = self.summary(kind)
+            for (span_kind, name), totals in sorted(self.totals.items()):
+                if span_kind != kind:
+                    continue
+                labels = f'kind="{kind}",name="{_escape_label(name)}"'
+                if name in recent:
+                    for q in QUANTILES:
+                        lines.append(f'{prefix}_span_duration_seconds{{{labels},quantile="{q}"}} {recent[name][f"p{int(q * 100)}"]:.6f}')
+                lines.append(f"{prefix}_span_duration_seconds_sum{{{labels}}} {totals[1]:.6f}")
+                lines.append(f"{prefix}_span_duration_seconds_count{{{labels}}} {totals[0]}")
+
+        tools = [(name, totals) for (kind, name), totals in sorted(self.totals.items()) if kind == "tool"]
+        lines.append(f"# TYPE {prefix}_tool_response_bytes_total counter")
+        lines += [f'{prefix}_tool_response_bytes_total{{name="{_escape_label(n)}"}} {t[2]}' for n, t in tools]
+        lines.append(f"# TYPE {prefix}_tool_rows_total counter")
+        lines += [f'{prefix}_tool_rows_total{{name="{_escape_label(n)}"}} {t[3]}' for n, t in tools]
+        return "\n".join(lines) + "\n"
+
+    def log_summary(self) -> None:
+        for name, stats in self.summary("tool").items():
+            logger.info(
+                f"{name}: n={stats['count']} p50={stats['p50'] * 1000:.1f}ms "
+                f"p95={stats['p95'] * 1000:.1f}ms p99={stats['p99'] * 1000:.1f}ms"
+            )
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -1,46 +1,101 @@
 # register_db.py
 
+import argparse
+import copy
 import logging
+import sys
+import time
 import yaml
 import os
-from sqlalchemy import create_engine, inspect
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from contextlib import contextmanager
+from sqlalchemy import create_engine
 from sqlalchemy.engine import make_url
 from pathlib import Path
+from typing import Optional
 from dotenv import load_dotenv
-from .helpers import get_describe_table_statement, get_list_tables_statement, get_password_environment_variable, infer_kind_from_url, infer_port, normalize_url
+from .helpers import get_connect_args, get_describe_table_statement, get_describe_tables_statement, get_list_tables_statement, get_password_environment_variable, get_source_url, infer_kind_from_url, infer_port, normalize_url
+from .column_profile import DEFAULT_SAMPLE_ROWS, DEFAULT_TOP_VALUES, profile_database
 from .constants import MYSQL, POSTGRES, ParameterTypes
+from .logger import setup_logging
+from .schema_catalog import SchemaDiff, get_catalog_path, read_schema_catalog, refresh_schema_catalog, write_schema_catalog
+
+try:
+    import fcntl
+except ImportError:  # Windows has no flock; concurrent runs are not serialized there
+    fcntl = None
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
-def register_database(tools_yaml_path: str, db_key: str, connection_url: str) -> list[str]:
-    connection_url = normalize_url(connection_url)
-    engine = create_engine(connection_url)
-    inspector = inspect(engine)
-    tables = inspector.get_table_names()
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_TIMEOUT_SECONDS = 60.0
+DEFAULT_WATCH_INTERVAL_SECONDS = 60.0
+
+def sync_schema_catalog(
+    engine,
+    db_key: str,
+    kind: str,
+    previous: dict = None,
+    profile: bool = False,
+    sample_rows: int = DEFAULT_SAMPLE_ROWS,
+    top_values: int = DEFAULT_TOP_VALUES,
+) -> tuple[dict, SchemaDiff]:
+    """
+    Refreshes a database's catalog against its stored version, re-reflecting
+    (and with `profile`, re-profiling) only the tables that changed.
+    """
+    catalog, diff = refresh_schema_catalog(engine, db_key, kind, previous)
+    stale = set(diff.changed) | set(diff.removed)
+    profiles = {t: p for t, p in ((previous or {}).get("profiles") or {}).items() if t in catalog["tables"] and t not in stale}
+    if profile:
+        missing = [t for t in catalog["tables"] if t not in profiles]
+        profiles.update(profile_database(engine, kind, missing, sample_rows, top_values))
+    if profiles or "profiles" in catalog:
+        catalog = {**catalog, "profiles": profiles}
+    return catalog, diff
 
+def introspect_database(
+    db_key: str,
+    connection_url: str,
+    timeout: float = None,
+    profile: bool = False,
+    sample_rows: int = DEFAULT_SAMPLE_ROWS,
+    top_values: int = DEFAULT_TOP_VALUES,
+    previous_catalog: dict = None,
+) -> dict:
+    """
+    Introspects a database and builds its sources/tools/toolsets entries without touching tools.yaml.
+    With `profile`, each column is also profiled from a sample of at most `sample_rows` rows per table.
+    Given the `previous_catalog`, only tables whose schema changed are reflected again.
+    """
+    connection_url = normalize_url(connection_url)
     parsed = make_url(connection_url)
     kind = infer_kind_from_url(connection_url)
     port = parsed.port or infer_port(kind)
 
-    tools_yaml = Path(tools_yaml_path)
-    config = yaml.safe_load(tools_yaml.read_text()) if tools_yaml.exists() else {}
-    
+    engine = create_engine(connection_url, connect_args=get_connect_args(kind, timeout, statement_timeout=timeout))
+    try:
+        catalog, diff = sync_schema_catalog(engine, db_key, kind, previous_catalog, profile, sample_rows, top_values)
+    finally:
+        engine.dispose()
+    tables = list(catalog["tables"])
+
     # Build source config
     source_config = {
         "kind": kind,
         "database": parsed.database,
     }
-    
+
     if kind in [POSTGRES, MYSQL]:
         source_config["port"] = port
         source_config["host"] = parsed.host
         source_config["user"] = parsed.username
         source_config["password"] = f"{get_password_environment_variable(kind)}"
-    
-    config.setdefault("sources", {})[db_key] = source_config
 
-    cfg_tools = config.setdefault("tools", {})
+    cfg_tools = {}
     cfg_tools[f"{db_key}_list_tables"] = {
         "kind": f"{kind}-sql",
         "source": db_key,
@@ -62,6 +117,21 @@ def register_database(tools_yaml_path: str, db_key: str, connection_url: str) ->
         "statement": get_describe_table_statement(kind)
     }
 
+    # One round trip for all the tables of a join; bound (not templated) even on SQLite
+    cfg_tools[f"{db_key}_describe_tables"] = {
+        "kind": f"{kind}-sql",
+        "source": db_key,
+        "description": f"Describe columns, primary keys and foreign keys of several tables of {db_key} at once",
+        "parameters": [
+            {
+                "name": "tables",
+                "type": "string",
+                "description": "Comma-separated names of the tables to inspect"
+            }
+        ],
+        "statement": get_describe_tables_statement(kind)
+    }
+
     if kind in [POSTGRES, MYSQL]:
         cfg_tools[f"{db_key}_execute_query"] = {
             "kind": f"{kind}-execute-sql",
@@ -82,37 +152,275 @@ def register_database(tools_yaml_path: str, db_key: str, connection_url: str) ->
             ],
             "statement": "{{.sql}};"
         }
-        
 
-    toolsets = config.setdefault("toolsets", {})
-    toolsets[f"{db_key}_toolset"] = [
-        f"{db_key}_list_tables",
-        f"{db_key}_describe_table",
-        f"{db_key}_execute_query"
-    ]
+    return {
+        "db_key": db_key,
+        "tables": tables,
+        "catalog": catalog,
+        # None for a first registration, where there is nothing to compare with
+        "diff": diff if previous_catalog is not None else None,
+        "source": source_config,
+        "tools": cfg_tools,
+        "toolset": list(cfg_tools),
+    }
+
+def merge_registration(config: dict, registration: dict) -> dict:
+    """Merges one introspected database into a tools.yaml config dict in place."""
+    db_key = registration["db_key"]
+    config.setdefault("sources", {})[db_key] = registration["source"]
+    config.setdefault("tools", {}).update(registration["tools"])
+    config.setdefault("toolsets", {})[f"{db_key}_toolset"] = registration["toolset"]
+    return config
+
+@contextmanager
+def locked_tools_yaml(tools_yaml_path: str):
+    """Holds an exclusive lock so overlapping registrations read-merge-write one at a time."""
+    lock_path = Path(f"{tools_yaml_path}.lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def read_tools_yaml(tools_yaml_path: str) -> dict:
+    tools_yaml = Path(tools_yaml_path)
+    return (yaml.safe_load(tools_yaml.read_text()) or {}) if tools_yaml.exists() else {}
+
+def write_tools_yaml(tools_yaml_path: str, config: dict) -> None:
+    """Writes tools.yaml atomically via a temp file and rename."""
+    tools_yaml = Path(tools_yaml_path)
+    tmp_path = tools_yaml.with_name(f".{tools_yaml.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(yaml.safe_dump(config))
+    os.replace(tmp_path, tools_yaml)
+
+def _save_registrations(tools_yaml_path: str, registrations: list[dict]) -> None:
+    for registration in registrations:
+        # Persist the full schema so the agent can answer schema lookups locally
+        catalog = registration["catalog"]
+        if not write_schema_catalog(get_catalog_path(tools_yaml_path, registration["db_key"]), catalog):
+            logger.info(f"Schema catalog for '{registration['db_key']}' unchanged (fingerprint {catalog['fingerprint'][:12]})")
+
+    with locked_tools_yaml(tools_yaml_path):
+        config = read_tools_yaml(tools_yaml_path)
+        merged = copy.deepcopy(config)
+        for registration in registrations:
+            merge_registration(merged, registration)
+        # Re-registering unchanged databases leaves tools.yaml (and a running toolbox) alone
+        if merged != config:
+            write_tools_yaml(tools_yaml_path, merged)
 
-    tools_yaml.write_text(yaml.safe_dump(config))
+def register_database(tools_yaml_path: str, db_key: str, connection_url: str, profile: bool = False, sample_rows: int = DEFAULT_SAMPLE_ROWS) -> list[str]:
+    previous = read_schema_catalog(get_catalog_path(tools_yaml_path, db_key))
+    registration = introspect_database(db_key, connection_url, profile=profile, sample_rows=sample_rows, previous_catalog=previous)
+    _save_registrations(tools_yaml_path, [registration])
+    tables = registration["tables"]
     logger.info(f"Registered '{db_key}' successfully; found tables: {tables}")  # Keep print for CLI use
+    _log_diff(db_key, registration["diff"])
     return tables
 
+def _start_daemon_workers(jobs: queue.Queue, count: int, fn) -> None:
+    """
+    Runs fn(db_key, url) for each (future, db_key, url) job on `count` daemon
+    threads. Unlike ThreadPoolExecutor workers, they are not joined at
+    interpreter exit, so a database that never answers can't keep the CLI alive.
+    """
+    def worker():
+        while True:
+            try:
+                future, db_key, url = jobs.get_nowait()
+            except queue.Empty:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(db_key, url))
+            except BaseException as e:
+                future.set_exception(e)
+
+    for i in range(count):
+        threading.Thread(target=worker, name=f"register_db_{i}", daemon=True).start()
+
+def register_databases(
+    tools_yaml_path: str,
+    databases: list[tuple[str, str]],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    profile: bool = False,
+    sample_rows: int = DEFAULT_SAMPLE_ROWS,
+) -> tuple[dict[str, list[str]], dict[str, str]]:
+    """
+    Introspects many databases in parallel and merges them into tools.yaml with one atomic write.
+
+    Args:
+        tools_yaml_path: Path of the tools.yaml file to update.
+        databases: (db_key, connection_url) pairs to register.
+        max_workers: Size of the introspection thread pool.
+        timeout: Seconds a database may take from the start of its introspection.
+            It also bounds connecting and, on PostgreSQL and MySQL, each statement.
+            A database still running past it is reported as failed and its thread
+            is abandoned.
+        profile: Also profile column values (null fraction, distinct count, min/max, common values).
+        sample_rows: Rows sampled per table when profiling.
+
+    Returns:
+        A tuple of ({db_key: tables} for registered databases, {db_key: error} for failures).
+    """
+    registrations, errors = [], {}
+    started = {}
+
+    def run(db_key: str, connection_url: str) -> dict:
+        started[db_key] = time.monotonic()
+        previous = read_schema_catalog(get_catalog_path(tools_yaml_path, db_key))
+        return introspect_database(db_key, connection_url, timeout, profile, sample_rows, previous_catalog=previous)
+
+    jobs = queue.Queue()
+    pending = {}
+    for db_key, url in databases:
+        future = Future()
+        jobs.put((future, db_key, url))
+        pending[future] = db_key
+    _start_daemon_workers(jobs, min(max_workers, len(databases)), run)
+    try:
+        while pending:
+            deadlines = [started[k] + timeout for k in pending.values() if k in started]
+            wait_for = max(0.0, min(deadlines) - time.monotonic()) if deadlines else 0.05
+            done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                db_key = pending.pop(future)
+                try:
+                    registrations.append(future.result())
+                except Exception as e:
+                    errors[db_key] = str(e)
+                    logger.error(f"Failed to register '{db_key}': {e}")
+
+            now = time.monotonic()
+            for future, db_key in list(pending.items()):
+                if db_key in started and now - started[db_key] >= timeout:
+                    del pending[future]
+                    errors[db_key] = f"Introspection timed out after {timeout}s"
+                    logger.error(f"Failed to register '{db_key}': introspection timed out after {timeout}s")
+    finally:
+        # Queued databases are skipped; hung ones keep their daemon thread, which doesn't hold up exit
+        for future in pending:
+            future.cancel()
+
+    if registrations:
+        _save_registrations(tools_yaml_path, registrations)
+
+    registered = {r["db_key"]: r["tables"] for r in registrations}
+    for registration in registrations:
+        logger.info(f"Registered '{registration['db_key']}' successfully; found {len(registration['tables'])} tables")
+        _log_diff(registration["db_key"], registration["diff"])
+    return registered, errors
+
+def _log_diff(db_key: str, diff: Optional[SchemaDiff]) -> None:
+    if diff is None:
+        return
+    if diff:
+        logger.info(f"Schema of '{db_key}' changed: added {diff.added}, changed {diff.changed}, removed {diff.removed}")
+    else:
+        logger.info(f"Schema of '{db_key}' unchanged")
+
+def refresh_registered_database(tools_yaml_path: str, db_key: str, engine, kind: str) -> SchemaDiff:
+    """Re-syncs the stored catalog of a registered database with its live schema."""
+    catalog_path = get_catalog_path(tools_yaml_path, db_key)
+    previous = read_schema_catalog(catalog_path)
+    catalog, diff = sync_schema_catalog(engine, db_key, kind, previous)
+    write_schema_catalog(catalog_path, catalog)
+    _log_diff(db_key, diff if previous is not None else None)
+    return diff
+
+def watch_databases(
+    tools_yaml_path: str,
+    interval: float = DEFAULT_WATCH_INTERVAL_SECONDS,
+    iterations: int = None,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    sleep=time.sleep,
+) -> None:
+    """
+    Polls every source in tools.yaml for schema changes and updates the
+    catalogs of those that changed. Each poll is one probe query per database
+    (SQLite only reads its schema_version) over a kept-open connection; full
+    reflection only happens for tables whose digest changed.
+    """
+    engines = {}
+    try:
+        polls = 0
+        while iterations is None or polls < iterations:
+            sources = read_tools_yaml(tools_yaml_path).get("sources", {})
+            for db_key, source in sources.items():
+                try:
+                    engine = engines.get(db_key)
+                    if engine is None:
+                        engine = engines[db_key] = create_engine(
+                            get_source_url(source), connect_args=get_connect_args(source["kind"], timeout), pool_size=1, pool_pre_ping=True
+                        )
+                    refresh_registered_database(tools_yaml_path, db_key, engine, source["kind"])
+                except Exception as e:
+                    logger.warning(f"Could not check schema of '{db_key}': {e}")
+            polls += 1
+            if iterations is None or polls < iterations:
+                sleep(interval)
+    finally:
+        for engine in engines.values():
+            engine.dispose()
+
+def _parse_database_arg(value: str) -> tuple[str, str]:
+    db_key, sep, url = value.partition("=")
+    if not sep or not db_key or not url:
+        raise argparse.ArgumentTypeError(f"Expected <db_key>=<connection_url>, got '{value}'")
+    return db_key.strip(), url.strip()
+
+def _databases_from_env() -> list[tuple[str, str]]:
+    databases = []
+    for suffix in ("POSTGRES", "MYSQL", "SQLITE"):
+        db_key, url = os.getenv(f"DB_KEY_{suffix}"), os.getenv(f"CONNECTION_URL_{suffix}")
+        if db_key and url:
+            databases.append((db_key, url))
+    return databases
+
+def main(argv: list[str] = None, prog: str = None, log_level: str = "INFO") -> int:
+    parser = argparse.ArgumentParser(prog=prog, description="Register databases into an MCP Toolbox tools.yaml.")
+    parser.add_argument("databases", nargs="*", type=_parse_database_arg, metavar="DB_KEY=URL",
+                        help="Databases to register. Defaults to the DB_KEY_*/CONNECTION_URL_* environment variables.")
+    parser.add_argument("--from-file", help="File with one DB_KEY=URL per line; lines starting with '#' are skipped.")
+    parser.add_argument("--tools-yaml", default=os.getenv("TOOLS_YAML_PATH", "tools.yaml"))
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_SECONDS, help="Seconds each database may take; also bounds connecting and each statement.")
+    parser.add_argument("--profile", action="store_true", help="Profile column values from a sample of each table.")
+    parser.add_argument("--sample-rows", type=int, default=DEFAULT_SAMPLE_ROWS, help="Rows sampled per table with --profile.")
+    parser.add_argument("--watch", action="store_true", help="Keep polling every registered database and update changed schemas.")
+    parser.add_argument("--interval", type=float, default=DEFAULT_WATCH_INTERVAL_SECONDS, help="Seconds between --watch polls.")
+    args = parser.parse_args(argv)
+    setup_logging(log_level)
+
+    databases = list(args.databases)
+    if args.from_file:
+        for line in Path(args.from_file).read_text().splitlines():
+            line = line.strip()
+            if line and not line.startswith("#"):
+                databases.append(_parse_database_arg(line))
+    if not databases:
+        databases = _databases_from_env()
+    if not databases and not args.watch:
+        parser.error("no databases given")
+
+    errors = {}
+    if databases:
+        _, errors = register_databases(
+            args.tools_yaml, databases, max_workers=args.workers, timeout=args.timeout, profile=args.profile, sample_rows=args.sample_rows
+        )
+    if args.watch:
+        try:
+            watch_databases(args.tools_yaml, args.interval, timeout=args.timeout)
+        except KeyboardInterrupt:
+            pass
+    return 1 if errors else 0
+
 if __name__ == "__main__":
-    # Register PostgreSQL database
-    # register_database(
-    #     os.getenv("TOOLS_YAML_PATH"),
-    #     os.getenv("DB_KEY_POSTGRES"),
-    #     os.getenv("CONNECTION_URL_POSTGRES")
-    # )
-
-    # Register MySQL database
-    # register_database(
-    #     os.getenv("TOOLS_YAML_PATH"),
-    #     os.getenv("DB_KEY_MYSQL"),
-    #     os.getenv("CONNECTION_URL_MYSQL")
-    # )
-
-    # Register SQLite database
-    register_database(
-        os.getenv("TOOLS_YAML_PATH"),
-        os.getenv("DB_KEY_SQLITE"),
-        os.getenv("CONNECTION_URL_SQLITE")
-    )
\ No newline at end of file
+    sys.exit(main())
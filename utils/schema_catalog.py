@@ -0,0 +1,202 @@
+# schema_catalog.py
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import inspect
+
+from .constants import SCHEMA_CATALOG_DIR_NAME
+from .helpers import get_schema_version_statement, get_table_fingerprints_statement
+from .schema_index import build_schema_index
+
+logger = logging.getLogger(__name__)
+
+def _reflect_multi(inspector, method: str, table_names: Optional[list] = None) -> dict:
+    """Calls an inspector get_multi_* method, tolerating dialects that lack it."""
+    try:
+        if table_names is None:
+            return getattr(inspector, method)()
+        return getattr(inspector, method)(filter_names=table_names)
+    except NotImplementedError:
+        return {}
+
+def build_schema_catalog(inspector, db_key: str, kind: str, table_names: Optional[list] = None) -> dict:
+    """Builds a JSON-serializable schema catalog from a SQLAlchemy inspector.
+
+    Uses the batched get_multi_* reflection calls so large databases are
+    introspected in a handful of queries instead of several per table.
+    `table_names` limits reflection to those tables.
+    """
+    columns = _reflect_multi(inspector, "get_multi_columns", table_names)
+    pks = _reflect_multi(inspector, "get_multi_pk_constraint", table_names)
+    fks = _reflect_multi(inspector, "get_multi_foreign_keys", table_names)
+    comments = _reflect_multi(inspector, "get_multi_table_comment", table_names)
+
+    tables = {}
+    for key, cols in sorted(columns.items(), key=lambda item: item[0][1]):
+        tables[key[1]] = {
+            "comment": (comments.get(key) or {}).get("text"),
+            "columns": [
+                {
+                    "name": col["name"],
+                    "type": str(col["type"]),
+                    "nullable": bool(col.get("nullable", True)),
+                    "default": None if col.get("default") is None else str(col["default"]),
+                    "comment": col.get("comment"),
+                }
+                for col in cols
+            ],
+            "primary_key": list((pks.get(key) or {}).get("constrained_columns") or []),
+            "foreign_keys": [
+                {
+                    "columns": list(fk["constrained_columns"]),
+                    "referred_table": fk["referred_table"],
+                    "referred_columns": list(fk["referred_columns"]),
+                }
+                for fk in fks.get(key, [])
+            ],
+        }
+
+    return {
+        "db_key": db_key,
+        "kind": kind,
+        "fingerprint": schema_fingerprint(tables),
+        "tables": tables,
+        "search_index": build_schema_index(tables),
+    }
+
+def schema_fingerprint(tables: dict) -> str:
+    """Returns a stable hash over the table definitions of a catalog."""
+    canonical = json.dumps(tables, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+@dataclass
+class SchemaDiff:
+    """Tables added, changed or removed since the stored catalog."""
+    added: list = field(default_factory=list)
+    changed: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+def probe_schema(conn, kind: str, previous_probe: Optional[dict] = None) -> dict:
+    """
+    Reads the cheap schema probe of a database: a version counter where the
+    dialect has one (SQLite's schema_version) and a digest per table. The
+    per-table query is skipped when the version matches `previous_probe`.
+    """
+    version_statement = get_schema_version_statement(kind)
+    version = conn.exec_driver_sql(version_statement).scalar() if version_statement else None
+    if version is not None and previous_probe and previous_probe.get("version") == version:
+        return previous_probe
+    rows = conn.exec_driver_sql(get_table_fingerprints_statement(kind)).fetchall()
+    tables = {name: hashlib.sha256(str(digest).encode("utf-8")).hexdigest()[:16] for name, digest in rows}
+    return {"version": version, "tables": dict(sorted(tables.items()))}
+
+def refresh_schema_catalog(engine, db_key: str, kind: str, previous: Optional[dict] = None) -> tuple[dict, SchemaDiff]:
+    """
+    Brings a catalog up to date with the database, re-reflecting only the
+    tables whose probe digest changed. Without a usable previous catalog the
+    whole schema is reflected. Returns the catalog and what changed.
+    """
+    previous_probe = (previous or {}).get("probe")
+    with engine.connect() as conn:
+        probe = probe_schema(conn, kind, previous_probe)
+    if previous is not None and probe == previous_probe:
+        return previous, SchemaDiff()
+
+    if previous is None or not previous_probe or previous.get("kind") != kind:
+        catalog = build_schema_catalog(inspect(engine), db_key, kind)
+        catalog["probe"] = probe
+        return catalog, SchemaDiff(added=list(catalog["tables"]))
+
+    old, new = previous_probe["tables"], probe["tables"]
+    diff = SchemaDiff(
+        added=sorted(set(new) - set(old)),
+        changed=sorted(name for name in set(new) & set(old) if new[name] != old[name]),
+        removed=sorted(set(old) - set(new)),
+    )
+    tables = {name: table for name, table in previous["tables"].items() if name not in diff.changed and name not in diff.removed}
+    if diff.added or diff.changed:
+        # Views have digests too but aren't reflected as tables, so they simply don't come back
+        tables.update(build_schema_catalog(inspect(engine), db_key, kind, diff.added + diff.changed)["tables"])
+    tables = dict(sorted(tables.items()))
+    catalog = {
+        **previous,
+        "fingerprint": schema_fingerprint(tables),
+        "tables": tables,
+        "search_index": build_schema_index(tables),
+        "probe": probe,
+    }
+    return catalog, diff
+
+def get_catalog_dir(tools_yaml_path: str) -> Path:
+    """Returns the directory holding schema catalogs for a tools.yaml file."""
+    return Path(tools_yaml_path).resolve().parent / SCHEMA_CATALOG_DIR_NAME
+
+def get_catalog_path(tools_yaml_path: str, db_key: str) -> Path:
+    """Returns the catalog file path for a registered db_key."""
+    return get_catalog_dir(tools_yaml_path) / f"{db_key}.json"
+
+def write_schema_catalog(path: Path, catalog: dict) -> bool:
+    """Writes a catalog to disk, skipping the write if the fingerprint is unchanged.
+
+    Column profiles and the schema probe are not part of the fingerprint, so a
+    catalog carrying new ones is always written. Returns True if the file was
+    (re)written.
+    """
+    existing = read_schema_catalog(path)
+    if existing and existing.get("fingerprint") == catalog["fingerprint"] and existing.get("probe") == catalog.get("probe"):
+        if catalog.get("profiles") is None or catalog["profiles"] == existing.get("profiles"):
+            return False
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps(catalog, indent=2, sort_keys=True))
+    os.replace(tmp_path, path)
+    return True
+
+def read_schema_catalog(path: Path) -> Optional[dict]:
+    """Reads a catalog from disk, returning None if it is missing or unreadable."""
+    try:
+        return json.loads(Path(path).read_text())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable schema catalog {path}: {e}")
+        return None
+
+class SchemaCatalogStore:
+    """Serves schema catalogs from a directory, reloading a file only when it changes."""
+
+    def __init__(self, catalog_dir: str):
+        self.catalog_dir = Path(catalog_dir)
+        self._cache: dict[str, tuple[float, dict]] = {}
+
+    def db_keys(self) -> list[str]:
+        if not self.catalog_dir.is_dir():
+            return []
+        return sorted(p.stem for p in self.catalog_dir.glob("*.json"))
+
+    def get(self, db_key: str) -> Optional[dict]:
+        path = self.catalog_dir / f"{db_key}.json"
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            self._cache.pop(db_key, None)
+            return None
+
+        cached = self._cache.get(db_key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        catalog = read_schema_catalog(path)
+        if catalog is not None:
+            self._cache[db_key] = (mtime, catalog)
+        return catalog
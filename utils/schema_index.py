@@ -0,0 +1,86 @@
+# schema_index.py
+
+import math
+import re
+from collections import Counter
+
+# Table-name matches matter more than column or comment matches
+TABLE_NAME_WEIGHT = 3
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "does", "each", "for", "from", "give", "how",
+    "i", "in", "is", "it", "list", "many", "me", "much", "of", "on", "or", "per", "show", "that", "the",
+    "their", "there", "to", "top", "was", "were", "what", "which", "who", "with", "all", "get", "find",
+})
+
+_WORD_RE = re.compile(r"[A-Za-z0-9]+")
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+def _stem(term: str) -> str:
+    """Very light plural stripping so 'invoices' matches 'invoice'."""
+    if len(term) > 4 and term.endswith("ies"):
+        return term[:-3] + "y"
+    if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+        return term[:-1]
+    return term
+
+def tokenize_terms(text: str) -> list[str]:
+    """Splits text, snake_case and camelCase names into lower-cased, lightly stemmed terms."""
+    terms = []
+    for word in _WORD_RE.findall(text or ""):
+        parts = _CAMEL_RE.findall(word)
+        for part in parts:
+            part = part.lower()
+            if part not in STOPWORDS:
+                terms.append(_stem(part))
+        if len(parts) > 1:
+            # Keep the compound too, e.g. 'invoiceline' for InvoiceLine
+            terms.append(_stem(word.lower()))
+    return terms
+
+def _document_terms(table_name: str, table: dict) -> list[str]:
+    terms = tokenize_terms(table_name) * TABLE_NAME_WEIGHT
+    terms += tokenize_terms(table.get("comment") or "")
+    for column in table.get("columns", []):
+        terms += tokenize_terms(column["name"])
+        terms += tokenize_terms(column.get("comment") or "")
+    for fk in table.get("foreign_keys", []):
+        terms += tokenize_terms(fk["referred_table"])
+    return terms
+
+def build_schema_index(tables: dict) -> dict:
+    """Builds a JSON-serializable BM25 inverted index over table names, column names and comments."""
+    postings: dict[str, dict[str, int]] = {}
+    doc_lengths = {}
+    for table_name, table in tables.items():
+        terms = _document_terms(table_name, table)
+        doc_lengths[table_name] = len(terms)
+        for term, tf in Counter(terms).items():
+            postings.setdefault(term, {})[table_name] = tf
+
+    return {
+        "doc_lengths": doc_lengths,
+        "avg_length": (sum(doc_lengths.values()) / len(doc_lengths)) if doc_lengths else 0.0,
+        "postings": postings,
+    }
+
+def search_schema_index(index: dict, question: str, k: int = 5) -> list[tuple[str, float]]:
+    """Ranks tables against a question with BM25 and returns the top-k (table, score) pairs."""
+    doc_lengths = index["doc_lengths"]
+    postings = index["postings"]
+    n_docs = len(doc_lengths)
+    avg_length = index["avg_length"] or 1.0
+
+    scores: Counter = Counter()
+    for term in set(tokenize_terms(question)):
+        matches = postings.get(term)
+        if not matches:
+            continue
+        idf = math.log(1 + (n_docs - len(matches) + 0.5) / (len(matches) + 0.5))
+        for table_name, tf in matches.items():
+            norm = 1 - BM25_B + BM25_B * doc_lengths[table_name] / avg_length
+            scores[table_name] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
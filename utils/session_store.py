@@ -0,0 +1,279 @@
+# session_store.py
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from google.adk.events import Event
+from google.adk.sessions import InMemorySessionService, Session
+from google.genai.types import Content, Part
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 256 * 1024
+DEFAULT_MAX_TOKENS = 32_000
+DEFAULT_KEEP_TURNS = 4
+DEFAULT_TOOL_OUTPUT_CHARS = 500
+
+# Rough chars-per-token ratio for budgeting without calling a tokenizer
+CHARS_PER_TOKEN = 4
+
+# Dropped turns are folded into one summary event holding at most this many lines
+MAX_SUMMARY_LINES = 20
+SUMMARY_QUESTION_CHARS = 200
+SUMMARY_ANSWER_CHARS = 300
+
+COMPACTED_TURNS_KEY = "compacted_turns"
+TRUNCATED_KEY = "truncated"
+
+def _event_size(event: Event) -> int:
+    return len(event.content.model_dump_json(exclude_none=True)) if event.content else 0
+
+def _text(event: Event) -> str:
+    if not event.content or not event.content.parts:
+        return ""
+    return " ".join(part.text for part in event.content.parts if part.text).strip()
+
+def _is_summary(event: Event) -> bool:
+    return bool(event.custom_metadata and COMPACTED_TURNS_KEY in event.custom_metadata)
+
+def _starts_turn(event: Event) -> bool:
+    return event.author == "user" and not _is_summary(event) and bool(_text(event))
+
+def _shorten(text: str, limit: int) -> str:
+    return text if len(text) <= limit else f"{text[:limit]}..."
+
+def truncate_tool_outputs(event: Event, max_chars: int) -> bool:
+    """Replaces function responses longer than `max_chars` with a prefix of their JSON; True if any were cut."""
+    if not event.content or not event.content.parts:
+        return False
+    changed = False
+    for part in event.content.parts:
+        response = part.function_response
+        if response is None or not response.response or TRUNCATED_KEY in response.response:
+            continue
+        encoded = json.dumps(response.response, default=str)
+        if len(encoded) > max_chars:
+            response.response = {TRUNCATED_KEY: True, "preview": encoded[:max_chars], "original_chars": len(encoded)}
+            changed = True
+    return changed
+
+class BoundedSessionService(InMemorySessionService):
+    """
+    An ADK session service that keeps each session within a byte and token
+    budget, can evict idle sessions and can persist sessions to SQLite.
+
+    After every event, tool responses older than the last `keep_turns` user
+    turns are cut to `tool_output_chars`. If the history is still over
+    budget, the oldest turns are dropped and folded into a single summary
+    event listing their questions and answers. The last `keep_turns` turns
+    are always kept verbatim. Session state is never compacted.
+
+    With `db_path`, sessions are written to a SQLite file after each event
+    and loaded back on demand, so they survive restarts and idle eviction.
+    """
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+        max_tokens: Optional[int] = DEFAULT_MAX_TOKENS,
+        keep_turns: int = DEFAULT_KEEP_TURNS,
+        tool_output_chars: int = DEFAULT_TOOL_OUTPUT_CHARS,
+        idle_seconds: Optional[float] = None,
+        db_path: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.max_tokens = max_tokens
+        self.keep_turns = keep_turns
+        self.tool_output_chars = tool_output_chars
+        self.idle_seconds = idle_seconds
+        self._clock = clock
+        self._db = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (app_name TEXT, user_id TEXT, session_id TEXT, "
+                "data TEXT, last_update_time REAL, PRIMARY KEY (app_name, user_id, session_id))"
+            )
+            # user_id '' holds the app-scoped state
+            self._db.execute("CREATE TABLE IF NOT EXISTS shared_state (app_name TEXT, user_id TEXT, data TEXT, PRIMARY KEY (app_name, user_id))")
+            self._db.commit()
+            self._load_shared_state()
+
+    def close(self) -> None:
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
+
+    def over_budget(self, events: List[Event]) -> bool:
+        size = sum(_event_size(event) for event in events)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return True
+        return self.max_tokens is not None and size / CHARS_PER_TOKEN > self.max_tokens
+
+    def compact(self, session: Session) -> None:
+        """Brings a session's history within budget in place."""
+        events = session.events
+        turn_starts = [i for i, event in enumerate(events) if _starts_turn(event)]
+        keep = max(1, self.keep_turns)
+        if len(turn_starts) <= keep:
+            return
+        protected_from = turn_starts[-keep]
+
+        for event in events[:protected_from]:
+            truncate_tool_outputs(event, self.tool_output_chars)
+        if not self.over_budget(events):
+            return
+
+        summary = events[0] if _is_summary(events[0]) else None
+        lines = _text(summary).splitlines()[1:] if summary else []
+        dropped = summary.custom_metadata[COMPACTED_TURNS_KEY] if summary else 0
+        old = [i for i in turn_starts if i < protected_from]
+        cut = None
+        for position, start in enumerate(old):
+            end = old[position + 1] if position + 1 < len(old) else protected_from
+            lines.append(_summarize_turn(events[start:end]))
+            dropped += 1
+            cut = end
+            if not self.over_budget(events[end:]):
+                break
+        if cut is None:
+            return
+
+        summary = Event(
+            author="user",
+            invocation_id=events[cut - 1].invocation_id,
+            timestamp=events[cut - 1].timestamp,
+            custom_metadata={COMPACTED_TURNS_KEY: dropped},
+            content=Content(role="user", parts=[Part(text="\n".join([f"[Summary of {dropped} earlier turns]", *lines[-MAX_SUMMARY_LINES:]]))]),
+        )
+        session.events[:] = [summary, *events[cut:]]
+        logger.debug(f"Compacted session '{session.id}': {dropped} turns summarized, {len(session.events)} events kept")
+
+    def evict_idle(self) -> int:
+        """Drops sessions idle for longer than `idle_seconds` from memory; returns how many were evicted."""
+        if self.idle_seconds is None:
+            return 0
+        cutoff = self._clock() - self.idle_seconds
+        evicted = 0
+        for users in self.sessions.values():
+            for sessions in users.values():
+                for session_id in [sid for sid, s in sessions.items() if s.last_update_time < cutoff]:
+                    del sessions[session_id]
+                    evicted += 1
+        if evicted:
+            logger.info(f"Evicted {evicted} idle sessions")
+        return evicted
+
+    def _save_session(self, session: Session) -> None:
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?)",
+                (session.app_name, session.user_id, session.id, session.model_dump_json(exclude_none=True), session.last_update_time),
+            )
+            self._db.commit()
+
+    def _load_session(self, app_name: str, user_id: str, session_id: str) -> Optional[Session]:
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT data FROM sessions WHERE app_name = ? AND user_id = ? AND session_id = ?", (app_name, user_id, session_id)
+            ).fetchone()
+        if row is None:
+            return None
+        session = Session.model_validate_json(row[0])
+        # Loading counts as activity, so a reloaded session isn't evicted straight away
+        session.last_update_time = max(session.last_update_time, self._clock())
+        self.sessions.setdefault(app_name, {}).setdefault(user_id, {})[session_id] = session
+        return session
+
+    def _save_shared_state(self, app_name: str, user_id: str) -> None:
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO shared_state VALUES (?, ?, ?)",
+                (app_name, "", json.dumps(self.app_state.get(app_name, {}), default=str)),
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO shared_state VALUES (?, ?, ?)",
+                (app_name, user_id, json.dumps(self.user_state.get(app_name, {}).get(user_id, {}), default=str)),
+            )
+            self._db.commit()
+
+    def _load_shared_state(self) -> None:
+        with self._db_lock:
+            rows = self._db.execute("SELECT app_name, user_id, data FROM shared_state").fetchall()
+        for app_name, user_id, data in rows:
+            if user_id:
+                self.user_state.setdefault(app_name, {})[user_id] = json.loads(data)
+            else:
+                self.app_state[app_name] = json.loads(data)
+
+    async def create_session(self, *, app_name: str, user_id: str, state: Optional[Dict[str, Any]] = None, session_id: Optional[str] = None) -> Session:
+        self.evict_idle()
+        session = await super().create_session(app_name=app_name, user_id=user_id, state=state, session_id=session_id)
+        self._save_session(self.sessions[app_name][user_id][session.id])
+        return session
+
+    async def get_session(self, *, app_name: str, user_id: str, session_id: str, config=None) -> Optional[Session]:
+        self.evict_idle()
+        if session_id not in self.sessions.get(app_name, {}).get(user_id, {}):
+            self._load_session(app_name, user_id, session_id)
+        return await super().get_session(app_name=app_name, user_id=user_id, session_id=session_id, config=config)
+
+    async def list_sessions(self, *, app_name: str, user_id: str):
+        response = await super().list_sessions(app_name=app_name, user_id=user_id)
+        if self._db is not None:
+            known = {session.id for session in response.sessions}
+            with self._db_lock:
+                rows = self._db.execute(
+                    "SELECT session_id, last_update_time FROM sessions WHERE app_name = ? AND user_id = ?", (app_name, user_id)
+                ).fetchall()
+            for session_id, last_update_time in rows:
+                if session_id not in known:
+                    response.sessions.append(Session(app_name=app_name, user_id=user_id, id=session_id, last_update_time=last_update_time))
+        return response
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        await super().delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(
+                    "DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND session_id = ?", (app_name, user_id, session_id)
+                )
+                self._db.commit()
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session=session, event=event)
+        if event.partial:
+            return event
+        stored = self.sessions.get(session.app_name, {}).get(session.user_id, {}).get(session.id)
+        if stored is None:
+            return event
+        # The runner's working copy is compacted too, so the next LLM call within this invocation already benefits
+        self.compact(stored)
+        if session is not stored:
+            self.compact(session)
+        self._save_session(stored)
+        if event.actions and event.actions.state_delta and any(key.startswith(("app:", "user:")) for key in event.actions.state_delta):
+            self._save_shared_state(session.app_name, session.user_id)
+        return event
+
+def _summarize_turn(events: List[Event]) -> str:
+    question = _shorten(_text(events[0]), SUMMARY_QUESTION_CHARS)
+    answers = [_text(event) for event in events[1:] if event.author != "user" and _text(event)]
+    answer = _shorten(answers[-1], SUMMARY_ANSWER_CHARS) if answers else "(no answer)"
+    return f"- Q: {question} -> A: {answer}"